@@ -3,17 +3,101 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    # Connection pool of the PostgreSQL engine: DB_POOL_SIZE persistent
+    # connections plus up to DB_MAX_OVERFLOW more under bursts.
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    # Seconds a checkout waits for a free connection before failing.
+    DB_POOL_TIMEOUT: float = 10.0
+    # Replace connections older than this many seconds, ahead of server or
+    # proxy idle timeouts; pre-ping drops connections that died anyway.
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Open DB_POOL_SIZE connections at startup, before the first request.
+    DB_POOL_PREWARM: bool = True
+    # asyncpg prepared statements cached per connection; 0 disables the cache
+    # (needed behind PgBouncer in transaction mode).
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # Seconds before the server cancels a statement from an API request;
+    # 0 disables the limit.
+    DB_STATEMENT_TIMEOUT: float = 30.0
+    # Separate pool for scheduler jobs, ingestion and migrations, so bulk
+    # work never waits on (or starves) request handlers. Jobs can wait
+    # longer for a connection; the statement timeout only bounds runaway
+    # jobs, and migrations lift it.
+    DB_JOB_POOL_SIZE: int = 4
+    DB_JOB_MAX_OVERFLOW: int = 4
+    DB_JOB_POOL_TIMEOUT: float = 120.0
+    DB_JOB_STATEMENT_TIMEOUT: float = 900.0
+    # Optional streaming replica for the read-only API endpoints; empty sends
+    # everything to DATABASE_URL. Reads fall back to the primary while the
+    # replica is unreachable or more than READ_REPLICA_MAX_LAG_SECONDS behind,
+    # checked at most every READ_REPLICA_CHECK_SECONDS.
+    DATABASE_READ_URL: str = ""
+    READ_REPLICA_MAX_LAG_SECONDS: float = 30.0
+    READ_REPLICA_CHECK_SECONDS: float = 5.0
     FORECAST_ALPHA: float = 0.3
     FORECAST_CI_MULTIPLIER: float = 1.96
+    # Incremental FluNet runs re-request the watermark week plus this many
+    # preceding weeks to pick up late reports and revisions.
+    FLUNET_REVISION_WEEKS: int = 1
+    # Maximum number of FluNet backfill years fetched at the same time.
+    FLUNET_CONCURRENCY: int = 4
+    # Initial FluNet $top page size; it then adapts so each request takes
+    # roughly FLUNET_PAGE_TARGET_SECONDS.
+    FLUNET_PAGE_SIZE: int = 20000
+    FLUNET_PAGE_TARGET_SECONDS: float = 10.0
+    # Load ingested rows through a COPY staging table on PostgreSQL; disable
+    # to fall back to batched multi-row INSERTs.
+    BULK_COPY_ENABLED: bool = True
+    # A rebuilt shadow table must reach this fraction of the live table's row
+    # count and date span before it is swapped in.
+    REBUILD_MIN_RATIO: float = 0.9
+    # Nextstrain datasets ingested into genomic_sequences, tagged by lineage
+    NEXTSTRAIN_DATASETS: list[str] = [
+        "flu/seasonal/h3n2/ha/12y",
+        "flu/seasonal/h1n1pdm/ha/12y",
+        "flu/seasonal/vic/ha/12y",
+        "flu/seasonal/yam/ha/12y",
+    ]
+    # Worker processes used to parse Nextstrain datasets; 0 or 1 parses in a thread.
+    NEXTSTRAIN_PARSE_PROCESSES: int = 4
+    # Directory for the compressed upstream response cache; empty disables it.
+    HTTP_CACHE_DIR: str = ""
+    # Serve every upstream request from HTTP_CACHE_DIR without touching the network.
+    HTTP_CACHE_REPLAY: bool = False
+
+    # In-process cache of read endpoint responses, invalidated whenever a job
+    # commits new data; evicts least-recently-used entries beyond either
+    # limit. RESPONSE_CACHE_MAX_ENTRIES=0 disables it.
+    RESPONSE_CACHE_MAX_ENTRIES: int = 512
+    RESPONSE_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    # Cache-Control on cached read endpoints. Data changes only when a job
+    # commits (FluNet every 6 hours, anomalies 4 times a day), so clients and
+    # nginx may serve a stale body for up to one FluNet interval while they
+    # revalidate with If-None-Match, which costs the backend no queries.
+    API_CACHE_MAX_AGE: int = 300
+    API_STALE_WHILE_REVALIDATE: int = 6 * 3600
+
+    # Apply pending migrations from backend/migrations when the app starts;
+    # disable to run them out of band with `python -m app.migrations`.
+    MIGRATE_ON_STARTUP: bool = True
 
     model_config = {"extra": "ignore"}
 
     @property
     def async_database_url(self) -> str:
-        url = self.DATABASE_URL
-        if url.startswith("postgresql://"):
-            url = url.replace("postgresql://", "postgresql+asyncpg://", 1)
-        return url
+        return _async_url(self.DATABASE_URL)
+
+    @property
+    def async_database_read_url(self) -> str:
+        return _async_url(self.DATABASE_READ_URL)
+
+
+def _async_url(url: str) -> str:
+    if url.startswith("postgresql://"):
+        url = url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
 
 
 settings = Settings()
@@ -1,11 +1,263 @@
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import AsyncExitStack, asynccontextmanager
+
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.config import settings
 
-engine = create_async_engine(settings.async_database_url, echo=False)
+logger = logging.getLogger(__name__)
+
+# Checkout waits kept for the percentile in pool_status
+_RECENT_WAITS = 1024
+
+
+class PoolStats:
+    """Checkout counters for one connection pool."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.recent = deque(maxlen=_RECENT_WAITS)
+
+    def record(self, seconds: float):
+        self.checkouts += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+        self.recent.append(seconds)
+
+    def as_dict(self) -> dict:
+        recent = sorted(self.recent)
+        p95 = recent[int(len(recent) * 0.95)] if recent else 0.0
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_ms_avg": round(1000 * self.wait_total / self.checkouts, 3) if self.checkouts else 0.0,
+            "wait_ms_p95": round(1000 * p95, 3),
+            "wait_ms_max": round(1000 * self.wait_max, 3),
+        }
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited.
+
+    The wait covers queueing for a free connection, opening a new one and
+    the pre-ping, i.e. everything a request pays before its first query.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            conn = super().connect()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return conn
+
+    def recreate(self) -> "InstrumentedPool":
+        # engine.dispose() swaps in a fresh pool; keep counting across it
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def make_engine(
+    url: str,
+    pool_size: int,
+    max_overflow: int,
+    pool_timeout: float | None = None,
+    statement_timeout: float = 0,
+) -> AsyncEngine:
+    """Engine for ``url`` with the DB_POOL_* settings.
+
+    ``pool_timeout`` defaults to DB_POOL_TIMEOUT. ``statement_timeout``
+    (seconds, 0 for none) is set on every connection the engine opens.
+    SQLite (tests, benchmarks) keeps SQLAlchemy's default pool, since an
+    in-memory database cannot use a sized queue pool.
+    """
+    if url.startswith("sqlite"):
+        return create_async_engine(url, echo=False)
+    connect_args = {"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+    if statement_timeout:
+        connect_args["server_settings"] = {"statement_timeout": str(int(statement_timeout * 1000))}
+    return create_async_engine(
+        url,
+        echo=False,
+        poolclass=InstrumentedPool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT if pool_timeout is None else pool_timeout,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
+
+engine = make_engine(
+    settings.async_database_url,
+    settings.DB_POOL_SIZE,
+    settings.DB_MAX_OVERFLOW,
+    statement_timeout=settings.DB_STATEMENT_TIMEOUT,
+)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# Scheduler jobs, ingestion and migrations get their own pool, so a long
+# bulk upsert or rebuild cannot take the connections API requests need.
+job_engine = make_engine(
+    settings.async_database_url,
+    settings.DB_JOB_POOL_SIZE,
+    settings.DB_JOB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_JOB_POOL_TIMEOUT,
+    statement_timeout=settings.DB_JOB_STATEMENT_TIMEOUT,
+)
+job_session = async_sessionmaker(job_engine, class_=AsyncSession, expire_on_commit=False)
+
+# Optional streaming replica for read-only request handlers (DATABASE_READ_URL)
+read_engine = (
+    make_engine(
+        settings.async_database_read_url,
+        settings.DB_POOL_SIZE,
+        settings.DB_MAX_OVERFLOW,
+        statement_timeout=settings.DB_STATEMENT_TIMEOUT,
+    )
+    if settings.DATABASE_READ_URL
+    else None
+)
+_read_sessionmaker = (
+    async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False) if read_engine is not None else None
+)
+
+# Seconds the replica is behind the primary: 0 when it has replayed all WAL
+# it received (an idle primary writes no new transactions to compare with).
+_REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaState:
+    """Result of the last replica lag check, shared by all requests."""
+
+    def __init__(self):
+        self.checked_at = float("-inf")
+        self.lag: float | None = None
+        self.usable = False
+        # Reads stay on the primary until then (monotonic clock), see hold_reads_on_primary
+        self.primary_until = float("-inf")
+
+
+_replica = ReplicaState()
+
 
 async def get_session() -> AsyncSession:
     async with async_session() as session:
         yield session
+
+
+async def _replica_lag(target: AsyncEngine) -> float | None:
+    """Replication lag in seconds, or None when the replica cannot be reached."""
+    try:
+        async with target.connect() as conn:
+            return float((await conn.execute(_REPLICA_LAG_SQL)).scalar())
+    except Exception:
+        logger.warning("Read replica lag check failed", exc_info=True)
+        return None
+
+
+def hold_reads_on_primary():
+    """Keep reads off the replica for READ_REPLICA_MAX_LAG_SECONDS after a write.
+
+    Called when the response cache is invalidated, so a response cached
+    under the new generation cannot come from a replica that has not
+    replayed the write yet. The lag is measured afresh once the window has
+    passed: a replica that is then within the limit has replayed the write.
+    """
+    _replica.primary_until = time.monotonic() + settings.READ_REPLICA_MAX_LAG_SECONDS
+    _replica.checked_at = float("-inf")
+
+
+async def _replica_usable() -> bool:
+    """Whether reads may go to the replica, re-checked every READ_REPLICA_CHECK_SECONDS."""
+    now = time.monotonic()
+    if now < _replica.primary_until:
+        return False
+    if now - _replica.checked_at < settings.READ_REPLICA_CHECK_SECONDS:
+        return _replica.usable
+    # Claim the check before awaiting so concurrent requests reuse the last result
+    _replica.checked_at = now
+    _replica.lag = await _replica_lag(read_engine)
+    usable = _replica.lag is not None and _replica.lag <= settings.READ_REPLICA_MAX_LAG_SECONDS
+    if usable != _replica.usable:
+        if usable:
+            logger.info("Routing reads to the replica (lag %.1fs)", _replica.lag)
+        else:
+            logger.warning("Routing reads to the primary; replica lag is %s", _replica.lag)
+    _replica.usable = usable
+    return usable
+
+
+@asynccontextmanager
+async def read_session() -> AsyncIterator[AsyncSession]:
+    """Session for read-only request handlers.
+
+    Uses the replica when DATABASE_READ_URL is set and it is no more than
+    READ_REPLICA_MAX_LAG_SECONDS behind, otherwise the primary. Reads also go
+    to the primary for that long after each ``hold_reads_on_primary()``.
+    Writers keep using ``async_session`` and scheduler jobs ``job_session``.
+    """
+    maker = _read_sessionmaker if _read_sessionmaker is not None and await _replica_usable() else async_session
+    async with maker() as session:
+        yield session
+
+
+async def prewarm_pool(target: AsyncEngine):
+    """Open ``pool_size`` connections at once and return them to the pool idle.
+
+    Run at startup so the first burst of requests does not pay for
+    connection setup (TCP, TLS and authentication) one by one.
+    """
+    pool = target.pool
+    if not isinstance(pool, InstrumentedPool):
+        return
+    async with AsyncExitStack() as stack:
+        await asyncio.gather(*(stack.enter_async_context(target.connect()) for _ in range(pool.size())))
+
+
+def _pool_status(target: AsyncEngine) -> dict:
+    pool = target.pool
+    if not isinstance(pool, InstrumentedPool):
+        return {"pool": type(pool).__name__}
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "in_use": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        **pool.stats.as_dict(),
+    }
+
+
+def pool_status() -> dict[str, dict]:
+    """Occupancy and checkout-wait statistics for each engine's pool."""
+    status = {"primary": _pool_status(engine), "jobs": _pool_status(job_engine)}
+    if read_engine is not None:
+        status["read"] = {
+            **_pool_status(read_engine),
+            "replica_lag_seconds": _replica.lag,
+            "in_use_for_reads": _replica.usable and time.monotonic() >= _replica.primary_until,
+        }
+    return status
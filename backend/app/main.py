@@ -9,7 +9,10 @@ from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 from slowapi.util import get_remote_address
 
+from app.config import settings
+from app.database import engine, pool_status, prewarm_pool, read_engine
 from app.scheduler import create_scheduler, get_backfill_status, init_db, run_startup_jobs
+from app.services import nextstrain, response_cache
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
 logger = logging.getLogger(__name__)
@@ -19,6 +22,10 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     # Startup
     await init_db()
+    if settings.DB_POOL_PREWARM:
+        await prewarm_pool(engine)
+        if read_engine is not None:
+            await prewarm_pool(read_engine)
     scheduler = create_scheduler()
     scheduler.start()
     # Run startup jobs in background so the app starts immediately
@@ -27,6 +34,7 @@ async def lifespan(app: FastAPI):
     yield
     # Shutdown
     scheduler.shutdown(wait=False)
+    await asyncio.to_thread(nextstrain.shutdown_parse_pool)
     logger.info("FluTracker backend stopped")
 
 
@@ -45,13 +53,14 @@ app.add_middleware(
 app.add_middleware(SlowAPIMiddleware)
 
 # Import and include routers (after app creation so routers can reference `app`)
-from app.routers import anomalies, cases, genomics  # noqa: E402
+from app.routers import anomalies, cases, dashboard, genomics  # noqa: E402
 from app.routers import forecast as forecast_router  # noqa: E402
 
 app.include_router(cases.router, prefix="/api")
 app.include_router(genomics.router, prefix="/api/genomics")
 app.include_router(anomalies.router, prefix="/api")
 app.include_router(forecast_router.router, prefix="/api")
+app.include_router(dashboard.router, prefix="/api")
 
 
 @app.get("/api/health")
@@ -59,6 +68,16 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/api/health/pool")
+async def health_pool():
+    return pool_status()
+
+
+@app.get("/api/health/cache")
+async def health_cache():
+    return response_cache.cache.stats()
+
+
 @app.get("/api/health/backfill")
 async def health_backfill():
     return await get_backfill_status()
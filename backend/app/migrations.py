@@ -0,0 +1,179 @@
+"""Versioned schema migrations.
+
+Migrations are the numbered files in ``backend/migrations``
+(``0002_flu_cases_covering_indexes.sql``, ...). Each one is applied once, in
+version order, and recorded in ``schema_migrations``. ``create_all`` still
+creates missing tables and the indexes declared on the models; migrations
+bring existing deployments up to the same schema.
+
+SQL migrations run one statement at a time in autocommit mode because
+``CREATE INDEX CONCURRENTLY`` cannot run inside a transaction. A migration
+interrupted part-way is re-run from the top, so every statement must be
+idempotent (``IF NOT EXISTS`` / ``IF EXISTS``). An interrupted concurrent
+build leaves an INVALID index behind that ``IF NOT EXISTS`` would then
+accept, so those are dropped before pending migrations run.
+
+Python migrations (``0004_partition_flu_cases.py``) are for changes that
+need to inspect the database first. They define ``async def upgrade(conn)``,
+which runs in a single transaction together with the ``schema_migrations``
+insert, so they either apply completely or not at all.
+
+Migrations target PostgreSQL; on other dialects (SQLite in tests)
+``create_all`` alone defines the schema and nothing is applied.
+
+Usage (from backend/):
+    python -m app.migrations           # apply pending migrations
+    python -m app.migrations --list    # show applied and pending versions
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import logging
+import re
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.database import job_engine
+from app.models import SchemaMigration
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "migrations"
+
+# pg_advisory_lock key, so concurrently starting replicas apply migrations once
+_LOCK_KEY = 0x466C7554  # "FluT"
+
+_FILE_RE = re.compile(r"^(\d+)_(\w+)\.(sql|py)$")
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    path: Path
+
+    @property
+    def is_python(self) -> bool:
+        return self.path.suffix == ".py"
+
+    def statements(self) -> list[str]:
+        return split_statements(self.path.read_text())
+
+    def load_upgrade(self) -> Callable[[AsyncConnection], Awaitable[None]]:
+        """The ``upgrade`` coroutine function of a Python migration."""
+        spec = importlib.util.spec_from_file_location(f"migrations.m{self.version:04d}_{self.name}", self.path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module.upgrade
+
+
+def split_statements(sql: str) -> list[str]:
+    """Split a migration file into statements, dropping ``--`` comments."""
+    body = "\n".join(line.split("--", 1)[0] for line in sql.splitlines())
+    return [stmt.strip() for stmt in body.split(";") if stmt.strip()]
+
+
+def discover(directory: Path = MIGRATIONS_DIR) -> list[Migration]:
+    """Migration files in ``directory``, ordered by version."""
+    migrations = []
+    for path in directory.iterdir():
+        if m := _FILE_RE.match(path.name):
+            migrations.append(Migration(int(m[1]), m[2], path))
+    migrations.sort(key=lambda mig: mig.version)
+    versions = [mig.version for mig in migrations]
+    if len(set(versions)) != len(versions):
+        raise ValueError(f"Duplicate migration versions in {directory}: {versions}")
+    return migrations
+
+
+async def _applied_versions(conn: AsyncConnection) -> set[int]:
+    await conn.run_sync(lambda sync_conn: SchemaMigration.__table__.create(sync_conn, checkfirst=True))
+    return set((await conn.execute(select(SchemaMigration.version))).scalars())
+
+
+async def _drop_invalid_indexes(conn: AsyncConnection):
+    result = await conn.execute(
+        text(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE NOT i.indisvalid AND n.nspname = current_schema()"
+        )
+    )
+    for name in result.scalars():
+        logger.warning("Dropping invalid index %s left by an interrupted build", name)
+        await conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+
+
+async def run_migrations(directory: Path = MIGRATIONS_DIR) -> list[int]:
+    """Apply pending migrations; returns the versions applied."""
+    if job_engine.dialect.name != "postgresql":
+        logger.info("Skipping SQL migrations on %s", job_engine.dialect.name)
+        return []
+
+    applied = []
+    async with job_engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        # Index builds and table rewrites may outlast DB_JOB_STATEMENT_TIMEOUT
+        await conn.execute(text("SET statement_timeout = 0"))
+        await conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _LOCK_KEY})
+        try:
+            done = await _applied_versions(conn)
+            pending = [mig for mig in discover(directory) if mig.version not in done]
+            if pending:
+                await _drop_invalid_indexes(conn)
+            for mig in pending:
+                started = time.perf_counter()
+                logger.info("Applying migration %04d_%s", mig.version, mig.name)
+                record = SchemaMigration.__table__.insert().values(version=mig.version, name=mig.name)
+                if mig.is_python:
+                    async with job_engine.begin() as tx_conn:
+                        await tx_conn.execute(text("SET LOCAL statement_timeout = 0"))
+                        await mig.load_upgrade()(tx_conn)
+                        await tx_conn.execute(record)
+                else:
+                    for statement in mig.statements():
+                        await conn.execute(text(statement))
+                    await conn.execute(record)
+                logger.info("Applied migration %04d in %.1fs", mig.version, time.perf_counter() - started)
+                applied.append(mig.version)
+        finally:
+            await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _LOCK_KEY})
+            await conn.execute(text("RESET statement_timeout"))
+    return applied
+
+
+async def _list():
+    async with job_engine.connect() as conn:
+        done = await _applied_versions(conn) if job_engine.dialect.name == "postgresql" else set()
+        await conn.commit()
+    for mig in discover():
+        print(f"{mig.version:04d}  {'applied' if mig.version in done else 'pending':<8} {mig.name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--list", action="store_true", help="show applied and pending migrations and exit")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    async def run():
+        try:
+            if args.list:
+                await _list()
+            else:
+                applied = await run_migrations()
+                print(f"Applied {len(applied)} migration(s)")
+        finally:
+            await job_engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
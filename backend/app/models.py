@@ -5,8 +5,11 @@ from sqlalchemy import (
     Column,
     Date,
     DateTime,
+    Index,
     Integer,
+    SmallInteger,
     String,
+    TypeDecorator,
     UniqueConstraint,
 )
 from sqlalchemy import (
@@ -27,6 +30,26 @@ class FluType(str, enum.Enum):
     UNKNOWN = "unknown"
 
 
+class DataSource(str, enum.Enum):
+    WHO_FLUNET = "who_flunet"
+
+
+# Stored SMALLINT codes. Append-only: existing rows (and migrations/0005)
+# refer to them, so codes are never renumbered or reused.
+FLU_TYPE_CODES = {
+    FluType.H1N1: 1,
+    FluType.H3N2: 2,
+    FluType.H5N1: 3,
+    FluType.H7N9: 4,
+    FluType.B_YAMAGATA: 5,
+    FluType.B_VICTORIA: 6,
+    FluType.A_UNSUBTYPED: 7,
+    FluType.B_LINEAGE_UNKNOWN: 8,
+    FluType.UNKNOWN: 9,
+}
+DATA_SOURCE_CODES = {DataSource.WHO_FLUNET: 1}
+
+
 class AnomalyType(str, enum.Enum):
     SPIKE = "spike"
 
@@ -36,29 +59,110 @@ class Severity(str, enum.Enum):
     MEDIUM = "medium"
 
 
+class SmallIntEnum(TypeDecorator):
+    """A ``str`` enum stored as a SMALLINT code instead of its name.
+
+    Binds accept members, values or names, like ``Enum``; results are
+    members. Keeps repeated labels out of every row and index entry.
+    """
+
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, enum_class: type[enum.Enum], codes: dict):
+        super().__init__()
+        self.enum_class = enum_class
+        # A tuple, since type arguments form part of the statement cache key
+        self.codes = tuple(codes.items())
+        self._by_member = dict(codes)
+        self._by_code = {code: member for member, code in codes.items()}
+
+    def _member(self, value) -> enum.Enum:
+        if isinstance(value, self.enum_class):
+            return value
+        if value in self.enum_class.__members__:
+            return self.enum_class[value]
+        return self.enum_class(value)
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else self._by_member[self._member(value)]
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else self._by_code[value]
+
+
 class Base(DeclarativeBase):
     pass
 
 
 class FluCase(Base):
+    # On PostgreSQL this is range-partitioned by ``time``, one partition per
+    # ISO year (migrations/0004, app.services.partitions), with primary key
+    # (id, time) since a partitioned table's unique keys must include it.
     __tablename__ = "flu_cases"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     country_code = Column(String(10), nullable=False, index=True)
+    # Always "" for FluNet rows. An empty string takes one byte; a NULL would
+    # add a null bitmap to every row and need NULLS NOT DISTINCT in uq_flu_case.
     region = Column(String(100), default="")
     city = Column(String(100), default="")
-    flu_type = Column(SAEnum(FluType, native_enum=False), nullable=False)
-    source = Column(String(50), nullable=False, default="who_flunet")
-    time = Column(Date, nullable=False, index=True)
+    flu_type = Column(SmallIntEnum(FluType, FLU_TYPE_CODES), nullable=False)
+    source = Column(SmallIntEnum(DataSource, DATA_SOURCE_CODES), nullable=False, default=DataSource.WHO_FLUNET)
+    # Indexed by ix_flu_cases_time_country, which leads with time
+    time = Column(Date, nullable=False)
     new_cases = Column(Integer, nullable=False, default=0)
-    iso_year = Column(Integer, nullable=False)
-    iso_week = Column(Integer, nullable=False)
+    iso_year = Column(SmallInteger, nullable=False)
+    iso_week = Column(SmallInteger, nullable=False)
 
     __table_args__ = (
         UniqueConstraint("country_code", "region", "city", "flu_type", "source", "time", name="uq_flu_case"),
+        # Covers the rollup refresh (time IN weeks, grouped by country or
+        # subtype) and the dominant-subtype lookup as index-only scans.
+        # Existing deployments get it from migrations/0002.
+        Index("ix_flu_cases_time_country", "time", "country_code", postgresql_include=["new_cases", "flu_type"]),
+    )
+
+
+# Weekly rollups of flu_cases, kept in step by app.services.rollup. The case
+# endpoints, forecasts and anomaly detection read these instead of
+# re-aggregating flu_cases on every request.
+
+
+class CasesByWeek(Base):
+    """Total new cases per week across all countries and subtypes."""
+
+    __tablename__ = "cases_weekly"
+
+    time = Column(Date, primary_key=True)
+    new_cases = Column(Integer, nullable=False, default=0)
+
+
+class CasesByWeekCountry(Base):
+    """New cases per week and country, summed over subtypes."""
+
+    __tablename__ = "cases_weekly_country"
+
+    time = Column(Date, primary_key=True)
+    country_code = Column(String(10), primary_key=True)
+    new_cases = Column(Integer, nullable=False, default=0)
+
+    # Per-country series (historical, forecast) range over time within one country
+    __table_args__ = (
+        Index("ix_cases_weekly_country_country_time", "country_code", "time", postgresql_include=["new_cases"]),
     )
 
 
+class CasesByWeekFluType(Base):
+    """New cases per week and subtype, summed over countries."""
+
+    __tablename__ = "cases_weekly_flu_type"
+
+    time = Column(Date, primary_key=True)
+    flu_type = Column(SmallIntEnum(FluType, FLU_TYPE_CODES), primary_key=True)
+    new_cases = Column(Integer, nullable=False, default=0)
+
+
 class GenomicSequence(Base):
     __tablename__ = "genomic_sequences"
 
@@ -69,7 +173,24 @@ class GenomicSequence(Base):
     collection_date = Column(Date, nullable=False)
     count = Column(Integer, nullable=False, default=1)
 
-    __table_args__ = (UniqueConstraint("country_code", "clade", "lineage", "collection_date", name="uq_genomic_seq"),)
+    __table_args__ = (
+        UniqueConstraint("country_code", "clade", "lineage", "collection_date", name="uq_genomic_seq"),
+        # Genomics trends range over collection_date and group by clade (and
+        # country when filtered); lineage-filtered variants lead with lineage.
+        # Existing deployments get both from migrations/0003.
+        Index(
+            "ix_genomic_sequences_date_clade",
+            "collection_date",
+            "clade",
+            postgresql_include=["country_code", "count"],
+        ),
+        Index(
+            "ix_genomic_sequences_lineage_date",
+            "lineage",
+            "collection_date",
+            postgresql_include=["clade", "country_code", "count"],
+        ),
+    )
 
 
 class Anomaly(Base):
@@ -88,6 +209,69 @@ class Anomaly(Base):
     # Single-column index: /api/anomalies orders by detected_at only (no
     # additional equality filters on severity or anomaly_type), so a composite
     # index would not improve that query.
-    # For existing deployments run migrations/add_anomaly_detected_at_index.sql
-    # which uses CREATE INDEX CONCURRENTLY to avoid locking the table.
+    # Existing deployments get it from migrations/0001, which uses
+    # CREATE INDEX CONCURRENTLY to avoid locking the table.
     detected_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+class IngestionWatermark(Base):
+    """Per-source high-water mark so incremental jobs only fetch new data."""
+
+    __tablename__ = "ingestion_watermarks"
+
+    source = Column(String(50), primary_key=True)
+    iso_year = Column(Integer, nullable=True)
+    iso_week = Column(Integer, nullable=True)
+    # Raw Last-Modified header from the upstream API, echoed back as
+    # If-Modified-Since on the next run when the API exposes one.
+    last_modified = Column(String(100), nullable=True)
+    # SHA-256 over the response pages of the last run whose rows were
+    # committed; an identical response next time is not parsed again.
+    content_sha256 = Column(String(64), nullable=True)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class BackfillCheckpoint(Base):
+    """A backfill unit (one FluNet ISO year) already committed by an unfinished run.
+
+    Rows exist only while a backfill is incomplete: a retry skips the units
+    listed here, and a successful run clears them.
+    """
+
+    __tablename__ = "backfill_checkpoints"
+
+    job = Column(String(100), primary_key=True)
+    unit = Column(Integer, primary_key=True)
+    rows = Column(Integer, nullable=False, default=0)
+    # Latest ISO week seen in the unit, so the run's watermark covers resumed units
+    latest_iso_week = Column(Integer, nullable=True)
+    completed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class DatasetVersion(Base):
+    """Upstream version of a Nextstrain dataset as of its last successful ingest.
+
+    Lets the ingester skip datasets that have not changed since: the
+    validators are sent as If-None-Match / If-Modified-Since, and a body
+    whose hash matches is not parsed again.
+    """
+
+    __tablename__ = "dataset_versions"
+
+    dataset = Column(String(200), primary_key=True)
+    etag = Column(String(200), nullable=True)
+    last_modified = Column(String(100), nullable=True)
+    # The dataset's own meta.updated stamp, kept for logging and diagnostics
+    meta_updated = Column(String(50), nullable=True)
+    sha256 = Column(String(64), nullable=True)
+    ingested_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class SchemaMigration(Base):
+    """A file from ``backend/migrations`` that ``app.migrations`` has applied."""
+
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String(200), nullable=False)
+    applied_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -1,26 +1,33 @@
 from fastapi import APIRouter
 from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import async_session
+from app.database import read_session
 from app.models import Anomaly
 from app.schemas import AnomalyOut
+from app.services.response_cache import cached_response
 
 router = APIRouter()
 
 
+async def anomalies_panel(session: AsyncSession) -> list[AnomalyOut]:
+    result = await session.execute(select(Anomaly).order_by(desc(Anomaly.detected_at)).limit(50))
+    return [
+        AnomalyOut(
+            id=a.id,
+            country_code=a.country_code,
+            country_name=a.country_name,
+            anomaly_type=a.anomaly_type,
+            severity=a.severity,
+            message=a.message,
+            detected_at=a.detected_at,
+        )
+        for a in result.scalars()
+    ]
+
+
 @router.get("/anomalies", response_model=list[AnomalyOut])
+@cached_response
 async def get_anomalies():
-    async with async_session() as session:
-        result = await session.execute(select(Anomaly).order_by(desc(Anomaly.detected_at)).limit(50))
-        return [
-            AnomalyOut(
-                id=a.id,
-                country_code=a.country_code,
-                country_name=a.country_name,
-                anomaly_type=a.anomaly_type,
-                severity=a.severity,
-                message=a.message,
-                detected_at=a.detected_at,
-            )
-            for a in result.scalars()
-        ]
+    async with read_session() as session:
+        return await anomalies_panel(session)
@@ -1,12 +1,14 @@
 from datetime import date
 
 from fastapi import APIRouter, Query
-from sqlalchemy import String, and_, case, cast, desc, func, select
+from sqlalchemy import and_, case, desc, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import async_session
-from app.models import FluCase
+from app.database import read_session
+from app.models import CasesByWeek, CasesByWeekCountry, CasesByWeekFluType, FluCase
 from app.population import get_population
 from app.schemas import CaseSummary, CountryRow, HistoricalPoint, MapDataPoint, SubtypePoint
+from app.services.response_cache import cached_response
 from app.utils import weeks_ago
 
 router = APIRouter()
@@ -17,104 +19,97 @@ def _per_100k(cases: int, cc: str) -> float:
     return round(cases / pop * 100000, 2) if pop else 0
 
 
-@router.get("/cases/summary", response_model=CaseSummary)
-async def cases_summary():
-    async with async_session() as session:
-        summary_r = await session.execute(
-            select(
-                func.max(FluCase.time).label("max_date"),
-                func.sum(FluCase.new_cases).label("total_cases"),
-                func.count(func.distinct(FluCase.country_code)).label("countries_reporting"),
-            )
-        )
-        summary = summary_r.one()
-        max_date = summary.max_date
-        if not max_date:
-            return CaseSummary()
-
-        current_cutoff = weeks_ago(max_date, 1)
-        prior_cutoff = weeks_ago(max_date, 2)
-
-        week_totals_r = await session.execute(
-            select(
-                func.sum(case((FluCase.time >= current_cutoff, FluCase.new_cases), else_=0)).label(
-                    "current_week_cases"
-                ),
-                func.sum(
-                    case(
-                        (
-                            and_(
-                                FluCase.time >= prior_cutoff,
-                                FluCase.time < current_cutoff,
-                            ),
-                            FluCase.new_cases,
-                        ),
-                        else_=0,
-                    )
-                ).label("prior_week_cases"),
-            )
-        )
-        week_totals = week_totals_r.one()
-        current_week = week_totals.current_week_cases or 0
-        prior_week = week_totals.prior_week_cases or 0
-
-        change = ((current_week - prior_week) / prior_week * 100) if prior_week else 0
-
-        return CaseSummary(
-            total_cases=summary.total_cases or 0,
-            countries_reporting=summary.countries_reporting or 0,
-            current_week_cases=current_week,
-            prior_week_cases=prior_week,
-            week_change_pct=round(change, 1),
-        )
+async def latest_week(session: AsyncSession) -> date | None:
+    """Newest week in the rollups; the summary, map, subtype and country panels count back from it."""
+    return (await session.execute(select(func.max(CasesByWeek.time)))).scalar()
 
 
-@router.get("/cases/map", response_model=list[MapDataPoint])
-async def cases_map():
-    async with async_session() as session:
-        max_date_r = await session.execute(select(func.max(FluCase.time)))
-        max_date = max_date_r.scalar()
-        if not max_date:
-            return []
+async def summary_panel(session: AsyncSession, max_date: date | None) -> CaseSummary:
+    if not max_date:
+        return CaseSummary()
 
-        cutoff = weeks_ago(max_date, 4)
-        q = (
-            select(
-                FluCase.country_code,
-                func.sum(FluCase.new_cases).label("total"),
-            )
-            .where(FluCase.time >= cutoff)
-            .group_by(FluCase.country_code)
+    total_r = await session.execute(select(func.sum(CasesByWeek.new_cases)))
+    total_cases = total_r.scalar()
+
+    # count(*) over DISTINCT hashes; count(DISTINCT ...) would sort every row
+    countries_r = await session.execute(
+        select(func.count()).select_from(select(CasesByWeekCountry.country_code).distinct().subquery())
+    )
+    countries_reporting = countries_r.scalar()
+
+    current_cutoff = weeks_ago(max_date, 1)
+    prior_cutoff = weeks_ago(max_date, 2)
+
+    week_totals_r = await session.execute(
+        select(
+            func.sum(case((CasesByWeek.time >= current_cutoff, CasesByWeek.new_cases), else_=0)).label(
+                "current_week_cases"
+            ),
+            func.sum(
+                case(
+                    (
+                        and_(
+                            CasesByWeek.time >= prior_cutoff,
+                            CasesByWeek.time < current_cutoff,
+                        ),
+                        CasesByWeek.new_cases,
+                    ),
+                    else_=0,
+                )
+            ).label("prior_week_cases"),
+        ).where(CasesByWeek.time >= prior_cutoff)
+    )
+    week_totals = week_totals_r.one()
+    current_week = week_totals.current_week_cases or 0
+    prior_week = week_totals.prior_week_cases or 0
+
+    change = ((current_week - prior_week) / prior_week * 100) if prior_week else 0
+
+    return CaseSummary(
+        total_cases=total_cases or 0,
+        countries_reporting=countries_reporting or 0,
+        current_week_cases=current_week,
+        prior_week_cases=prior_week,
+        week_change_pct=round(change, 1),
+    )
+
+
+async def map_panel(session: AsyncSession, max_date: date | None) -> list[MapDataPoint]:
+    if not max_date:
+        return []
+
+    cutoff = weeks_ago(max_date, 4)
+    q = (
+        select(
+            CasesByWeekCountry.country_code,
+            func.sum(CasesByWeekCountry.new_cases).label("total"),
         )
-        result = await session.execute(q)
-        return [
-            MapDataPoint(
-                country_code=r.country_code,
-                total_cases=r.total,
-                per_100k=_per_100k(r.total, r.country_code),
-            )
-            for r in result
-        ]
+        .where(CasesByWeekCountry.time >= cutoff)
+        .group_by(CasesByWeekCountry.country_code)
+    )
+    result = await session.execute(q)
+    return [
+        MapDataPoint(
+            country_code=r.country_code,
+            total_cases=r.total,
+            per_100k=_per_100k(r.total, r.country_code),
+        )
+        for r in result
+    ]
 
 
-@router.get("/cases/historical", response_model=list[HistoricalPoint])
-async def cases_historical(
-    country: str = Query("", max_length=2, description="Country code filter"),
-):
+async def historical_panel(session: AsyncSession, country: str = "") -> list[HistoricalPoint]:
     """Season comparison data — current + past 9 seasons, normalized Oct-Sep."""
-    async with async_session() as session:
+    if country:
         q = (
-            select(
-                FluCase.time,
-                func.sum(FluCase.new_cases).label("total"),
-            )
-            .group_by(FluCase.time)
-            .order_by(FluCase.time)
+            select(CasesByWeekCountry.time, CasesByWeekCountry.new_cases.label("total"))
+            .where(CasesByWeekCountry.country_code == country.upper())
+            .order_by(CasesByWeekCountry.time)
         )
-        if country:
-            q = q.where(FluCase.country_code == country.upper())
-        result = await session.execute(q)
-        rows = list(result)
+    else:
+        q = select(CasesByWeek.time, CasesByWeek.new_cases.label("total")).order_by(CasesByWeek.time)
+    result = await session.execute(q)
+    rows = list(result)
 
     if not rows:
         return []
@@ -140,106 +135,90 @@ async def cases_historical(
     return points
 
 
-@router.get("/cases/subtypes", response_model=list[SubtypePoint])
-async def cases_subtypes():
-    async with async_session() as session:
-        max_date_r = await session.execute(select(func.max(FluCase.time)))
-        max_date = max_date_r.scalar()
-        if not max_date:
-            return []
-
-        cutoff = weeks_ago(max_date, 52)
-        flu_type_label = cast(FluCase.flu_type, String).label("flu_type")
-        q = (
-            select(
-                FluCase.time,
-                flu_type_label,
-                func.sum(FluCase.new_cases).label("total"),
-            )
-            .where(FluCase.time >= cutoff)
-            .group_by(FluCase.time, flu_type_label)
-            .order_by(FluCase.time)
+async def subtypes_panel(session: AsyncSession, max_date: date | None) -> list[SubtypePoint]:
+    if not max_date:
+        return []
+
+    cutoff = weeks_ago(max_date, 52)
+    q = (
+        select(
+            CasesByWeekFluType.time,
+            CasesByWeekFluType.flu_type,
+            CasesByWeekFluType.new_cases.label("total"),
         )
-        result = await session.execute(q)
-        return [SubtypePoint(date=r.time.isoformat(), subtype=r.flu_type, cases=r.total) for r in result]
+        .where(CasesByWeekFluType.time >= cutoff)
+        .order_by(CasesByWeekFluType.time)
+    )
+    result = await session.execute(q)
+    return [SubtypePoint(date=r.time.isoformat(), subtype=r.flu_type.name, cases=r.total) for r in result]
 
 
-@router.get("/cases/countries", response_model=list[CountryRow])
-async def cases_countries(
-    search: str = Query("", max_length=64, description="Search filter"),
-    continent: str = Query("", max_length=32, description="Continent filter"),
-    flu_type: str = Query("", max_length=32, description="Flu type filter"),
-    sort: str = Query("cases", max_length=32, description="Sort field"),
-):
-    async with async_session() as session:
-        max_date_r = await session.execute(select(func.max(FluCase.time)))
-        max_date = max_date_r.scalar()
-        if not max_date:
-            return []
+async def countries_panel(session: AsyncSession, max_date: date | None, search: str = "") -> list[CountryRow]:
+    if not max_date:
+        return []
 
-        cutoff = weeks_ago(max_date, 4)
+    cutoff = weeks_ago(max_date, 4)
 
-        # Current period totals
-        q = (
-            select(
-                FluCase.country_code,
-                func.sum(FluCase.new_cases).label("total"),
-            )
-            .where(FluCase.time >= cutoff)
-            .group_by(FluCase.country_code)
-            .order_by(desc("total"))
+    # Current period totals
+    q = (
+        select(
+            CasesByWeekCountry.country_code,
+            func.sum(CasesByWeekCountry.new_cases).label("total"),
         )
-        result = await session.execute(q)
-        current_data = {r.country_code: r.total for r in result}
-
-        # Prior year same period
-        prior_start = weeks_ago(cutoff, 52)
-        prior_end = weeks_ago(cutoff, 48)
-        prior_q = (
-            select(
-                FluCase.country_code,
-                func.sum(FluCase.new_cases).label("total"),
-            )
-            .where(FluCase.time >= prior_start, FluCase.time < prior_end)
-            .group_by(FluCase.country_code)
+        .where(CasesByWeekCountry.time >= cutoff)
+        .group_by(CasesByWeekCountry.country_code)
+        .order_by(desc("total"))
+    )
+    result = await session.execute(q)
+    current_data = {r.country_code: r.total for r in result}
+
+    # Prior year same period
+    prior_start = weeks_ago(cutoff, 52)
+    prior_end = weeks_ago(cutoff, 48)
+    prior_q = (
+        select(
+            CasesByWeekCountry.country_code,
+            func.sum(CasesByWeekCountry.new_cases).label("total"),
         )
-        prior_result = await session.execute(prior_q)
-        prior_data = {r.country_code: r.total for r in prior_result}
-
-        # Dominant type per country (current period)
-        flu_type_label = cast(FluCase.flu_type, String).label("flu_type")
-        dom_q = (
-            select(
-                FluCase.country_code,
-                flu_type_label,
-                func.sum(FluCase.new_cases).label("total"),
-            )
-            .where(FluCase.time >= cutoff)
-            .group_by(FluCase.country_code, flu_type_label)
-            .order_by(desc("total"))
+        .where(CasesByWeekCountry.time >= prior_start, CasesByWeekCountry.time < prior_end)
+        .group_by(CasesByWeekCountry.country_code)
+    )
+    prior_result = await session.execute(prior_q)
+    prior_data = {r.country_code: r.total for r in prior_result}
+
+    # Dominant type per country (current period). No rollup has this
+    # grain; the time index bounds the scan to the last four weeks.
+    dom_q = (
+        select(
+            FluCase.country_code,
+            FluCase.flu_type,
+            func.sum(FluCase.new_cases).label("total"),
         )
-        dom_result = await session.execute(dom_q)
-        dominant = {}
-        for r in dom_result:
-            if r.country_code not in dominant:
-                dominant[r.country_code] = r.flu_type
-
-        # Sparkline data (last 12 weeks)
-        spark_cutoff = weeks_ago(max_date, 12)
-        spark_q = (
-            select(
-                FluCase.country_code,
-                FluCase.time,
-                func.sum(FluCase.new_cases).label("total"),
-            )
-            .where(FluCase.time >= spark_cutoff)
-            .group_by(FluCase.country_code, FluCase.time)
-            .order_by(FluCase.time)
+        .where(FluCase.time >= cutoff)
+        .group_by(FluCase.country_code, FluCase.flu_type)
+        .order_by(desc("total"))
+    )
+    dom_result = await session.execute(dom_q)
+    dominant = {}
+    for r in dom_result:
+        if r.country_code not in dominant:
+            dominant[r.country_code] = r.flu_type.name
+
+    # Sparkline data (last 12 weeks)
+    spark_cutoff = weeks_ago(max_date, 12)
+    spark_q = (
+        select(
+            CasesByWeekCountry.country_code,
+            CasesByWeekCountry.time,
+            CasesByWeekCountry.new_cases.label("total"),
         )
-        spark_result = await session.execute(spark_q)
-        sparklines = {}
-        for r in spark_result:
-            sparklines.setdefault(r.country_code, []).append(r.total)
+        .where(CasesByWeekCountry.time >= spark_cutoff)
+        .order_by(CasesByWeekCountry.time)
+    )
+    spark_result = await session.execute(spark_q)
+    sparklines = {}
+    for r in spark_result:
+        sparklines.setdefault(r.country_code, []).append(r.total)
 
     rows = []
     sorted_countries = sorted(current_data.items(), key=lambda x: x[1], reverse=True)
@@ -270,3 +249,46 @@ async def cases_countries(
         )
 
     return rows[:50]
+
+
+@router.get("/cases/summary", response_model=CaseSummary)
+@cached_response
+async def cases_summary():
+    async with read_session() as session:
+        return await summary_panel(session, await latest_week(session))
+
+
+@router.get("/cases/map", response_model=list[MapDataPoint])
+@cached_response
+async def cases_map():
+    async with read_session() as session:
+        return await map_panel(session, await latest_week(session))
+
+
+@router.get("/cases/historical", response_model=list[HistoricalPoint])
+@cached_response
+async def cases_historical(
+    country: str = Query("", max_length=2, description="Country code filter"),
+):
+    """Season comparison data — current + past 9 seasons, normalized Oct-Sep."""
+    async with read_session() as session:
+        return await historical_panel(session, country)
+
+
+@router.get("/cases/subtypes", response_model=list[SubtypePoint])
+@cached_response
+async def cases_subtypes():
+    async with read_session() as session:
+        return await subtypes_panel(session, await latest_week(session))
+
+
+@router.get("/cases/countries", response_model=list[CountryRow])
+@cached_response
+async def cases_countries(
+    search: str = Query("", max_length=64, description="Search filter"),
+    continent: str = Query("", max_length=32, description="Continent filter"),
+    flu_type: str = Query("", max_length=32, description="Flu type filter"),
+    sort: str = Query("cases", max_length=32, description="Sort field"),
+):
+    async with read_session() as session:
+        return await countries_panel(session, await latest_week(session), search)
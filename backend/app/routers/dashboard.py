@@ -0,0 +1,68 @@
+"""All dashboard panels in one request.
+
+The dashboard page needs eight panels. Fetching them one endpoint at a time
+costs eight round trips and eight rate-limit hits, and each endpoint looks
+up the latest week again. Here that watermark is read once. The panels
+then run concurrently, each on its own pooled read session, and come back
+in a single (cached) response.
+"""
+
+import asyncio
+
+from fastapi import APIRouter, Query
+
+from app.database import read_session
+from app.routers.anomalies import anomalies_panel
+from app.routers.cases import countries_panel, historical_panel, latest_week, map_panel, subtypes_panel, summary_panel
+from app.routers.genomics import trends_panel
+from app.schemas import Dashboard
+from app.services.forecast import generate_forecast
+from app.services.response_cache import cached_response, is_cacheable, uncacheable
+
+router = APIRouter()
+
+PANELS = ("summary", "map", "historical", "forecast", "subtypes", "countries", "anomalies", "genomic_trends")
+# Panels whose queries count back from the latest week in the rollups
+_FROM_LATEST_WEEK = {"summary", "map", "subtypes", "countries"}
+_PANELS_PATTERN = f"^({'|'.join(PANELS)})(,({'|'.join(PANELS)}))*$"
+
+
+@router.get("/dashboard", response_model=Dashboard)
+@cached_response
+async def dashboard(
+    panels: str = Query(",".join(PANELS), max_length=200, pattern=_PANELS_PATTERN, description="Panels to include"),
+    country: str = Query("", max_length=2, description="Country code filter for historical and forecast"),
+):
+    requested = [name for name in PANELS if name in panels.split(",")]
+    max_date = None
+    if _FROM_LATEST_WEEK.intersection(requested):
+        async with read_session() as session:
+            max_date = await latest_week(session)
+
+    async def load(name: str):
+        if name == "forecast":
+            # Opens its own read session
+            return await generate_forecast(country_code=country or None)
+        async with read_session() as session:
+            if name == "summary":
+                return await summary_panel(session, max_date)
+            if name == "map":
+                return await map_panel(session, max_date)
+            if name == "historical":
+                return await historical_panel(session, country)
+            if name == "subtypes":
+                return await subtypes_panel(session, max_date)
+            if name == "countries":
+                return await countries_panel(session, max_date)
+            if name == "anomalies":
+                return await anomalies_panel(session)
+            return await trends_panel(session)
+
+    async def panel(name: str):
+        # uncacheable() inside the task only marks the task's copy of the context
+        return await load(name), is_cacheable()
+
+    results = await asyncio.gather(*(panel(name) for name in requested))
+    if not all(cacheable for _, cacheable in results):
+        uncacheable()
+    return Dashboard(**{name: data for name, (data, _) in zip(requested, results)})
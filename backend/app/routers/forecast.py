@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Query
 
 from app.services.forecast import generate_forecast
+from app.services.response_cache import cached_response
 
 router = APIRouter()
 
 
 @router.get("/forecast")
+@cached_response
 async def get_forecast(
     country: str = Query("", max_length=2, description="Country code filter"),
     weeks: int = Query(8, ge=1, le=52, description="Weeks to forecast"),
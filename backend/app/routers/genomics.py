@@ -2,92 +2,115 @@ from datetime import timedelta
 
 from fastapi import APIRouter, Query
 from sqlalchemy import desc, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import async_session
+from app.database import read_session
 from app.models import GenomicSequence
 from app.schemas import GenomicCountryRow, GenomicSummary, GenomicTrendPoint
+from app.services.response_cache import cached_response
 
 router = APIRouter()
 
 
+async def trends_panel(
+    session: AsyncSession, years: int = 1, country: str = "", top_n: int = 6, lineage: str = ""
+) -> list[GenomicTrendPoint]:
+    max_date_q = select(func.max(GenomicSequence.collection_date))
+    if lineage:
+        max_date_q = max_date_q.where(GenomicSequence.lineage == lineage)
+    max_date_r = await session.execute(max_date_q)
+    max_date = max_date_r.scalar()
+    if not max_date:
+        return []
+    cutoff = max_date - timedelta(days=years * 365)
+
+    # Get top clades
+    top_q = (
+        select(
+            GenomicSequence.clade,
+            func.sum(GenomicSequence.count).label("total"),
+        )
+        .where(GenomicSequence.collection_date >= cutoff)
+        .group_by(GenomicSequence.clade)
+        .order_by(desc("total"))
+        .limit(top_n)
+    )
+    if country:
+        top_q = top_q.where(GenomicSequence.country_code == country)
+    if lineage:
+        top_q = top_q.where(GenomicSequence.lineage == lineage)
+
+    top_result = await session.execute(top_q)
+    top_clades = [r.clade for r in top_result]
+
+    if not top_clades:
+        return []
+
+    # Monthly trends for top clades — use extract() for DB-agnostic grouping
+    year_col = func.extract("year", GenomicSequence.collection_date).label("yr")
+    month_col = func.extract("month", GenomicSequence.collection_date).label("mn")
+    q = (
+        select(
+            year_col,
+            month_col,
+            GenomicSequence.clade,
+            func.sum(GenomicSequence.count).label("total"),
+        )
+        .where(
+            GenomicSequence.collection_date >= cutoff,
+            GenomicSequence.clade.in_(top_clades),
+        )
+        .group_by(year_col, month_col, GenomicSequence.clade)
+        .order_by(year_col, month_col)
+    )
+    if country:
+        q = q.where(GenomicSequence.country_code == country)
+    if lineage:
+        q = q.where(GenomicSequence.lineage == lineage)
+
+    result = await session.execute(q)
+    return [
+        GenomicTrendPoint(
+            date=f"{int(r.yr)}-{int(r.mn):02d}-01",
+            clade=r.clade,
+            count=r.total,
+        )
+        for r in result
+    ]
+
+
 @router.get("/trends", response_model=list[GenomicTrendPoint])
+@cached_response
 async def genomic_trends(
     years: int = Query(1, ge=1, le=10, description="Years of data"),
     country: str = Query("", max_length=2, description="Country filter"),
     top_n: int = Query(6, ge=1, le=100, description="Top N clades"),
+    lineage: str = Query("", max_length=100, description="Lineage filter, e.g. H3N2 or B/Victoria"),
 ):
-    async with async_session() as session:
-        max_date_r = await session.execute(select(func.max(GenomicSequence.collection_date)))
-        max_date = max_date_r.scalar()
-        if not max_date:
-            return []
-        cutoff = max_date - timedelta(days=years * 365)
-
-        # Get top clades
-        top_q = (
-            select(
-                GenomicSequence.clade,
-                func.sum(GenomicSequence.count).label("total"),
-            )
-            .where(GenomicSequence.collection_date >= cutoff)
-            .group_by(GenomicSequence.clade)
-            .order_by(desc("total"))
-            .limit(top_n)
-        )
-        if country:
-            top_q = top_q.where(GenomicSequence.country_code == country)
-
-        top_result = await session.execute(top_q)
-        top_clades = [r.clade for r in top_result]
-
-        if not top_clades:
-            return []
-
-        # Monthly trends for top clades — use extract() for DB-agnostic grouping
-        year_col = func.extract("year", GenomicSequence.collection_date).label("yr")
-        month_col = func.extract("month", GenomicSequence.collection_date).label("mn")
-        q = (
-            select(
-                year_col,
-                month_col,
-                GenomicSequence.clade,
-                func.sum(GenomicSequence.count).label("total"),
-            )
-            .where(
-                GenomicSequence.collection_date >= cutoff,
-                GenomicSequence.clade.in_(top_clades),
-            )
-            .group_by(year_col, month_col, GenomicSequence.clade)
-            .order_by(year_col, month_col)
-        )
-        if country:
-            q = q.where(GenomicSequence.country_code == country)
-
-        result = await session.execute(q)
-        return [
-            GenomicTrendPoint(
-                date=f"{int(r.yr)}-{int(r.mn):02d}-01",
-                clade=r.clade,
-                count=r.total,
-            )
-            for r in result
-        ]
+    async with read_session() as session:
+        return await trends_panel(session, years, country, top_n, lineage)
 
 
 @router.get("/summary", response_model=GenomicSummary)
-async def genomic_summary():
-    async with async_session() as session:
-        total_r = await session.execute(select(func.sum(GenomicSequence.count)))
+@cached_response
+async def genomic_summary(
+    lineage: str = Query("", max_length=100, description="Lineage filter, e.g. H3N2 or B/Victoria"),
+):
+    def filtered(q):
+        return q.where(GenomicSequence.lineage == lineage) if lineage else q
+
+    async with read_session() as session:
+        total_r = await session.execute(filtered(select(func.sum(GenomicSequence.count))))
         total = total_r.scalar() or 0
 
-        countries_r = await session.execute(select(func.count(func.distinct(GenomicSequence.country_code))))
+        countries_r = await session.execute(filtered(select(func.count(func.distinct(GenomicSequence.country_code)))))
         countries = countries_r.scalar() or 0
 
-        clades_r = await session.execute(select(func.count(func.distinct(GenomicSequence.clade))))
+        clades_r = await session.execute(filtered(select(func.count(func.distinct(GenomicSequence.clade)))))
         clades = clades_r.scalar() or 0
 
         dom_r = await session.execute(
-            select(GenomicSequence.clade, func.sum(GenomicSequence.count).label("total"))
+            filtered(select(GenomicSequence.clade, func.sum(GenomicSequence.count).label("total")))
             .group_by(GenomicSequence.clade)
             .order_by(desc("total"))
             .limit(1)
@@ -104,25 +127,27 @@ async def genomic_summary():
 
 
 @router.get("/countries", response_model=list[GenomicCountryRow])
-async def genomic_countries():
-    async with async_session() as session:
-        ranked_clades = (
-            select(
-                GenomicSequence.country_code,
-                GenomicSequence.clade,
-                func.sum(func.sum(GenomicSequence.count))
-                .over(partition_by=GenomicSequence.country_code)
-                .label("country_total"),
-                func.row_number()
-                .over(
-                    partition_by=GenomicSequence.country_code,
-                    order_by=(desc(func.sum(GenomicSequence.count)), GenomicSequence.clade),
-                )
-                .label("rn"),
+@cached_response
+async def genomic_countries(
+    lineage: str = Query("", max_length=100, description="Lineage filter, e.g. H3N2 or B/Victoria"),
+):
+    async with read_session() as session:
+        ranked_clades = select(
+            GenomicSequence.country_code,
+            GenomicSequence.clade,
+            func.sum(func.sum(GenomicSequence.count))
+            .over(partition_by=GenomicSequence.country_code)
+            .label("country_total"),
+            func.row_number()
+            .over(
+                partition_by=GenomicSequence.country_code,
+                order_by=(desc(func.sum(GenomicSequence.count)), GenomicSequence.clade),
             )
-            .group_by(GenomicSequence.country_code, GenomicSequence.clade)
-            .subquery()
-        )
+            .label("rn"),
+        ).group_by(GenomicSequence.country_code, GenomicSequence.clade)
+        if lineage:
+            ranked_clades = ranked_clades.where(GenomicSequence.lineage == lineage)
+        ranked_clades = ranked_clades.subquery()
 
         q = (
             select(
@@ -5,10 +5,13 @@ from datetime import date
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
-from sqlalchemy import delete, func, select
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import async_session, engine
-from app.models import Anomaly, Base, FluCase, GenomicSequence
+from app.config import settings
+from app.database import job_engine, job_session, read_session
+from app.migrations import run_migrations
+from app.models import Base, FluCase, GenomicSequence
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +24,7 @@ STARTUP_BACKFILL_RETRY_SECONDS = 15
 async def _run_who_flunet():
     from app.services.flunet import ingest_flunet
 
-    logger.info("Running WHO FluNet ingestion (last 4 weeks)")
+    logger.info("Running WHO FluNet incremental ingestion")
     await ingest_flunet(weeks_back=4)
 
 
@@ -34,19 +37,10 @@ async def _run_anomaly_detection():
 
 async def _run_full_rebuild():
     from app.services.anomaly import detect_anomalies
-    from app.services.flunet import ingest_flunet_full
-    from app.services.nextstrain import ingest_nextstrain
+    from app.services.rebuild import run_full_rebuild
 
     logger.info("Running full daily rebuild")
-    async with async_session() as session:
-        await session.execute(delete(FluCase))
-        await session.execute(delete(GenomicSequence))
-        await session.execute(delete(Anomaly))
-        await session.commit()
-    logger.info("Cleared all tables for rebuild")
-
-    await ingest_flunet_full()
-    await ingest_nextstrain()
+    await run_full_rebuild()
     await detect_anomalies()
     logger.info("Full rebuild complete")
 
@@ -79,10 +73,15 @@ def create_scheduler() -> AsyncIOScheduler:
 
 
 async def init_db():
-    """Create tables if they don't exist."""
-    async with engine.begin() as conn:
+    """Create tables if they don't exist and apply pending migrations."""
+    from app.services.rollup import ensure_rollups
+
+    async with job_engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     logger.info("Database tables created/verified")
+    if settings.MIGRATE_ON_STARTUP:
+        await run_migrations()
+    await ensure_rollups()
 
 
 async def run_startup_jobs():
@@ -113,25 +112,35 @@ def _span_days(min_date: date | None, max_date: date | None) -> int | None:
     return (max_date - min_date).days
 
 
-async def _get_flu_case_span() -> tuple[date | None, date | None, int | None]:
-    async with async_session() as session:
-        result = await session.execute(
-            select(func.min(FluCase.time).label("min_date"), func.max(FluCase.time).label("max_date"))
+async def _flu_case_span(session: AsyncSession) -> tuple[date | None, date | None, int | None]:
+    result = await session.execute(
+        select(func.min(FluCase.time).label("min_date"), func.max(FluCase.time).label("max_date"))
+    )
+    row = result.one()
+    return row.min_date, row.max_date, _span_days(row.min_date, row.max_date)
+
+
+async def _genomics_span(session: AsyncSession) -> tuple[date | None, date | None, int | None]:
+    result = await session.execute(
+        select(
+            func.min(GenomicSequence.collection_date).label("min_date"),
+            func.max(GenomicSequence.collection_date).label("max_date"),
         )
-        row = result.one()
-        return row.min_date, row.max_date, _span_days(row.min_date, row.max_date)
+    )
+    row = result.one()
+    return row.min_date, row.max_date, _span_days(row.min_date, row.max_date)
+
+
+# The startup backfill checks the primary on the job pool; a lagging replica
+# would make it re-ingest data that is already there.
+async def _get_flu_case_span() -> tuple[date | None, date | None, int | None]:
+    async with job_session() as session:
+        return await _flu_case_span(session)
 
 
 async def _get_genomics_span() -> tuple[date | None, date | None, int | None]:
-    async with async_session() as session:
-        result = await session.execute(
-            select(
-                func.min(GenomicSequence.collection_date).label("min_date"),
-                func.max(GenomicSequence.collection_date).label("max_date"),
-            )
-        )
-        row = result.one()
-        return row.min_date, row.max_date, _span_days(row.min_date, row.max_date)
+    async with job_session() as session:
+        return await _genomics_span(session)
 
 
 async def _ensure_min_history_span(label: str, fetch_span, ingest):
@@ -184,8 +193,10 @@ async def _ensure_min_history_span(label: str, fetch_span, ingest):
 
 
 async def get_backfill_status() -> dict:
-    flu_min, flu_max, flu_span = await _get_flu_case_span()
-    gen_min, gen_max, gen_span = await _get_genomics_span()
+    """Span of the ingested history, for ``/api/health/backfill``; reads go through the API pool."""
+    async with read_session() as session:
+        flu_min, flu_max, flu_span = await _flu_case_span(session)
+        gen_min, gen_max, gen_span = await _genomics_span(session)
     return {
         "target_years": TARGET_BACKFILL_YEARS,
         "flu_cases": {
@@ -84,3 +84,16 @@ class GenomicCountryRow(BaseModel):
     country_code: str
     total_sequences: int
     top_clade: str = ""
+
+
+class Dashboard(BaseModel):
+    """Panels of GET /api/dashboard; panels that were not requested are null."""
+
+    summary: Optional[CaseSummary] = None
+    map: Optional[list[MapDataPoint]] = None
+    historical: Optional[list[HistoricalPoint]] = None
+    forecast: Optional[dict] = None
+    subtypes: Optional[list[SubtypePoint]] = None
+    countries: Optional[list[CountryRow]] = None
+    anomalies: Optional[list[AnomalyOut]] = None
+    genomic_trends: Optional[list[GenomicTrendPoint]] = None
@@ -3,8 +3,9 @@ from datetime import datetime, timedelta
 
 from sqlalchemy import delete, func, select
 
-from app.database import async_session
-from app.models import Anomaly, AnomalyType, FluCase, Severity
+from app.database import job_session
+from app.models import Anomaly, AnomalyType, CasesByWeek, CasesByWeekCountry, Severity
+from app.services.response_cache import bump_generation
 
 logger = logging.getLogger(__name__)
 
@@ -14,16 +15,17 @@ ZSCORE_THRESHOLD = 2.0
 async def detect_anomalies():
     """Z-score based anomaly detection on recent case data."""
     try:
-        async with async_session() as session:
+        async with job_session() as session:
             # Clear existing anomalies
             await session.execute(delete(Anomaly))
 
             # Get the max date in data
-            result = await session.execute(select(func.max(FluCase.time)))
+            result = await session.execute(select(func.max(CasesByWeek.time)))
             max_date = result.scalar()
             if not max_date:
                 logger.info("No case data for anomaly detection")
                 await session.commit()
+                bump_generation()
                 return
 
             # Get recent 4 weeks of data per country
@@ -32,9 +34,9 @@ async def detect_anomalies():
 
             # Recent totals per country
             recent_q = (
-                select(FluCase.country_code, func.sum(FluCase.new_cases).label("recent_total"))
-                .where(FluCase.time >= recent_cutoff)
-                .group_by(FluCase.country_code)
+                select(CasesByWeekCountry.country_code, func.sum(CasesByWeekCountry.new_cases).label("recent_total"))
+                .where(CasesByWeekCountry.time >= recent_cutoff)
+                .group_by(CasesByWeekCountry.country_code)
             )
             recent_result = await session.execute(recent_q)
             recent_data = {row.country_code: row.recent_total for row in recent_result}
@@ -42,13 +44,13 @@ async def detect_anomalies():
             # Historical weekly average and stddev per country (last 52 weeks)
             hist_q = (
                 select(
-                    FluCase.country_code,
-                    func.avg(FluCase.new_cases).label("avg_cases"),
-                    func.stddev(FluCase.new_cases).label("std_cases"),
-                    func.count(FluCase.new_cases).label("n"),
+                    CasesByWeekCountry.country_code,
+                    func.avg(CasesByWeekCountry.new_cases).label("avg_cases"),
+                    func.stddev(CasesByWeekCountry.new_cases).label("std_cases"),
+                    func.count(CasesByWeekCountry.new_cases).label("n"),
                 )
-                .where(FluCase.time >= hist_cutoff, FluCase.time < recent_cutoff)
-                .group_by(FluCase.country_code)
+                .where(CasesByWeekCountry.time >= hist_cutoff, CasesByWeekCountry.time < recent_cutoff)
+                .group_by(CasesByWeekCountry.country_code)
             )
             hist_result = await session.execute(hist_q)
             hist_data = {}
@@ -87,5 +89,6 @@ async def detect_anomalies():
                 logger.info("No anomalies detected")
 
             await session.commit()
+        bump_generation()
     except Exception:
         logger.exception("Anomaly detection failed")
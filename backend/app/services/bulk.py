@@ -0,0 +1,285 @@
+"""Bulk loading helpers shared by the ingestion services.
+
+On PostgreSQL rows are streamed into a temporary staging table with
+asyncpg's binary COPY and merged into the target with a single
+``INSERT ... SELECT ... ON CONFLICT`` statement. Other dialects (SQLite in
+tests), or PostgreSQL with ``BULK_COPY_ENABLED=false``, fall back to
+batched multi-row ``INSERT ... ON CONFLICT``.
+
+Both paths resolve duplicate keys within one load the same way: an insert
+that ignores conflicts keeps the first row for a key, an upsert the last.
+
+Upserts report how many rows they inserted, updated and left unchanged.
+On PostgreSQL the upsert and the count are one statement whose outer query
+reads the target in the statement's snapshot, i.e. without the upsert's own
+writes, so a returned key that is found there was updated. Row ids play no
+part, so concurrent loads and reset sequences do not skew the counts. The
+one approximation: a key first committed by a concurrent transaction after
+the snapshot was taken is counted as inserted although it was updated.
+"""
+
+import logging
+from collections.abc import Iterable
+from dataclasses import dataclass
+from itertools import chain
+
+from sqlalchemy import Table, and_, column, func, or_, select, table, text, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+@dataclass
+class UpsertCounts:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+    def __add__(self, other: "UpsertCounts") -> "UpsertCounts":
+        return UpsertCounts(
+            self.inserted + other.inserted,
+            self.updated + other.updated,
+            self.unchanged + other.unchanged,
+        )
+
+
+def constraint_columns(target: Table, name: str) -> list[str]:
+    """Column names of the named unique constraint, used as the conflict target."""
+    for constraint in target.constraints:
+        if constraint.name == name:
+            return [col.name for col in constraint.columns]
+    raise ValueError(f"{target.name} has no constraint named {name}")
+
+
+async def bulk_insert_ignore(
+    session: AsyncSession,
+    target: Table,
+    rows: Iterable[dict],
+    conflict_columns: list[str],
+) -> int:
+    """Insert ``rows`` into ``target``, skipping rows whose key already exists.
+
+    Runs inside the session's transaction; the caller commits. Returns the
+    number of rows actually inserted.
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return 0
+    rows = chain([first], rows)
+    columns = list(first.keys())
+
+    if session.bind.dialect.name == "postgresql" and settings.BULK_COPY_ENABLED:
+        return await _copy_merge(session, target, rows, columns, conflict_columns)
+    return await _batched_insert(session, target, rows, conflict_columns)
+
+
+# Stage column numbering rows in COPY order, so duplicates resolve deterministically
+STAGE_ORDER_COLUMN = "_staged"
+
+
+async def _copy_to_stage(conn: AsyncConnection, target: Table, rows: Iterable[dict], columns: list[str]) -> Table:
+    """COPY ``rows`` into a temporary table shaped like ``target`` and return it."""
+    stage_name = f"_stage_{target.name}"
+    column_list = ", ".join(columns)
+    await conn.execute(
+        text(f"CREATE TEMP TABLE {stage_name} ON COMMIT DROP AS SELECT {column_list} FROM {target.name} WITH NO DATA")
+    )
+    await conn.execute(
+        text(f"ALTER TABLE {stage_name} ADD COLUMN {STAGE_ORDER_COLUMN} bigint GENERATED ALWAYS AS IDENTITY")
+    )
+
+    # COPY bypasses SQLAlchemy's type processing, so apply the column bind
+    # processors (e.g. Enum -> stored name) ourselves.
+    processors = [target.c[name].type.bind_processor(conn.dialect) for name in columns]
+    records = (tuple(proc(row[name]) if proc else row[name] for name, proc in zip(columns, processors)) for row in rows)
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(stage_name, records=records, columns=columns)
+    return table(stage_name, *[column(name) for name in [*columns, STAGE_ORDER_COLUMN]])
+
+
+async def _drop_stage(conn: AsyncConnection, stage: Table):
+    # Drop now rather than at commit so the same transaction can load again
+    await conn.execute(text(f"DROP TABLE {stage.name}"))
+
+
+async def _copy_merge(
+    session: AsyncSession,
+    target: Table,
+    rows: Iterable[dict],
+    columns: list[str],
+    conflict_columns: list[str],
+) -> int:
+    conn = await session.connection()
+    stage = await _copy_to_stage(conn, target, rows, columns)
+    result = await conn.execute(_merge_from_stage(target, stage, columns, conflict_columns))
+    await _drop_stage(conn, stage)
+    logger.info("COPY-merged %s new rows into %s", result.rowcount, target.name)
+    return result.rowcount
+
+
+def _merge_from_stage(target: Table, stage: Table, columns: list[str], conflict_columns: list[str]):
+    # Inserted in staging order, so of duplicate keys the first staged row wins
+    staged = select(*[stage.c[name] for name in columns]).order_by(stage.c[STAGE_ORDER_COLUMN])
+    return pg_insert(target).from_select(columns, staged).on_conflict_do_nothing(index_elements=conflict_columns)
+
+
+async def _batched_insert(
+    session: AsyncSession,
+    target: Table,
+    rows: Iterable[dict],
+    conflict_columns: list[str],
+) -> int:
+    inserted = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            inserted += await _insert_batch(session, target, batch, conflict_columns)
+            batch = []
+    if batch:
+        inserted += await _insert_batch(session, target, batch, conflict_columns)
+    return inserted
+
+
+async def _insert_batch(session: AsyncSession, target: Table, batch: list[dict], conflict_columns: list[str]) -> int:
+    insert = pg_insert if session.bind.dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(target).values(batch).on_conflict_do_nothing(index_elements=conflict_columns)
+    result = await session.execute(stmt)
+    return result.rowcount
+
+
+async def bulk_upsert(
+    session: AsyncSession,
+    target: Table,
+    rows: Iterable[dict],
+    conflict_columns: list[str],
+    update_columns: list[str],
+) -> UpsertCounts:
+    """Insert new keys and update ``update_columns`` only where the value changed.
+
+    Uses ``ON CONFLICT DO UPDATE ... WHERE col IS DISTINCT FROM excluded.col``
+    so unchanged rows are not rewritten. Runs inside the session's
+    transaction; the caller commits. Duplicate keys within ``rows`` are
+    collapsed; the last one wins.
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return UpsertCounts()
+    rows = chain([first], rows)
+    columns = list(first.keys())
+
+    if session.bind.dialect.name == "postgresql" and settings.BULK_COPY_ENABLED:
+        counts = await _copy_upsert(session, target, rows, columns, conflict_columns, update_columns)
+    else:
+        counts = UpsertCounts()
+        batch = {}
+        for row in rows:
+            batch[tuple(row[c] for c in conflict_columns)] = row
+            if len(batch) >= BATCH_SIZE:
+                counts += await _upsert_batch(session, target, list(batch.values()), conflict_columns, update_columns)
+                batch = {}
+        if batch:
+            counts += await _upsert_batch(session, target, list(batch.values()), conflict_columns, update_columns)
+    logger.info(
+        "Upserted into %s: %s inserted, %s updated, %s unchanged",
+        target.name,
+        counts.inserted,
+        counts.updated,
+        counts.unchanged,
+    )
+    return counts
+
+
+def _changed(target: Table, excluded, update_columns: list[str]):
+    return or_(*[target.c[name].is_distinct_from(excluded[name]) for name in update_columns])
+
+
+async def _copy_upsert(
+    session: AsyncSession,
+    target: Table,
+    rows: Iterable[dict],
+    columns: list[str],
+    conflict_columns: list[str],
+    update_columns: list[str],
+) -> UpsertCounts:
+    conn = await session.connection()
+    stage = await _copy_to_stage(conn, target, rows, columns)
+    key = [stage.c[name] for name in conflict_columns]
+    staged = (await conn.execute(select(func.count()).select_from(select(*key).distinct().subquery()))).scalar()
+
+    stmt = _upsert_from_stage(target, stage, columns, conflict_columns, update_columns)
+    row = (await conn.execute(_count_upserted(target, stmt, conflict_columns))).one()
+    await _drop_stage(conn, stage)
+    return UpsertCounts(row.inserted, row.updated, staged - row.inserted - row.updated)
+
+
+def _count_upserted(target: Table, stmt, conflict_columns: list[str]):
+    """Run the upsert ``stmt`` and count its inserted and updated rows (PostgreSQL).
+
+    Rows skipped by the upsert's WHERE clause are not returned. The outer
+    query's read of ``target`` shares the statement's snapshot, so it only
+    finds the keys that existed before. (xmax = 0 would tell the same, but
+    partitioned tables cannot return system columns.)
+    """
+    upserted = stmt.returning(*[target.c[name] for name in conflict_columns]).cte("upserted")
+    existing = target.alias("existing")
+    joined = upserted.outerjoin(existing, and_(*[existing.c[name] == upserted.c[name] for name in conflict_columns]))
+    return select(
+        func.count().filter(existing.c.id.is_(None)).label("inserted"),
+        func.count().filter(existing.c.id.is_not(None)).label("updated"),
+    ).select_from(joined)
+
+
+def _upsert_from_stage(
+    target: Table, stage: Table, columns: list[str], conflict_columns: list[str], update_columns: list[str]
+):
+    # DISTINCT ON: a single INSERT may not touch the same target row twice.
+    # Ordered so it keeps the last staged row per key, like the batched path.
+    key = [stage.c[name] for name in conflict_columns]
+    staged = (
+        select(*[stage.c[name] for name in columns]).distinct(*key).order_by(*key, stage.c[STAGE_ORDER_COLUMN].desc())
+    )
+    stmt = pg_insert(target).from_select(columns, staged)
+    return stmt.on_conflict_do_update(
+        index_elements=conflict_columns,
+        set_={name: stmt.excluded[name] for name in update_columns},
+        where=_changed(target, stmt.excluded, update_columns),
+    )
+
+
+async def _upsert_batch(
+    session: AsyncSession,
+    target: Table,
+    batch: list[dict],
+    conflict_columns: list[str],
+    update_columns: list[str],
+) -> UpsertCounts:
+    postgres = session.bind.dialect.name == "postgresql"
+    insert = pg_insert if postgres else sqlite_insert
+    stmt = insert(target).values(batch)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=conflict_columns,
+        set_={name: stmt.excluded[name] for name in update_columns},
+        where=_changed(target, stmt.excluded, update_columns),
+    )
+    if postgres:
+        row = (await session.execute(_count_upserted(target, stmt, conflict_columns))).one()
+        return UpsertCounts(row.inserted, row.updated, len(batch) - row.inserted - row.updated)
+
+    # SQLite has no data-modifying CTEs; it also allows a single writer, so
+    # the keys present before the upsert can be read first.
+    key = [target.c[name] for name in conflict_columns]
+    wanted = [tuple(row[name] for name in conflict_columns) for row in batch]
+    existing = set((await session.execute(select(*key).where(tuple_(*key).in_(wanted)))).all())
+    # Rows skipped by the WHERE clause are not returned
+    returned = (await session.execute(stmt.returning(*key))).all()
+    updated = sum(1 for row in returned if row in existing)
+    return UpsertCounts(len(returned) - updated, updated, len(batch) - len(returned))
@@ -0,0 +1,38 @@
+"""Progress checkpoints for resumable backfills."""
+
+import logging
+from datetime import datetime
+
+from sqlalchemy import delete, select
+
+from app.database import job_session
+from app.models import BackfillCheckpoint
+
+logger = logging.getLogger(__name__)
+
+
+async def get_checkpoints(job: str) -> dict[int, BackfillCheckpoint]:
+    """Completed units of ``job``, keyed by unit."""
+    async with job_session() as session:
+        result = await session.execute(select(BackfillCheckpoint).where(BackfillCheckpoint.job == job))
+        return {cp.unit: cp for cp in result.scalars()}
+
+
+async def save_checkpoint(job: str, unit: int, **fields) -> None:
+    """Mark ``unit`` of ``job`` as committed."""
+    async with job_session() as session:
+        checkpoint = await session.get(BackfillCheckpoint, (job, unit))
+        if checkpoint is None:
+            checkpoint = BackfillCheckpoint(job=job, unit=unit)
+            session.add(checkpoint)
+        for name, value in fields.items():
+            setattr(checkpoint, name, value)
+        checkpoint.completed_at = datetime.utcnow()
+        await session.commit()
+
+
+async def clear_checkpoints(job: str) -> None:
+    async with job_session() as session:
+        await session.execute(delete(BackfillCheckpoint).where(BackfillCheckpoint.job == job))
+        await session.commit()
+    logger.info("Cleared %s checkpoints", job)
@@ -1,12 +1,25 @@
+import asyncio
+import hashlib
 import logging
+import time
 from collections import defaultdict
-from datetime import datetime, timedelta
+from collections.abc import AsyncIterator, Awaitable, Callable, Collection, Iterable, Iterator
+from datetime import date, datetime, timedelta
 
 import httpx
-from sqlalchemy.dialects.postgresql import insert as pg_insert
+import numpy as np
+from sqlalchemy import Table
 
-from app.database import async_session
+from app.config import settings
+from app.database import job_session
 from app.models import FluCase
+from app.services.bulk import UpsertCounts, bulk_upsert, constraint_columns
+from app.services.checkpoint import clear_checkpoints, get_checkpoints, save_checkpoint
+from app.services.http_cache import cached_get
+from app.services.partitions import ensure_year_partitions
+from app.services.response_cache import bump_generation
+from app.services.rollup import refresh_rollups
+from app.services.watermark import get_watermark, save_watermark
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +44,24 @@ LAST_RESORT = {"INF_ALL", "ALL_INF"}
 SPECIFIC_FIELDS = list(SUBTYPE_MAP.keys())
 AGGREGATE_FIELDS = list(AGGREGATE_MAP.keys())
 LAST_RESORT_FIELDS = list(LAST_RESORT)
+# Only these columns are requested; VIW_FNT has many more that are never read
+SELECT_FIELDS = [
+    "ISO_YEAR",
+    "ISO_WEEK",
+    "ISO2",
+    "COUNTRY_CODE",
+    *SPECIFIC_FIELDS,
+    *AGGREGATE_FIELDS,
+    *LAST_RESORT_FIELDS,
+]
+# $top/$skip paging is only stable over a total order; without one the
+# server may return rows twice or not at all across page boundaries
+ORDER_BY = ["ISO_YEAR", "ISO_WEEK", "COUNTRY_CODE", "ORIGIN_SOURCE"]
+MIN_PAGE_SIZE = 2000
+MAX_PAGE_SIZE = 120000
 FULL_BACKFILL_YEARS = 10
+WATERMARK_SOURCE = "who_flunet"
+CHECKPOINT_JOB = "who_flunet_full"
 
 
 def _parse_week_date(iso_year: int, iso_week: int) -> datetime:
@@ -44,63 +74,211 @@ def _normalize_country(code: str) -> str:
     return (code or "").upper()
 
 
-async def fetch_flunet(weeks_back: int = 4):
-    """Fetch WHO FluNet data for the last N weeks."""
-    cutoff = datetime.utcnow() - timedelta(weeks=weeks_back)
-    iso_year = cutoff.isocalendar()[0]
-    iso_week = cutoff.isocalendar()[1]
+def _since_filter(iso_year: int, iso_week: int) -> str:
+    """OData filter for every ISO week from (iso_year, iso_week) onwards."""
+    return f"ISO_YEAR gt {iso_year} or (ISO_YEAR eq {iso_year} and ISO_WEEK ge {iso_week})"
 
-    url = f"{FLUNET_URL}?$filter=ISO_YEAR ge {iso_year} and ISO_WEEK ge {iso_week}" f"&$top=120000"
 
-    records = []
-    async with httpx.AsyncClient(timeout=120) as client:
+def _start_week(weeks_back: int, since: tuple[int, int] | None = None) -> tuple[int, int]:
+    """First ISO (year, week) to request.
+
+    With a watermark, re-request the watermark week and the preceding
+    ``FLUNET_REVISION_WEEKS`` weeks (late reports and revisions land there);
+    without one, fall back to a fixed ``weeks_back`` window.
+    """
+    if since:
+        start = date.fromisocalendar(since[0], since[1], 1) - timedelta(weeks=settings.FLUNET_REVISION_WEEKS)
+    else:
+        start = datetime.utcnow().date() - timedelta(weeks=weeks_back)
+    iso = start.isocalendar()
+    return iso[0], iso[1]
+
+
+def _year_filter(year: int) -> str:
+    return f"ISO_YEAR ge {year} and ISO_YEAR lt {year + 1}"
+
+
+def _page_url(where: str, top: int, skip: int = 0) -> str:
+    url = f"{FLUNET_URL}?$filter={where}&$select={','.join(SELECT_FIELDS)}&$orderby={','.join(ORDER_BY)}"
+    url = f"{url}&$top={top}"
+    return f"{url}&$skip={skip}" if skip else url
+
+
+def _next_page_size(size: int, elapsed: float) -> int:
+    """Scale the page size towards ``FLUNET_PAGE_TARGET_SECONDS`` per request.
+
+    Changes are limited to a factor of two per page so one slow or fast
+    response does not swing the size wildly.
+    """
+    target = size * settings.FLUNET_PAGE_TARGET_SECONDS / max(elapsed, 0.001)
+    target = min(max(target, size / 2), size * 2)
+    return int(min(max(target, MIN_PAGE_SIZE), MAX_PAGE_SIZE))
+
+
+async def _fetch_pages(
+    client: httpx.AsyncClient, where: str, headers: dict | None = None
+) -> AsyncIterator[tuple[httpx.Response, list[dict]]]:
+    """Yield ``(response, records)`` for every page matching the ``where`` filter.
+
+    Pages are requested with ``$top``/``$skip`` over ``ORDER_BY``; a
+    server-side ``@odata.nextLink`` within a page is followed as well. The
+    page size adapts to the observed response time unless the response cache
+    is enabled, which needs stable URLs to revalidate against. ``headers`` go
+    on the first request only; a 304 reply is yielded with no records and
+    ends the iteration.
+    """
+    adaptive = not settings.HTTP_CACHE_DIR
+    size = settings.FLUNET_PAGE_SIZE
+    offset = 0
+    while True:
+        url = _page_url(where, size, offset)
+        received = 0
         while url:
-            logger.info(f"Fetching FluNet: {url[:120]}...")
-            resp = await client.get(url)
+            logger.info("Fetching FluNet: %s...", url[:120])
+            start = time.perf_counter()
+            resp = await cached_get(client, url, headers=headers)
+            elapsed = time.perf_counter() - start
+            headers = None
+            if resp.status_code == 304:
+                yield resp, []
+                return
             resp.raise_for_status()
             data = resp.json()
-            records.extend(data.get("value", []))
+            records = data.get("value", [])
+            received += len(records)
             url = data.get("@odata.nextLink")
+            del data
+            yield resp, records
+        if received < size:
+            return
+        offset += received
+        if adaptive:
+            size = _next_page_size(size, elapsed)
+
+
+def _http_client(timeout: float) -> httpx.AsyncClient:
+    """Keep-alive client whose pool matches the configured fetch concurrency."""
+    concurrency = max(1, settings.FLUNET_CONCURRENCY)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    return httpx.AsyncClient(timeout=timeout, limits=limits)
+
+
+async def fetch_flunet(
+    weeks_back: int = 4,
+    since: tuple[int, int] | None = None,
+    last_modified: str | None = None,
+    known_sha256: str | None = None,
+) -> tuple[list[dict], str | None, str | None]:
+    """Fetch WHO FluNet data newer than ``since`` (or the last N weeks).
+
+    Returns the parsed records, the upstream Last-Modified marker and a
+    SHA-256 over all response pages. When ``last_modified`` is given it is
+    sent as If-Modified-Since; a 304 reply yields no records. So does a
+    response hashing to ``known_sha256``, the hash stored with the watermark
+    once the previous run's rows were committed. The response cache's own
+    "unchanged" flag is not used for this: it is set when the body is
+    stored, before the rows are written, so a failed upsert would be skipped
+    on retry.
+    """
+    iso_year, iso_week = _start_week(weeks_back, since)
+    headers = {"If-Modified-Since": last_modified} if last_modified else None
 
+    records = []
+    first_page = True
+    digest = hashlib.sha256()
+    async with _http_client(timeout=120) as client:
+        async for resp, page in _fetch_pages(client, _since_filter(iso_year, iso_week), headers=headers):
+            if resp.status_code == 304:
+                logger.info("FluNet unchanged since %s", last_modified)
+                return [], last_modified, known_sha256
+            if first_page:
+                first_page = False
+                last_modified = resp.headers.get("Last-Modified", last_modified)
+            digest.update(resp.content)
+            records.extend(page)
+
+    # All pages must match: UK constituents aggregate across pages, so a
+    # partial parse would upsert partial sums.
+    sha256 = digest.hexdigest()
+    if sha256 == known_sha256:
+        logger.info("FluNet response identical to the last ingested one, skipping parse")
+        return [], last_modified, sha256
     logger.info(f"Fetched {len(records)} raw FluNet records")
-    return _process_records(records)
-
-
-async def fetch_flunet_full(years_back: int = FULL_BACKFILL_YEARS):
-    """Fetch a bounded multi-year backfill window from FluNet."""
+    return _process_records(records), last_modified, sha256
+
+
+YearSink = Callable[[int, list[dict]], Awaitable[None]]
+
+
+async def _stream_year(client: httpx.AsyncClient, year: int, semaphore: asyncio.Semaphore, sink: YearSink) -> int:
+    """Fetch one ISO year, parsing each page as it arrives, then hand the totals to ``sink``.
+
+    Raw pages are dropped as soon as they are parsed, so only the year's
+    aggregated rows are held in memory. Aggregation has to span the whole
+    year because UK constituents can land on different pages.
+    """
+    totals = _WeeklyTotals()
+    raw_count = 0
+    async with semaphore:
+        # Backfills always parse: the rows feed rebuild shadows that start empty
+        async for _, page in _fetch_pages(client, _year_filter(year)):
+            raw_count += len(page)
+            # Parse off the event loop; pages are a few MB of JSON at most
+            totals.add(await asyncio.to_thread(_process_records, page))
+            del page
+    logger.info("Fetched %s raw FluNet records for year %s", raw_count, year)
+    await sink(year, totals.rows())
+    return raw_count
+
+
+async def stream_flunet_full(
+    sink: YearSink,
+    years_back: int = FULL_BACKFILL_YEARS,
+    skip_years: Collection[int] = (),
+) -> int:
+    """Fetch a bounded multi-year backfill window, streaming each year to ``sink``.
+
+    Years are fetched concurrently (at most ``FLUNET_CONCURRENCY`` at a time)
+    over one pooled client, so peak memory is bounded by that many years of
+    aggregated rows rather than the whole history. Years in ``skip_years``
+    are not fetched. Returns the raw record count.
+    """
     current_year = datetime.utcnow().year
     # Include the current partial year plus the preceding full `years_back`
     # years so the startup span can satisfy a full 10-year requirement.
     start_year = current_year - years_back
-    records = []
+    semaphore = asyncio.Semaphore(max(1, settings.FLUNET_CONCURRENCY))
 
-    async with httpx.AsyncClient(timeout=180) as client:
-        for year in range(start_year, current_year + 1):
-            url = f"{FLUNET_URL}?$filter=ISO_YEAR ge {year} and ISO_YEAR lt {year + 1}" f"&$top=50000"
-            year_records = 0
-            while url:
-                logger.info("Fetching FluNet backfill year %s: %s...", year, url[:120])
-                resp = await client.get(url)
-                resp.raise_for_status()
-                data = resp.json()
-                page = data.get("value", [])
-                year_records += len(page)
-                records.extend(page)
-                url = data.get("@odata.nextLink")
-            logger.info("Fetched %s raw FluNet records for year %s", year_records, year)
+    async with _http_client(timeout=180) as client:
+        async with asyncio.TaskGroup() as tg:
+            tasks = [
+                tg.create_task(_stream_year(client, year, semaphore, sink))
+                for year in range(start_year, current_year + 1)
+                if year not in skip_years
+            ]
 
+    raw_count = sum(task.result() for task in tasks)
     logger.info(
         "Fetched %s raw FluNet records for %s-year backfill",
-        len(records),
+        raw_count,
         years_back,
     )
-    return _process_records(records)
+    return raw_count
 
 
-def _process_records(records: list) -> list[dict]:
-    """Parse FluNet records with subtype priority and UK normalization."""
-    parsed = []
+async def fetch_flunet_full(years_back: int = FULL_BACKFILL_YEARS) -> list[dict]:
+    """Fetch the backfill window into one list, in year order."""
+    by_year = {}
 
+    async def collect(year: int, rows: list[dict]):
+        by_year[year] = rows
+
+    await stream_flunet_full(collect, years_back)
+    return [rec for year in sorted(by_year) for rec in by_year[year]]
+
+
+def _parse_records(records: Iterable[dict]) -> Iterator[dict]:
+    """Yield one row per reported subtype, applying subtype priority and UK normalization."""
     for rec in records:
         iso_year = rec.get("ISO_YEAR")
         iso_week = rec.get("ISO_WEEK")
@@ -121,8 +299,24 @@ def _process_records(records: list) -> list[dict]:
             val = rec.get(field)
             if val and int(val) > 0:
                 has_specific = True
-                parsed.append(
-                    {
+                yield {
+                    "country_code": country_code,
+                    "region": "",
+                    "city": "",
+                    "flu_type": label,
+                    "source": "who_flunet",
+                    "time": time_val.date(),
+                    "new_cases": int(val),
+                    "iso_year": iso_year,
+                    "iso_week": iso_week,
+                }
+
+        if not has_specific:
+            for field, label in AGGREGATE_MAP.items():
+                val = rec.get(field)
+                if val and int(val) > 0:
+                    has_specific = True
+                    yield {
                         "country_code": country_code,
                         "region": "",
                         "city": "",
@@ -133,118 +327,300 @@ def _process_records(records: list) -> list[dict]:
                         "iso_year": iso_year,
                         "iso_week": iso_week,
                     }
-                )
-
-        if not has_specific:
-            for field, label in AGGREGATE_MAP.items():
-                val = rec.get(field)
-                if val and int(val) > 0:
-                    has_specific = True
-                    parsed.append(
-                        {
-                            "country_code": country_code,
-                            "region": "",
-                            "city": "",
-                            "flu_type": label,
-                            "source": "who_flunet",
-                            "time": time_val.date(),
-                            "new_cases": int(val),
-                            "iso_year": iso_year,
-                            "iso_week": iso_week,
-                        }
-                    )
 
         if not has_specific:
             for field in LAST_RESORT_FIELDS:
                 val = rec.get(field)
                 if val and int(val) > 0:
-                    parsed.append(
-                        {
-                            "country_code": country_code,
-                            "region": "",
-                            "city": "",
-                            "flu_type": "unknown",
-                            "source": "who_flunet",
-                            "time": time_val.date(),
-                            "new_cases": int(val),
-                            "iso_year": iso_year,
-                            "iso_week": iso_week,
-                        }
-                    )
+                    yield {
+                        "country_code": country_code,
+                        "region": "",
+                        "city": "",
+                        "flu_type": "unknown",
+                        "source": "who_flunet",
+                        "time": time_val.date(),
+                        "new_cases": int(val),
+                        "iso_year": iso_year,
+                        "iso_week": iso_week,
+                    }
                     break
 
-    # Aggregate duplicates (handles UK merging)
-    agg = defaultdict(int)
-    meta = {}
-    for r in parsed:
-        key = (r["time"], r["country_code"], r["region"], r["city"], r["flu_type"], r["source"])
-        agg[key] += r["new_cases"]
-        meta[key] = (r["iso_year"], r["iso_week"])
 
+class _WeeklyTotals:
+    """Sums parsed rows by logical key (handles UK merging) as they arrive."""
+
+    def __init__(self):
+        self._totals = defaultdict(int)
+        self._meta = {}
+
+    def __len__(self) -> int:
+        return len(self._totals)
+
+    def add(self, rows: Iterable[dict]) -> None:
+        for r in rows:
+            key = (r["time"], r["country_code"], r["region"], r["city"], r["flu_type"], r["source"])
+            self._totals[key] += r["new_cases"]
+            self._meta[key] = (r["iso_year"], r["iso_week"])
+
+    def rows(self) -> list[dict]:
+        result = []
+        for key, total in self._totals.items():
+            time_val, cc, region, city, flu_type, source = key
+            iy, iw = self._meta[key]
+            result.append(
+                {
+                    "country_code": cc,
+                    "region": region,
+                    "city": city,
+                    "flu_type": flu_type,
+                    "source": source,
+                    "time": time_val,
+                    "new_cases": total,
+                    "iso_year": iy,
+                    "iso_week": iw,
+                }
+            )
+        return result
+
+
+def _process_records_rowwise(records: list) -> list[dict]:
+    """Reference row-at-a-time parser; ``_process_records`` must match it exactly."""
+    totals = _WeeklyTotals()
+    totals.add(_parse_records(records))
+    return totals.rows()
+
+
+# Value columns in emission order: specific subtypes, then aggregates, then
+# last-resort totals. Both last-resort columns map to the "unknown" label.
+_VALUE_FIELDS = SPECIFIC_FIELDS + AGGREGATE_FIELDS + LAST_RESORT_FIELDS
+_N_SPECIFIC = len(SPECIFIC_FIELDS)
+_N_PRIORITY = _N_SPECIFIC + len(AGGREGATE_FIELDS)
+_LABELS = list(SUBTYPE_MAP.values()) + list(AGGREGATE_MAP.values()) + ["unknown"]
+_FIELD_LABEL_IDS = np.array(
+    list(range(_N_PRIORITY)) + [_N_PRIORITY] * len(LAST_RESORT_FIELDS),
+    dtype=np.int64,
+)
+
+
+def _week_calendar(weeks: Iterable[tuple]) -> dict[tuple, date | None]:
+    """Map each distinct (iso_year, iso_week) to its Monday, or None if unparseable."""
+    calendar = {}
+    for iso_year, iso_week in weeks:
+        try:
+            calendar[(iso_year, iso_week)] = _parse_week_date(iso_year, iso_week).date()
+        except (ValueError, TypeError):
+            calendar[(iso_year, iso_week)] = None
+    return calendar
+
+
+def _count_column(column: list) -> np.ndarray:
+    """Convert one count field to int64 with the reference's ``int(v) if v else 0`` semantics."""
+    fast = np.array([v or 0 for v in column])
+    if fast.dtype.kind in "iu":
+        return fast.astype(np.int64, copy=False)
+    # Floats, strings or booleans: convert value by value exactly like the reference
+    return np.array([int(v) if v else 0 for v in column], dtype=np.int64)
+
+
+def _process_records(records: list) -> list[dict]:
+    """Parse FluNet records with subtype priority and UK normalization.
+
+    Columnar implementation of ``_process_records_rowwise``: the per-record
+    work is reduced to pulling fields out of the JSON dicts, while week
+    parsing runs once per distinct week and subtype priority and duplicate
+    aggregation run as whole-array NumPy operations. Output (values, key
+    order and iso_year/iso_week provenance) is identical to the reference.
+    """
+    if not records:
+        return []
+    try:
+        values = np.column_stack([_count_column([rec.get(field) for rec in records]) for field in _VALUE_FIELDS])
+    except (ValueError, TypeError, OverflowError):
+        # Non-numeric counts: the reference raises or skips lazily, field by
+        # field, so defer to it for identical behaviour.
+        return _process_records_rowwise(records)
+
+    years = [rec.get("ISO_YEAR") for rec in records]
+    weeks = [rec.get("ISO_WEEK") for rec in records]
+    raw_countries = [rec.get("ISO2") or rec.get("COUNTRY_CODE") or "" for rec in records]
+    normalized = {code: _normalize_country(code) for code in set(raw_countries)}
+    countries = [normalized[code] for code in raw_countries]
+
+    calendar = _week_calendar({(y, w) for y, w in zip(years, weeks) if y and w})
+    dates = [calendar.get((y, w)) if y and w else None for y, w in zip(years, weeks)]
+    valid = np.fromiter((d is not None and bool(c) for d, c in zip(dates, countries)), dtype=bool, count=len(records))
+
+    # Subtype priority: specific > aggregate > first positive last-resort field
+    positive = values > 0
+    has_specific = positive[:, :_N_SPECIFIC].any(axis=1)
+    selected = positive.copy()
+    selected[:, _N_SPECIFIC:_N_PRIORITY] &= ~has_specific[:, None]
+    has_priority = has_specific | selected[:, _N_SPECIFIC:_N_PRIORITY].any(axis=1)
+    last_resort = positive[:, _N_PRIORITY:]
+    first_last_resort = np.cumsum(last_resort, axis=1) == 1
+    selected[:, _N_PRIORITY:] = last_resort & first_last_resort & ~has_priority[:, None]
+    selected &= valid[:, None]
+
+    # Row-major nonzero keeps the reference's record-then-field emission order
+    row_idx, field_idx = np.nonzero(selected)
+    if not len(row_idx):
+        return []
+    counts = values[row_idx, field_idx]
+
+    date_ids = {}
+    country_ids = {}
+    row_date = np.array([date_ids.setdefault(dates[i], len(date_ids)) for i in range(len(records))], dtype=np.int64)
+    row_country = np.array(
+        [country_ids.setdefault(countries[i], len(country_ids)) for i in range(len(records))], dtype=np.int64
+    )
+    keys = (row_date[row_idx] * len(country_ids) + row_country[row_idx]) * len(_LABELS) + _FIELD_LABEL_IDS[field_idx]
+
+    _, first_pos, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    totals = np.zeros(len(first_pos), dtype=np.int64)
+    np.add.at(totals, inverse, counts)
+    last_pos = np.zeros(len(first_pos), dtype=np.int64)
+    np.maximum.at(last_pos, inverse, np.arange(len(keys)))
+
+    order = np.argsort(first_pos, kind="stable")
+    first = first_pos[order]
+    groups = zip(
+        row_idx[first].tolist(),
+        row_idx[last_pos[order]].tolist(),
+        _FIELD_LABEL_IDS[field_idx[first]].tolist(),
+        totals[order].tolist(),
+    )
     result = []
-    for key, total in agg.items():
-        time_val, cc, region, city, flu_type, source = key
-        iy, iw = meta[key]
+    for row, last_row, label_id, total in groups:
         result.append(
             {
-                "country_code": cc,
-                "region": region,
-                "city": city,
-                "flu_type": flu_type,
-                "source": source,
-                "time": time_val,
+                "country_code": countries[row],
+                "region": "",
+                "city": "",
+                "flu_type": _LABELS[label_id],
+                "source": "who_flunet",
+                "time": dates[row],
                 "new_cases": total,
-                "iso_year": iy,
-                "iso_week": iw,
+                "iso_year": years[last_row],
+                "iso_week": weeks[last_row],
             }
         )
-
     return result
 
 
+def _latest_week(records: Iterable[dict]) -> tuple[int, int] | None:
+    return max(((r["iso_year"], r["iso_week"]) for r in records), default=None)
+
+
+async def _advance_watermark(latest: tuple[int, int] | None, last_modified: str | None, previous=None, **fields):
+    if previous is not None and previous.iso_year is not None:
+        latest = max(filter(None, [latest, (previous.iso_year, previous.iso_week)]))
+    fields["last_modified"] = last_modified
+    if latest:
+        fields["iso_year"], fields["iso_week"] = latest
+    await save_watermark(WATERMARK_SOURCE, **fields)
+
+
 async def ingest_flunet(weeks_back: int = 4):
-    """Fetch and upsert FluNet data."""
+    """Fetch and upsert FluNet weeks newer than the persisted watermark.
+
+    Falls back to the last ``weeks_back`` weeks when no watermark exists yet,
+    and skips the upsert entirely when the upstream returned nothing new.
+    """
     try:
-        records = await fetch_flunet(weeks_back)
+        watermark = await get_watermark(WATERMARK_SOURCE)
+        since = None
+        last_modified = None
+        known_sha256 = None
+        if watermark is not None and watermark.iso_year is not None:
+            since = (watermark.iso_year, watermark.iso_week)
+            last_modified = watermark.last_modified
+            known_sha256 = watermark.content_sha256
+
+        records, last_modified, sha256 = await fetch_flunet(
+            weeks_back, since=since, last_modified=last_modified, known_sha256=known_sha256
+        )
+        if not records:
+            logger.info("No new FluNet records since watermark %s; skipping upsert", since)
+            return
+
         await _upsert_records(records)
+        # Only now that the rows are committed may the same response be skipped
+        await _advance_watermark(_latest_week(records), last_modified, previous=watermark, content_sha256=sha256)
         logger.info(f"Ingested {len(records)} FluNet records")
     except Exception:
         logger.exception("FluNet ingestion failed")
 
 
-async def ingest_flunet_full():
-    """Full backfill and upsert."""
+async def ingest_flunet_full(target: Table | None = None, resume: bool = True):
+    """Full backfill, committing each year as soon as it has been fetched.
+
+    Every committed year is checkpointed, so when a run fails part-way the
+    next call (with ``resume``) only fetches the missing years. A completed
+    run clears its checkpoints. ``target`` defaults to ``flu_cases``; the
+    daily rebuild passes its freshly created shadow table with ``resume=False``.
+    Only a load into ``flu_cases`` advances the incremental watermark: a
+    shadow may never be swapped in.
+    """
+    table = target if target is not None else FluCase.__table__
+    job = f"{CHECKPOINT_JOB}:{table.name}"
     try:
-        records = await fetch_flunet_full()
-        await _upsert_records(records)
-        logger.info(f"Ingested {len(records)} FluNet records (full)")
+        if not resume:
+            await clear_checkpoints(job)
+        done = await get_checkpoints(job)
+        if done:
+            logger.info("Resuming FluNet backfill; skipping completed years %s", sorted(done))
+        ingested = 0
+        # Years are fetched concurrently but written one at a time: SQLite
+        # allows a single writer, and fetching still overlaps the writes.
+        write_lock = asyncio.Lock()
+
+        async def upsert_year(year: int, rows: list[dict]):
+            nonlocal ingested
+            async with write_lock:
+                await _upsert_records(rows, target)
+                latest = _latest_week(rows)
+                await save_checkpoint(job, year, rows=len(rows), latest_iso_week=latest[1] if latest else None)
+            ingested += len(rows)
+
+        await stream_flunet_full(upsert_year, skip_years=done.keys())
+
+        if target is None:
+            checkpoints = await get_checkpoints(job)
+            latest = max(
+                ((cp.unit, cp.latest_iso_week) for cp in checkpoints.values() if cp.latest_iso_week), default=None
+            )
+            await _advance_watermark(latest, last_modified=None, previous=await get_watermark(WATERMARK_SOURCE))
+        await clear_checkpoints(job)
+        logger.info(f"Ingested {ingested} FluNet records (full)")
     except Exception:
-        logger.exception("FluNet full ingestion failed")
-
-
-async def _upsert_records(records: list[dict]):
-    if not records:
-        return
-
-    async with async_session() as session:
-        # Deduplicate records within this payload only; existing-row duplicates
-        # are handled by ON CONFLICT DO NOTHING at the database level.
-        deduped_records = []
-        seen = set()
-        for r in records:
-            key = (r["country_code"], r["region"], r["city"], r["flu_type"], r["source"], r["time"])
-            if key not in seen:
-                seen.add(key)
-                deduped_records.append(r)
-
-        if deduped_records:
-            # Batch insert
-            for i in range(0, len(deduped_records), 1000):
-                batch = deduped_records[i : i + 1000]
-                stmt = pg_insert(FluCase).values(batch)
-                stmt = stmt.on_conflict_do_nothing(constraint="uq_flu_case")
-                await session.execute(stmt)
-            await session.commit()
-            logger.info(f"Upserted {len(deduped_records)} FluNet records")
-        else:
-            logger.info("No new FluNet records to insert")
+        logger.exception("FluNet full ingestion failed; completed years are checkpointed for the next attempt")
+
+
+async def _upsert_records(records: Iterable[dict], target: Table | None = None) -> UpsertCounts:
+    """Insert new weeks and rewrite ``new_cases`` only where FluNet revised it.
+
+    Writes to ``flu_cases`` refresh the weekly rollups for the weeks in
+    ``records`` in the same transaction and invalidate cached responses; a
+    rebuild's shadow table is rolled up once it has been swapped in.
+    Partitions for new ISO years are created first.
+    """
+    table = target if target is not None else FluCase.__table__
+    records = list(records)
+    await ensure_year_partitions(table, {rec["iso_year"] for rec in records})
+    async with job_session() as session:
+        counts = await bulk_upsert(
+            session, table, records, constraint_columns(table, "uq_flu_case"), update_columns=["new_cases"]
+        )
+        changed = target is None and (counts.inserted or counts.updated)
+        if changed:
+            await refresh_rollups(session, {rec["time"] for rec in records})
+        await session.commit()
+    if changed:
+        bump_generation()
+    logger.info(
+        "Upserted FluNet records: %s inserted, %s updated, %s unchanged",
+        counts.inserted,
+        counts.updated,
+        counts.unchanged,
+    )
+    return counts
@@ -2,11 +2,12 @@ import logging
 from datetime import timedelta
 
 import numpy as np
-from sqlalchemy import func, select
+from sqlalchemy import select
 
 from app.config import settings
-from app.database import async_session
-from app.models import FluCase
+from app.database import read_session
+from app.models import CasesByWeek, CasesByWeekCountry
+from app.services.response_cache import uncacheable
 
 logger = logging.getLogger(__name__)
 
@@ -14,14 +15,15 @@ logger = logging.getLogger(__name__)
 async def generate_forecast(country_code: str = None, weeks_ahead: int = 8):
     """Simple exponential smoothing forecast with confidence intervals."""
     try:
-        async with async_session() as session:
-            q = (
-                select(FluCase.time, func.sum(FluCase.new_cases).label("total"))
-                .group_by(FluCase.time)
-                .order_by(FluCase.time)
-            )
+        async with read_session() as session:
             if country_code:
-                q = q.where(FluCase.country_code == country_code)
+                q = (
+                    select(CasesByWeekCountry.time, CasesByWeekCountry.new_cases.label("total"))
+                    .where(CasesByWeekCountry.country_code == country_code)
+                    .order_by(CasesByWeekCountry.time)
+                )
+            else:
+                q = select(CasesByWeek.time, CasesByWeek.new_cases.label("total")).order_by(CasesByWeek.time)
 
             result = await session.execute(q)
             rows = list(result)
@@ -84,4 +86,5 @@ async def generate_forecast(country_code: str = None, weeks_ahead: int = 8):
         return {"historical": historical, "forecast": forecast}
     except Exception:
         logger.exception("Forecast generation failed")
+        uncacheable()
         return {"historical": [], "forecast": []}
@@ -0,0 +1,294 @@
+"""On-disk cache of raw upstream responses.
+
+Bodies are stored gzip-compressed and content-addressed by their SHA-256
+(``blobs/<sha256>.gz``); a small JSON entry per request URL
+(``entries/<sha256 of url>.json``) records which blob the URL last returned
+together with its ETag and Last-Modified validators. Those validators are
+sent back as If-None-Match / If-Modified-Since so an unchanged upstream can
+answer 304 and the body is served from disk.
+
+Responses carry ``extensions["unchanged"]`` so callers can skip parsing
+when the body is byte-identical to the previous fetch. The entry is stored
+on fetch, not when the caller has written the data, so ingestion that skips
+work must compare against a hash it saved itself after committing (FluNet
+keeps one on its watermark, Nextstrain in ``dataset_versions``). With
+``HTTP_CACHE_REPLAY`` enabled no network requests are made at all and every
+URL must already be cached, which allows offline re-ingestion and
+repeatable benchmarks.
+
+The cache is disabled when ``HTTP_CACHE_DIR`` is empty.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Response headers kept alongside the body and restored on cache hits
+_STORED_HEADERS = ("content-type", "etag", "last-modified")
+
+# Bytes handed to the writer thread at a time by cached_download
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class CacheMiss(LookupError):
+    """Raised in replay mode for a URL that has never been cached."""
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _entry_path(root: Path, url: str) -> Path:
+    return root / "entries" / f"{_digest(url.encode())}.json"
+
+
+def _blob_path(root: Path, digest: str) -> Path:
+    return root / "blobs" / f"{digest}.gz"
+
+
+def _write_atomic(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A unique name per writer: concurrent stores of one URL run in threads of one process
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _load_entry(root: Path, url: str) -> dict | None:
+    path = _entry_path(root, url)
+    if not path.exists():
+        return None
+    entry = json.loads(path.read_text())
+    # An entry whose blob was removed is treated as missing
+    return entry if _blob_path(root, entry["sha256"]).exists() else None
+
+
+def _read_blob(root: Path, digest: str) -> bytes:
+    return gzip.decompress(_blob_path(root, digest).read_bytes())
+
+
+def _store(root: Path, url: str, content: bytes, headers: httpx.Headers) -> str:
+    digest = _digest(content)
+    blob = _blob_path(root, digest)
+    if not blob.exists():
+        _write_atomic(blob, gzip.compress(content, compresslevel=6))
+    entry = {
+        "url": url,
+        "sha256": digest,
+        "headers": {name: headers[name] for name in _STORED_HEADERS if name in headers},
+        "fetched_at": datetime.utcnow().isoformat(),
+    }
+    _write_atomic(_entry_path(root, url), json.dumps(entry).encode())
+    return digest
+
+
+def _from_cache(request: httpx.Request, content: bytes, entry: dict, unchanged: bool) -> httpx.Response:
+    return httpx.Response(
+        200,
+        content=content,
+        headers=entry["headers"],
+        request=request,
+        extensions={"unchanged": unchanged, "from_cache": True},
+    )
+
+
+async def cached_get(client: httpx.AsyncClient, url: str, headers: dict | None = None) -> httpx.Response:
+    """GET ``url`` through the response cache.
+
+    Behaves like ``client.get`` when the cache is disabled. Otherwise a
+    successful response is stored and returned with ``extensions["unchanged"]``
+    set when its body matches the previously cached one. Non-2xx responses
+    (including a 304 answering the caller's own conditional headers when
+    nothing is cached) are returned untouched.
+    """
+    headers = dict(headers or {})
+    if not settings.HTTP_CACHE_DIR:
+        return await client.get(url, headers=headers)
+
+    root = Path(settings.HTTP_CACHE_DIR)
+    entry = await asyncio.to_thread(_load_entry, root, url)
+    request = client.build_request("GET", url, headers=headers)
+
+    if settings.HTTP_CACHE_REPLAY:
+        if entry is None:
+            raise CacheMiss(f"No cached response for {url}")
+        content = await asyncio.to_thread(_read_blob, root, entry["sha256"])
+        # Replays always count as changed so the caller re-ingests them
+        return _from_cache(request, content, entry, unchanged=False)
+
+    if entry is not None:
+        if "etag" in entry["headers"]:
+            request.headers["If-None-Match"] = entry["headers"]["etag"]
+        if "last-modified" in entry["headers"]:
+            request.headers.setdefault("If-Modified-Since", entry["headers"]["last-modified"])
+
+    resp = await client.send(request)
+    if resp.status_code == 304 and entry is not None:
+        logger.info("Upstream unchanged, serving %s from cache", url[:120])
+        content = await asyncio.to_thread(_read_blob, root, entry["sha256"])
+        return _from_cache(request, content, entry, unchanged=True)
+    if not resp.is_success:
+        return resp
+
+    digest = await asyncio.to_thread(_store, root, url, resp.content, resp.headers)
+    resp.extensions = {**resp.extensions, "unchanged": entry is not None and entry["sha256"] == digest}
+    return resp
+
+
+def is_unchanged(resp: httpx.Response) -> bool:
+    """True when ``resp`` is byte-identical to the previously cached response for its URL."""
+    return resp.extensions.get("unchanged", False)
+
+
+@dataclass
+class Download:
+    """A response body on disk, as produced by ``cached_download``.
+
+    ``path`` is None when the caller's own conditional headers were answered
+    with 304 and no cached copy exists; ``unchanged`` is then True.
+    """
+
+    path: Path | None
+    compressed: bool
+    unchanged: bool
+    # SHA-256 of the decompressed body, and the response's validators
+    sha256: str | None = None
+    etag: str | None = None
+    last_modified: str | None = None
+
+    def open(self) -> BinaryIO:
+        """Open the (decompressed) body for reading; safe to call from a worker thread."""
+        if self.path is None:
+            raise FileNotFoundError("Upstream answered 304 and no cached body exists")
+        return gzip.open(self.path, "rb") if self.compressed else open(self.path, "rb")
+
+
+def _cached_download(root: Path, entry: dict, unchanged: bool) -> Download:
+    return Download(
+        _blob_path(root, entry["sha256"]),
+        compressed=True,
+        unchanged=unchanged,
+        sha256=entry["sha256"],
+        etag=entry["headers"].get("etag"),
+        last_modified=entry["headers"].get("last-modified"),
+    )
+
+
+def _temp_path(root: Path | None) -> Path:
+    if root:
+        root.mkdir(parents=True, exist_ok=True)
+        fd, name = tempfile.mkstemp(dir=root, suffix=".part")
+    else:
+        fd, name = tempfile.mkstemp(suffix=".download")
+    os.close(fd)
+    return Path(name)
+
+
+def _chunk_sink(path: Path, compressed: bool) -> BinaryIO:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return gzip.open(path, "wb", compresslevel=6) if compressed else open(path, "wb")
+
+
+def _write_chunk(out: BinaryIO, hasher: "hashlib._Hash", chunk: bytes):
+    hasher.update(chunk)
+    out.write(chunk)
+
+
+def _store_download(root: Path, url: str, tmp: Path, digest: str, headers: httpx.Headers) -> Path:
+    """Move a compressed download into the blob store and record its entry."""
+    blob = _blob_path(root, digest)
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp, blob)
+    entry = {
+        "url": url,
+        "sha256": digest,
+        "headers": {name: headers[name] for name in _STORED_HEADERS if name in headers},
+        "fetched_at": datetime.utcnow().isoformat(),
+    }
+    _write_atomic(_entry_path(root, url), json.dumps(entry).encode())
+    return blob
+
+
+@asynccontextmanager
+async def cached_download(client: httpx.AsyncClient, url: str, headers: dict | None = None) -> AsyncIterator[Download]:
+    """Stream ``url`` to disk through the response cache, for bodies too large to hold in memory.
+
+    Same caching rules as ``cached_get``, but the body is written chunk by
+    chunk (compressed straight into the blob store when the cache is
+    enabled, otherwise into a temporary file removed on exit) and never
+    held in memory. A 304 answering the caller's own conditional headers
+    yields a body-less ``Download`` when nothing is cached. Raises
+    ``httpx.HTTPStatusError`` for error responses.
+    """
+    headers = dict(headers or {})
+    root = Path(settings.HTTP_CACHE_DIR) if settings.HTTP_CACHE_DIR else None
+    entry = await asyncio.to_thread(_load_entry, root, url) if root else None
+
+    if root and settings.HTTP_CACHE_REPLAY:
+        if entry is None:
+            raise CacheMiss(f"No cached response for {url}")
+        yield _cached_download(root, entry, unchanged=False)
+        return
+
+    if entry is not None:
+        if "etag" in entry["headers"]:
+            headers["If-None-Match"] = entry["headers"]["etag"]
+        if "last-modified" in entry["headers"]:
+            headers.setdefault("If-Modified-Since", entry["headers"]["last-modified"])
+
+    tmp = None
+    try:
+        async with client.stream("GET", url, headers=headers) as resp:
+            if resp.status_code == 304 and entry is not None:
+                logger.info("Upstream unchanged, serving %s from cache", url[:120])
+                download = _cached_download(root, entry, unchanged=True)
+            elif resp.status_code == 304:
+                download = Download(None, compressed=False, unchanged=True)
+            else:
+                resp.raise_for_status()
+                hasher = hashlib.sha256()
+                # Hashing, compression and disk writes run in a worker thread, off the event loop
+                tmp = await asyncio.to_thread(_temp_path, root)
+                out = await asyncio.to_thread(_chunk_sink, tmp, root is not None)
+                try:
+                    async for chunk in resp.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        await asyncio.to_thread(_write_chunk, out, hasher, chunk)
+                finally:
+                    await asyncio.to_thread(out.close)
+                digest = hasher.hexdigest()
+                download = Download(
+                    tmp,
+                    compressed=root is not None,
+                    unchanged=False,
+                    sha256=digest,
+                    etag=resp.headers.get("etag"),
+                    last_modified=resp.headers.get("last-modified"),
+                )
+                if root:
+                    download.path = await asyncio.to_thread(_store_download, root, url, tmp, digest, resp.headers)
+                    download.unchanged = entry is not None and entry["sha256"] == digest
+        yield download
+    finally:
+        if tmp is not None:
+            tmp.unlink(missing_ok=True)
@@ -1,15 +1,42 @@
+import asyncio
 import logging
-from datetime import datetime
+import multiprocessing
+import time
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import BinaryIO
 
 import httpx
-from sqlalchemy.dialects.postgresql import insert as pg_insert
+import ijson
+from sqlalchemy import Table, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import async_session
-from app.models import GenomicSequence
+from app.config import settings
+from app.database import job_session
+from app.models import DatasetVersion, GenomicSequence
+from app.services.bulk import bulk_upsert, constraint_columns
+from app.services.http_cache import Download, cached_download
+from app.services.response_cache import bump_generation
+from app.services.watermark import get_dataset_versions, save_dataset_versions
 
 logger = logging.getLogger(__name__)
 
-NEXTSTRAIN_URL = "https://nextstrain.org/charon/getDataset?prefix=/flu/seasonal/h3n2/ha/12y"
+NEXTSTRAIN_DATASET_URL = "https://nextstrain.org/charon/getDataset?prefix=/{dataset}"
+NEXTSTRAIN_URL = NEXTSTRAIN_DATASET_URL.format(dataset="flu/seasonal/h3n2/ha/12y")
+
+# Lineage labels for the seasonal influenza dataset names
+LINEAGE_LABELS = {
+    "h1n1pdm": "H1N1pdm",
+    "h3n2": "H3N2",
+    "vic": "B/Victoria",
+    "yam": "B/Yamagata",
+}
 
 # Mapping of Nextstrain country names to ISO 2-letter country codes
 # Nextstrain uses various formats: full names (United States), abbreviations (USA), or ISO codes
@@ -201,67 +228,388 @@ def normalize_country_code(country: str) -> str | None:
     return None
 
 
-async def fetch_nextstrain():
-    """Fetch genomic data from Nextstrain."""
-    async with httpx.AsyncClient(timeout=120) as client:
-        resp = await client.get(NEXTSTRAIN_URL, headers={"Accept": "application/json"})
-        resp.raise_for_status()
-        data = resp.json()
+def _http_client(timeout: float) -> httpx.AsyncClient:
+    concurrency = max(1, len(settings.NEXTSTRAIN_DATASETS))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    return httpx.AsyncClient(timeout=timeout, limits=limits)
 
-    tree = data.get("tree", {})
 
-    records = []
-    _walk_tree(tree, records)
-    logger.info(f"Parsed {len(records)} genomic sequences from Nextstrain")
-    return records
+def dataset_url(dataset: str) -> str:
+    return NEXTSTRAIN_DATASET_URL.format(dataset=dataset.strip("/"))
 
 
-def _walk_tree(node: dict, records: list):
-    """Recursively walk Nextstrain tree to extract sequences."""
-    attrs = node.get("node_attrs", {})
-    country_val = attrs.get("country", {}).get("value", "")
-    clade = attrs.get("clade_membership", {}).get("value", "") or attrs.get("subclade", {}).get("value", "")
-    num_date = attrs.get("num_date", {}).get("value")
+def dataset_lineage(dataset: str) -> str:
+    """Lineage label stored in ``GenomicSequence.lineage`` for a dataset path like ``flu/seasonal/h3n2/ha/12y``."""
+    parts = dataset.strip("/").split("/")
+    name = parts[2] if len(parts) > 2 and parts[:2] == ["flu", "seasonal"] else dataset
+    return LINEAGE_LABELS.get(name, name)
+
+
+# Worker processes parsing datasets, created on first use and kept across
+# runs so each fetch does not pay for spawning interpreters. Shut down with
+# the app (see ``shutdown_parse_pool``).
+_pool: ProcessPoolExecutor | None = None
+
+
+def _parse_pool(datasets: int) -> Executor | None:
+    global _pool
+    if min(settings.NEXTSTRAIN_PARSE_PROCESSES, datasets) <= 1:
+        return None
+    if _pool is None:
+        # spawn: forking a process that runs an event loop and DB driver threads is unsafe
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.NEXTSTRAIN_PARSE_PROCESSES, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def shutdown_parse_pool():
+    """Stop the parse worker processes; blocks until they exit, so call it from a thread."""
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+@dataclass
+class NextstrainFetch:
+    """Outcome of ``fetch_changed_datasets``."""
+
+    records: list[dict] = field(default_factory=list)
+    # Lineages left out because all of their datasets match the stored versions
+    unchanged_lineages: list[str] = field(default_factory=list)
+    # DatasetVersion columns for each dataset parsed this run, keyed by dataset
+    versions: dict[str, dict] = field(default_factory=dict)
+    # Sequences parsed across all datasets, before a lineage's datasets are merged
+    sequences: int = 0
+
+
+def _conditional_headers(known: DatasetVersion | None) -> dict:
+    headers = {"Accept": "application/json"}
+    if known is not None and known.etag:
+        headers["If-None-Match"] = known.etag
+    if known is not None and known.last_modified:
+        headers["If-Modified-Since"] = known.last_modified
+    return headers
+
+
+def _is_unchanged(body: Download, known: DatasetVersion | None) -> bool:
+    if known is None:
+        return False
+    # No path: upstream answered 304 to the stored validators
+    return body.path is None or (body.sha256 is not None and body.sha256 == known.sha256)
+
 
-    if country_val and clade and num_date:
+async def _download_all(stack: AsyncExitStack, client: httpx.AsyncClient, requests: dict[str, dict]) -> dict:
+    """Download each dataset (dataset -> request headers) concurrently; bodies stay on disk until ``stack`` exits."""
+    async with asyncio.TaskGroup() as tg:
+        tasks = {
+            ds: tg.create_task(stack.enter_async_context(cached_download(client, dataset_url(ds), headers=headers)))
+            for ds, headers in requests.items()
+        }
+    return {ds: task.result() for ds, task in tasks.items()}
+
+
+async def fetch_changed_datasets(known: dict[str, DatasetVersion] | None = None) -> NextstrainFetch:
+    """Fetch genomic data for every dataset in ``NEXTSTRAIN_DATASETS`` that changed since ``known``.
+
+    All datasets download concurrently over one connection pool and are
+    streamed to disk, then parsed in parallel worker processes (a worker
+    thread when ``NEXTSTRAIN_PARSE_PROCESSES`` is 0 or 1), so wall-clock
+    time tracks the slowest dataset rather than the sum. Rows are tagged
+    with the dataset's lineage; datasets sharing a lineage (e.g. its HA and
+    NA trees) hold the same sequences, so their counts are merged by taking
+    the larger one.
+
+    ``known`` maps dataset -> the version stored by the previous ingest. Its
+    ETag / Last-Modified are sent as conditional headers so an unchanged
+    dataset is not downloaded at all, and a downloaded body with the same
+    SHA-256 is not parsed. A lineage is skipped only when all of its
+    datasets are unchanged.
+    """
+    datasets = settings.NEXTSTRAIN_DATASETS
+    known = known or {}
+    result = NextstrainFetch()
+    async with AsyncExitStack() as stack:
+        client = await stack.enter_async_context(_http_client(timeout=120))
+        started = time.perf_counter()
+        bodies = await _download_all(stack, client, {ds: _conditional_headers(known.get(ds)) for ds in datasets})
+        checked = time.perf_counter() - started
+
+        lineages = defaultdict(list)
+        for dataset in datasets:
+            lineages[dataset_lineage(dataset)].append(dataset)
+        for lineage, group in list(lineages.items()):
+            if all(_is_unchanged(bodies[ds], known.get(ds)) for ds in group):
+                logger.info(
+                    "Nextstrain %s unchanged since %s (checked in %.2fs), skipping parse and insert",
+                    lineage,
+                    ", ".join(known[ds].meta_updated or known[ds].ingested_at.isoformat() for ds in group),
+                    checked,
+                )
+                result.unchanged_lineages.append(lineage)
+                del lineages[lineage]
+
+        # A partly changed lineage is re-parsed whole; fetch bodies its 304s left out
+        missing = {ds: {"Accept": "application/json"} for group in lineages.values() for ds in group}
+        missing = {ds: headers for ds, headers in missing.items() if bodies[ds].path is None}
+        if missing:
+            bodies.update(await _download_all(stack, client, missing))
+
+        jobs = [(lineage, ds) for lineage, group in lineages.items() for ds in group]
+        pool = _parse_pool(len(jobs))
+        loop = asyncio.get_running_loop()
         try:
-            code = normalize_country_code(country_val)
-            if code is None:
-                pass  # skip unrecognized countries
-            else:
-                year = int(num_date)
-                frac = num_date - year
-                date_val = datetime(year, 1, 1) + __import__("datetime").timedelta(days=frac * 365.25)
-                records.append(
-                    {
-                        "country_code": code,
-                        "clade": clade,
-                        "lineage": "",
-                        "collection_date": date_val.date(),
-                        "count": 1,
-                    }
+            parsed = await asyncio.gather(
+                *(
+                    loop.run_in_executor(pool, _read_dataset, str(bodies[ds].path), bodies[ds].compressed, lineage)
+                    for lineage, ds in jobs
                 )
-        except (ValueError, TypeError):
-            pass
+            )
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); the next run starts a fresh pool
+            await asyncio.to_thread(shutdown_parse_pool)
+            raise
+
+    for (_, ds), (_, meta_updated) in zip(jobs, parsed):
+        body = bodies[ds]
+        result.versions[ds] = {
+            "etag": body.etag,
+            "last_modified": body.last_modified,
+            "meta_updated": meta_updated,
+            "sha256": body.sha256,
+        }
+    result.sequences = sum(r["count"] for rows, _ in parsed for r in rows)
+    result.records = _merge_datasets(rows for rows, _ in parsed)
+    logger.info(
+        "Parsed %s genomic sequences from %s Nextstrain datasets into %s rows",
+        result.sequences,
+        len(jobs),
+        len(result.records),
+    )
+    return result
+
+
+async def fetch_nextstrain() -> list[dict]:
+    """Fetch and parse every dataset in ``NEXTSTRAIN_DATASETS`` unconditionally."""
+    return (await fetch_changed_datasets()).records
+
+
+def _meta_updated(fp: BinaryIO) -> str | None:
+    """The dataset's ``meta.updated`` stamp, if ``meta`` precedes ``tree`` (as auspice writes it)."""
+    for prefix, event, value in ijson.parse(fp):
+        if prefix == "meta.updated":
+            return str(value)
+        if prefix == "tree":
+            return None
+    return None
+
+
+def _read_dataset(path: str, compressed: bool, lineage: str) -> tuple[list[dict], str | None]:
+    """Parse one downloaded dataset into (rows, meta.updated); runs in a worker process or thread."""
+    body = Download(Path(path), compressed=compressed, unchanged=False)
+    with body.open() as fp:
+        meta_updated = _meta_updated(fp)
+    with body.open() as fp:
+        return _aggregate_records(iter_dataset_records(fp), lineage), meta_updated
 
-    for child in node.get("children", []):
-        _walk_tree(child, records)
 
+def _aggregate_records(records: Iterable[dict], lineage: str = "") -> list[dict]:
+    """Collapse leaf records to one row per ``uq_genomic_seq`` key, summing their counts."""
+    totals = {}
+    for rec in records:
+        key = (rec["country_code"], rec["clade"], lineage, rec["collection_date"])
+        if key in totals:
+            totals[key]["count"] += rec["count"]
+        else:
+            totals[key] = {**rec, "lineage": lineage}
+    return list(totals.values())
 
-async def ingest_nextstrain():
-    """Fetch and upsert Nextstrain data."""
+
+def _merge_datasets(datasets: Iterable[list[dict]]) -> list[dict]:
+    """Combine per-dataset rows; a key present in several datasets keeps its largest count."""
+    merged = {}
+    for rows in datasets:
+        for rec in rows:
+            key = (rec["country_code"], rec["clade"], rec["lineage"], rec["collection_date"])
+            if key not in merged or rec["count"] > merged[key]["count"]:
+                merged[key] = rec
+    return list(merged.values())
+
+
+# node_attrs entries read from each tree node
+_TRACKED_ATTRS = ("country", "clade_membership", "subclade", "num_date")
+
+
+def _leaf_record(values: dict) -> dict | None:
+    """Genomic sequence row for one tip's attribute values, or None if it is incomplete."""
+    country_val = values.get("country") or ""
+    clade = values.get("clade_membership") or values.get("subclade") or ""
+    num_date = values.get("num_date")
+    if not (country_val and clade and num_date):
+        return None
+    try:
+        code = normalize_country_code(country_val)
+        if code is None:
+            return None  # skip unrecognized countries
+        year = int(num_date)
+        frac = num_date - year
+        date_val = datetime(year, 1, 1) + timedelta(days=frac * 365.25)
+    except (ValueError, TypeError):
+        return None
+    return {
+        "country_code": code,
+        "clade": clade,
+        "lineage": "",
+        "collection_date": date_val.date(),
+        "count": 1,
+    }
+
+
+def _walk_tree(node: dict, records: list):
+    """Walk an in-memory Nextstrain tree depth-first (pre-order) to extract sequences.
+
+    Only tips (nodes without children) are sequences; internal nodes carry
+    inferred ancestral attributes and are skipped.
+    """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        children = node.get("children")
+        if children:
+            stack.extend(reversed(children))
+            continue
+        attrs = node.get("node_attrs", {})
+        record = _leaf_record({name: attrs.get(name, {}).get("value") for name in _TRACKED_ATTRS})
+        if record:
+            records.append(record)
+
+
+_START_EVENTS = frozenset(("start_map", "start_array"))
+_END_EVENTS = frozenset(("end_map", "end_array"))
+
+
+class _Frame:
+    """An open JSON container while streaming a dataset."""
+
+    __slots__ = ("role", "key", "values", "has_children")
+
+    def __init__(self, role: str, values: dict | None = None):
+        self.role = role
+        self.key = None
+        self.values = values
+        self.has_children = False
+
+
+def iter_dataset_records(fp: BinaryIO) -> Iterator[dict]:
+    """Stream sequence records out of an auspice dataset JSON file, in tree pre-order.
+
+    Driven by ijson's low-level event stream with an explicit stack of open
+    containers, so memory use is bounded by the tree depth rather than its
+    size, and arbitrarily deep trees cannot hit the recursion limit. Only
+    tips are emitted, as in ``_walk_tree``; whether a node has children is
+    only known once its map closes, so that is when it is emitted.
+    """
+    stack: list[_Frame] = []
+    # Depth inside a container we don't care about (branch_attrs, meta, ...);
+    # its events are only counted, never interpreted.
+    skip = 0
+
+    for event, value in ijson.basic_parse(fp, use_float=True):
+        if skip:
+            if event in _START_EVENTS:
+                skip += 1
+            elif event in _END_EVENTS:
+                skip -= 1
+            continue
+        top = stack[-1] if stack else None
+        if event == "map_key":
+            top.key = value
+        elif event == "start_map":
+            if top is None:
+                stack.append(_Frame("root"))
+            elif top.role == "root" and top.key == "tree":
+                stack.append(_Frame("node", {}))
+            elif top.role == "children":
+                # node <- children
+                stack[-2].has_children = True
+                stack.append(_Frame("node", {}))
+            elif top.role == "node" and top.key == "node_attrs":
+                stack.append(_Frame("node_attrs"))
+            elif top.role == "node_attrs" and top.key in _TRACKED_ATTRS:
+                stack.append(_Frame("attr"))
+            else:
+                skip = 1
+        elif event == "start_array":
+            if top.role == "node" and top.key == "children":
+                stack.append(_Frame("children"))
+            else:
+                skip = 1
+        elif event in _END_EVENTS:
+            frame = stack.pop()
+            if frame.role == "node" and not frame.has_children and (record := _leaf_record(frame.values)):
+                yield record
+        elif top.role == "attr" and top.key == "value":
+            # node <- node_attrs <- attr
+            stack[-3].values[stack[-2].key] = value
+
+
+async def _stored_lineages() -> set[str]:
+    async with job_session() as session:
+        result = await session.execute(select(GenomicSequence.lineage).distinct())
+        return set(result.scalars())
+
+
+async def _copy_live_rows(session: AsyncSession, target: Table, lineages: list[str]) -> int:
+    """Copy the live rows of ``lineages`` into ``target`` (a rebuild's shadow table)."""
+    live = GenomicSequence.__table__
+    columns = [c.name for c in live.columns if not c.primary_key]
+    result = await session.execute(
+        insert(target).from_select(
+            columns, select(*(live.c[name] for name in columns)).where(live.c.lineage.in_(lineages))
+        )
+    )
+    return result.rowcount
+
+
+async def ingest_nextstrain(target: Table | None = None):
+    """Fetch and upsert Nextstrain data for the datasets that changed since the last ingest.
+
+    ``target`` defaults to ``genomic_sequences``; the daily rebuild passes its
+    shadow table, into which the live rows of unchanged lineages are copied.
+    Stored versions are only trusted for lineages that still have rows in
+    ``genomic_sequences``, so an emptied table is always refilled.
+    """
+    started = time.perf_counter()
     try:
-        records = await fetch_nextstrain()
-        if not records:
-            return
-
-        async with async_session() as session:
-            for i in range(0, len(records), 1000):
-                batch = records[i : i + 1000]
-                stmt = pg_insert(GenomicSequence).values(batch)
-                stmt = stmt.on_conflict_do_nothing(constraint="uq_genomic_seq")
-                await session.execute(stmt)
+        stored = await _stored_lineages()
+        known = {ds: v for ds, v in (await get_dataset_versions()).items() if dataset_lineage(ds) in stored}
+        fetched = await fetch_changed_datasets(known)
+
+        table = target if target is not None else GenomicSequence.__table__
+        async with job_session() as session:
+            if target is not None and fetched.unchanged_lineages:
+                copied = await _copy_live_rows(session, target, fetched.unchanged_lineages)
+                logger.info("Copied %s unchanged genomic rows into %s", copied, target.name)
+            if fetched.records:
+                # The dataset is a full snapshot, so its counts replace stored ones
+                await bulk_upsert(
+                    session,
+                    table,
+                    fetched.records,
+                    constraint_columns(table, "uq_genomic_seq"),
+                    update_columns=["count"],
+                )
             await session.commit()
-            logger.info(f"Ingested {len(records)} genomic sequences")
+        if target is None and fetched.records:
+            bump_generation()
+        if fetched.versions:
+            await save_dataset_versions(fetched.versions)
+        logger.info(
+            "Ingested %s genomic sequences in %.1fs (%s lineages unchanged)",
+            len(fetched.records),
+            time.perf_counter() - started,
+            len(fetched.unchanged_lineages),
+        )
     except Exception:
         logger.exception("Nextstrain ingestion failed")
@@ -0,0 +1,122 @@
+"""Yearly range partitions of ``flu_cases`` on PostgreSQL.
+
+``flu_cases`` is partitioned by ``RANGE (time)`` with one partition per ISO
+year, named ``<table>_y<year>`` (``flu_cases_y2025``). A row's ``time`` is
+the Monday of its ISO week, so bounding each partition by the Mondays that
+start ISO week 1 of consecutive years puts every row in the partition of its
+``iso_year``. Queries over the last few weeks or the last year therefore
+prune to one or two partitions, and a year of history can be truncated,
+reloaded or dropped on its own.
+
+Partitions are created on demand, before rows for a year without one are
+written. Migration 0004 converts an existing unpartitioned table. Other
+dialects (SQLite in tests) use a plain table, and everything here is a
+no-op on them.
+"""
+
+import logging
+from collections.abc import Iterable
+from datetime import date
+
+from sqlalchemy import Table, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.database import job_engine
+
+logger = logging.getLogger(__name__)
+
+PARTITION_COLUMN = "time"
+
+# (table name, ISO year) pairs known to have a partition, so steady-state
+# ingestion does not query the catalog on every upsert. Cleared whenever
+# tables are swapped or recreated under the same name.
+_known: set[tuple[str, int]] = set()
+
+
+def partition_name(table_name: str, year: int) -> str:
+    return f"{table_name}_y{year}"
+
+
+def year_bounds(year: int) -> tuple[date, date]:
+    """[start, end) of ISO ``year`` as dates: the Mondays of its first week and of the next year's."""
+    return date.fromisocalendar(year, 1, 1), date.fromisocalendar(year + 1, 1, 1)
+
+
+def forget_partitions():
+    """Drop the cache of known partitions after tables were renamed or recreated."""
+    _known.clear()
+
+
+async def is_partitioned(conn: AsyncConnection, table_name: str) -> bool:
+    result = await conn.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:t)"),
+        {"t": table_name},
+    )
+    return bool(result.scalar())
+
+
+async def _partition_years(conn: AsyncConnection, parent: str, name_prefix: str) -> dict[int, str]:
+    """Partitions of ``parent`` named ``<name_prefix>_y<year>``, keyed by year."""
+    result = await conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:t)"
+        ),
+        {"t": parent},
+    )
+    prefix = f"{name_prefix}_y"
+    return {
+        int(name[len(prefix) :]): name
+        for name in result.scalars()
+        if name.startswith(prefix) and name[len(prefix) :].isdigit()
+    }
+
+
+async def create_year_partition(conn: AsyncConnection, table_name: str, year: int):
+    start, end = year_bounds(year)
+    await conn.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(table_name, year)} PARTITION OF {table_name} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    )
+    logger.info("Created partition %s for %s to %s", partition_name(table_name, year), start, end)
+
+
+async def ensure_year_partitions(table: Table, years: Iterable[int]):
+    """Create any missing partitions of ``table`` for ISO ``years``.
+
+    Runs in its own short transaction: creating a partition briefly locks
+    the parent table, which should not be held for the length of an upsert.
+    """
+    if job_engine.dialect.name != "postgresql":
+        return
+    missing = {year for year in years if (table.name, year) not in _known}
+    if not missing:
+        return
+    async with job_engine.begin() as conn:
+        # An unpartitioned table (before migration 0004) takes rows for any year
+        if await is_partitioned(conn, table.name):
+            existing = await _partition_years(conn, table.name, table.name)
+            for year in sorted(missing - existing.keys()):
+                await create_year_partition(conn, table.name, year)
+    _known.update((table.name, year) for year in missing)
+
+
+async def rename_partitions(conn: AsyncConnection, parent: str, old_name: str):
+    """After renaming table ``old_name`` to ``parent``, rename its partitions to match.
+
+    The partitions' own indexes are named after the partition when it was
+    created (``flu_cases_shadow_y2025_pkey``) and are renamed along with
+    it, so later generations can reuse the names.
+    """
+    for year, name in (await _partition_years(conn, parent, old_name)).items():
+        new_name = partition_name(parent, year)
+        indexes = await conn.execute(
+            text("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :t"),
+            {"t": name},
+        )
+        await conn.execute(text(f"ALTER TABLE {name} RENAME TO {new_name}"))
+        for index in indexes.scalars().all():
+            if index.startswith(name):
+                await conn.execute(text(f"ALTER INDEX {index} RENAME TO {new_name}{index[len(name) :]}"))
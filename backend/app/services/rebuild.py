@@ -0,0 +1,224 @@
+"""Zero-downtime full rebuild: load shadow tables, validate, then swap them in.
+
+On PostgreSQL each rebuilt table gets a ``<name>_shadow`` copy created with
+``LIKE ... INCLUDING ALL`` (same columns, defaults, constraints and
+indexes); a partitioned table's shadow is partitioned the same way and its
+yearly partitions are renamed along with it. Ingestion writes into the
+shadows while readers keep using the live tables; once row counts and date
+spans check out, the shadows are vacuumed and renamed into place inside one
+short transaction. If validation, the VACUUM or the swap fails, the shadows
+are dropped and the live tables stay as they were. The replaced tables are
+kept as ``<name>_old`` until the next rebuild so they can be restored with
+``restore_previous_generation``.
+
+Other dialects (SQLite in tests) fall back to clearing and re-ingesting the
+live tables in place.
+"""
+
+import logging
+import re
+
+from sqlalchemy import MetaData, Table, delete, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import settings
+from app.database import job_engine, job_session
+from app.models import Anomaly, FluCase, GenomicSequence
+from app.services.flunet import ingest_flunet_full
+from app.services.nextstrain import ingest_nextstrain
+from app.services.partitions import PARTITION_COLUMN, forget_partitions, is_partitioned, rename_partitions
+from app.services.rollup import rebuild_rollups
+from app.services.watermark import clear_dataset_versions
+
+logger = logging.getLogger(__name__)
+
+SHADOW_SUFFIX = "_shadow"
+PREVIOUS_SUFFIX = "_old"
+SWAP_LOCK_TIMEOUT = "10s"
+
+# Rebuilt tables and the date column used for the span check
+REBUILT_TABLES = [
+    (FluCase.__table__, "time"),
+    (GenomicSequence.__table__, "collection_date"),
+]
+
+_INDEX_NAME_RE = re.compile(r"^(CREATE (?:UNIQUE )?INDEX) \S+ ON (?:ONLY )?\S+")
+
+
+def shadow_of(table: Table) -> Table:
+    """Table object for ``<name>_shadow`` with the model's columns, for DML only."""
+    return table.to_metadata(MetaData(), name=table.name + SHADOW_SUFFIX)
+
+
+def _index_signature(indexdef: str) -> str:
+    """Index definition with its own name and table name removed, for matching across tables."""
+    return _INDEX_NAME_RE.sub(r"\1 ON", indexdef)
+
+
+async def _indexes(conn: AsyncConnection, table_name: str) -> dict[str, str]:
+    """Map index signature -> index name for ``table_name``."""
+    result = await conn.execute(
+        text("SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :t"),
+        {"t": table_name},
+    )
+    return {_index_signature(row.indexdef): row.indexname for row in result}
+
+
+async def create_shadow(conn: AsyncConnection, table: Table):
+    shadow = table.name + SHADOW_SUFFIX
+    await conn.execute(text(f"DROP TABLE IF EXISTS {shadow}"))
+    partitioning = f" PARTITION BY RANGE ({PARTITION_COLUMN})" if await is_partitioned(conn, table.name) else ""
+    await conn.execute(text(f"CREATE TABLE {shadow} (LIKE {table.name} INCLUDING ALL){partitioning}"))
+
+
+async def _table_stats(conn: AsyncConnection, table_name: str, date_column: str):
+    result = await conn.execute(
+        text(f"SELECT count(*) AS n, min({date_column}) AS min_date, max({date_column}) AS max_date FROM {table_name}")
+    )
+    return result.one()
+
+
+def _span_days(stats) -> int:
+    if stats.min_date is None or stats.max_date is None:
+        return 0
+    return (stats.max_date - stats.min_date).days
+
+
+def _validation_problems(name: str, live, shadow, min_ratio: float) -> list[str]:
+    problems = []
+    if not shadow.n:
+        problems.append(f"{name}: shadow is empty")
+    elif shadow.n < live.n * min_ratio:
+        problems.append(f"{name}: shadow has {shadow.n} rows vs {live.n} live")
+    if _span_days(shadow) < _span_days(live) * min_ratio:
+        problems.append(f"{name}: shadow spans {_span_days(shadow)} days vs {_span_days(live)} live")
+    return problems
+
+
+async def validate_shadow(conn: AsyncConnection, table: Table, date_column: str) -> list[str]:
+    """Compare the shadow against the live table; returns a list of problems (empty when valid)."""
+    live = await _table_stats(conn, table.name, date_column)
+    shadow = await _table_stats(conn, table.name + SHADOW_SUFFIX, date_column)
+    return _validation_problems(table.name, live, shadow, settings.REBUILD_MIN_RATIO)
+
+
+async def _swap(conn: AsyncConnection, live: str, incoming: str, retired: str):
+    """Rename ``live`` -> ``retired`` and ``incoming`` -> ``live``.
+
+    Index names are carried across so the live table always keeps the
+    canonical names that ``create_all`` and the migrations refer to.
+    """
+    live_indexes = await _indexes(conn, live)
+    incoming_indexes = await _indexes(conn, incoming)
+
+    await conn.execute(text(f"DROP TABLE IF EXISTS {retired}"))
+    await conn.execute(text(f"ALTER TABLE {live} RENAME TO {retired}"))
+    await rename_partitions(conn, retired, live)
+    for i, name in enumerate(sorted(live_indexes.values())):
+        await conn.execute(text(f"ALTER INDEX {name} RENAME TO {retired}_idx{i}"))
+
+    await conn.execute(text(f"ALTER TABLE {incoming} RENAME TO {live}"))
+    await rename_partitions(conn, live, incoming)
+    for signature, name in incoming_indexes.items():
+        canonical = live_indexes.get(signature)
+        if canonical and canonical != name:
+            await conn.execute(text(f"ALTER INDEX {name} RENAME TO {canonical}"))
+
+    # LIKE copies the id default, so both generations draw from one sequence;
+    # hand it to the live table so dropping the retired one keeps it.
+    seq = (await conn.execute(text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": retired})).scalar()
+    if seq:
+        await conn.execute(text(f"ALTER SEQUENCE {seq} OWNED BY {live}.id"))
+
+
+async def _vacuum_shadows():
+    """VACUUM ANALYZE the loaded shadows before they go live.
+
+    Fills in the visibility map, so the covering indexes serve index-only
+    scans straight away, and gives the planner statistics for the new data.
+    VACUUM cannot run inside a transaction, hence the autocommit connection.
+    """
+    async with job_engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for table, _ in REBUILT_TABLES:
+            await conn.execute(text(f"VACUUM (ANALYZE) {table.name}{SHADOW_SUFFIX}"))
+
+
+async def _discard_shadows():
+    async with job_engine.begin() as conn:
+        for table, _ in REBUILT_TABLES:
+            await conn.execute(text(f"DROP TABLE IF EXISTS {table.name}{SHADOW_SUFFIX}"))
+    # The stored dataset versions describe the discarded shadow, not the live rows
+    await clear_dataset_versions()
+
+
+async def run_full_rebuild() -> bool:
+    """Re-ingest all FluNet and Nextstrain data; returns True when new data went live."""
+    if job_engine.dialect.name != "postgresql":
+        return await _rebuild_in_place()
+
+    async with job_engine.begin() as conn:
+        for table, _ in REBUILT_TABLES:
+            await create_shadow(conn, table)
+    forget_partitions()
+    logger.info("Created shadow tables for rebuild")
+
+    await ingest_flunet_full(target=shadow_of(FluCase.__table__), resume=False)
+    await ingest_nextstrain(target=shadow_of(GenomicSequence.__table__))
+
+    async with job_engine.connect() as conn:
+        problems = []
+        for table, date_column in REBUILT_TABLES:
+            problems += await validate_shadow(conn, table, date_column)
+    if problems:
+        logger.error("Rebuild validation failed, keeping current data: %s", "; ".join(problems))
+        await _discard_shadows()
+        return False
+
+    try:
+        await _vacuum_shadows()
+        async with job_engine.begin() as conn:
+            # Fail fast rather than queue every reader behind the rename
+            await conn.execute(text(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'"))
+            for table, _ in REBUILT_TABLES:
+                await _swap(conn, table.name, table.name + SHADOW_SUFFIX, table.name + PREVIOUS_SUFFIX)
+    except Exception:
+        # The swap transaction rolled back, so the live tables are untouched
+        logger.exception("Rebuild swap failed, keeping current data")
+        await _discard_shadows()
+        return False
+    forget_partitions()
+    logger.info("Swapped rebuilt tables into place; previous generation kept as *%s", PREVIOUS_SUFFIX)
+    await rebuild_rollups()
+    return True
+
+
+async def restore_previous_generation():
+    """Swap the ``*_old`` tables back in; the replaced data becomes the new ``*_old``."""
+    async with job_engine.begin() as conn:
+        for table, _ in REBUILT_TABLES:
+            previous = table.name + PREVIOUS_SUFFIX
+            parked = table.name + SHADOW_SUFFIX
+            await _swap(conn, table.name, previous, parked)
+            await conn.execute(text(f"ALTER TABLE {parked} RENAME TO {previous}"))
+            await rename_partitions(conn, previous, parked)
+    forget_partitions()
+    await clear_dataset_versions()
+    await rebuild_rollups()
+    logger.info("Restored previous generation of rebuilt tables")
+
+
+async def _rebuild_in_place() -> bool:
+    async with job_session() as session:
+        for table, _ in REBUILT_TABLES:
+            await session.execute(delete(table))
+        await session.execute(delete(Anomaly))
+        await session.commit()
+    logger.info("Cleared tables for in-place rebuild")
+
+    # Checkpoints left by an earlier backfill must not skip years of the emptied table
+    await ingest_flunet_full(resume=False)
+    await ingest_nextstrain()
+    # Upserts only refresh the weeks they wrote; drop rollups of vanished weeks too
+    await rebuild_rollups()
+    return True
@@ -0,0 +1,182 @@
+"""In-process cache of serialized API responses.
+
+Read endpoints only change when a scheduler job commits new data, so their
+JSON bodies are cached under (endpoint, parameters, generation). The
+parameters are the values FastAPI bound to the handler, defaults included,
+so ``/forecast`` and ``/forecast?weeks=8`` share an entry and the order of
+the query string does not matter.
+
+Writers call ``bump_generation()`` after committing (FluNet and Nextstrain
+upserts, anomaly detection, rebuild swaps and restores). That empties the
+cache; a request that started before the bump stores its body under the old
+generation, where it is never read again. Reads then stay on the primary
+for READ_REPLICA_MAX_LAG_SECONDS (``app.database.hold_reads_on_primary``),
+so a lagging replica cannot fill the new generation with the old data.
+
+Entries are evicted least-recently-used once there are more than
+RESPONSE_CACHE_MAX_ENTRIES of them or they hold more than
+RESPONSE_CACHE_MAX_BYTES. The cache is per process: the scheduler runs in
+the API process, so its bumps reach the cache that serves requests.
+RESPONSE_CACHE_MAX_ENTRIES=0 disables it.
+
+Responses also carry a strong ETag derived from the same key and a
+Cache-Control header (API_CACHE_MAX_AGE, API_STALE_WHILE_REVALIDATE). A
+request whose If-None-Match still matches gets a 304 before the handler or
+the cache is touched. The ETag includes a per-process epoch, because the
+generation restarts at 0 with the process.
+"""
+
+import functools
+import hashlib
+import inspect
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from contextvars import ContextVar
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+from app.config import settings
+from app.database import hold_reads_on_primary
+
+# Set by a handler whose result must not be cached (e.g. a fallback after an error)
+_uncacheable: ContextVar[bool] = ContextVar("uncacheable", default=False)
+
+
+class ResponseCache:
+    """LRU map of response bodies bounded by entry count and total bytes."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.epoch = f"{time.time_ns():x}"
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = 0
+        self._entries: OrderedDict[tuple, bytes] = OrderedDict()
+
+    def get(self, key: tuple) -> bytes | None:
+        body = self._entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key: tuple, body: bytes):
+        if key[-1] != self.generation or len(body) > self.max_bytes or self.max_entries <= 0:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self._entries[key] = body
+        self.size += len(body)
+        while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def bump(self):
+        self.generation += 1
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "generation": self.generation,
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+cache = ResponseCache(settings.RESPONSE_CACHE_MAX_ENTRIES, settings.RESPONSE_CACHE_MAX_BYTES)
+
+
+def bump_generation():
+    """Invalidate every cached response; call after committing new data."""
+    cache.bump()
+    hold_reads_on_primary()
+
+
+def uncacheable():
+    """Keep the current request's response out of the cache."""
+    _uncacheable.set(True)
+
+
+def is_cacheable() -> bool:
+    """False once ``uncacheable()`` was called in the current context.
+
+    Tasks run in a copy of the request's context, so a handler that fans
+    out must collect this from each task and call ``uncacheable()`` itself.
+    """
+    return not _uncacheable.get()
+
+
+def _etag(key: tuple) -> str:
+    digest = hashlib.sha256(repr(key[:-1]).encode()).hexdigest()[:16]
+    return f'"{cache.epoch}-{key[-1]}-{digest}"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def cached_response(endpoint: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+    """Serve ``endpoint`` from the cache, keyed by its bound parameters.
+
+    Goes between ``@router.get(...)`` and the handler. The handler's result
+    is encoded the way FastAPI would encode it and returned as a
+    ``JSONResponse``, so every result must already be an instance of the
+    route's ``response_model``.
+    """
+    name = f"{endpoint.__module__}.{endpoint.__qualname__}"
+
+    @functools.wraps(endpoint)
+    async def wrapper(request: Request, **params):
+        key = (name, tuple(sorted(params.items())), cache.generation)
+        headers = {
+            "ETag": _etag(key),
+            "Cache-Control": (
+                f"public, max-age={settings.API_CACHE_MAX_AGE}, "
+                f"stale-while-revalidate={settings.API_STALE_WHILE_REVALIDATE}"
+            ),
+        }
+        if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        body = cache.get(key)
+        if body is not None:
+            return Response(body, media_type=JSONResponse.media_type, headers=headers)
+        token = _uncacheable.set(False)
+        try:
+            response = JSONResponse(jsonable_encoder(await endpoint(**params)), headers=headers)
+            if _uncacheable.get():
+                del response.headers["etag"]
+                response.headers["cache-control"] = "no-store"
+            else:
+                cache.put(key, response.body)
+        finally:
+            _uncacheable.reset(token)
+        return response
+
+    # FastAPI injects the request for the conditional check; the handler never sees it
+    signature = inspect.signature(endpoint)
+    request = inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+    wrapper.__signature__ = signature.replace(parameters=[*signature.parameters.values(), request])
+    return wrapper
@@ -0,0 +1,72 @@
+"""Weekly rollups of ``flu_cases``.
+
+``cases_weekly``, ``cases_weekly_country`` and ``cases_weekly_flu_type``
+hold ``sum(new_cases)`` at (week), (week, country) and (week, subtype)
+grain. FluNet upserts refresh just the weeks they touched, inside the same
+transaction, so readers never see rollups out of step with ``flu_cases``.
+Anything that replaces ``flu_cases`` wholesale (the daily rebuild, a
+restore) calls ``rebuild_rollups`` afterwards.
+"""
+
+import logging
+import time
+from collections.abc import Iterable
+from datetime import date
+
+from sqlalchemy import delete, exists, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import job_session
+from app.models import CasesByWeek, CasesByWeekCountry, CasesByWeekFluType, FluCase
+from app.services.response_cache import bump_generation
+
+logger = logging.getLogger(__name__)
+
+# Rollup model and the flu_cases columns it groups by
+ROLLUPS = [
+    (CasesByWeek, ["time"]),
+    (CasesByWeekCountry, ["time", "country_code"]),
+    (CasesByWeekFluType, ["time", "flu_type"]),
+]
+
+
+async def refresh_rollups(session: AsyncSession, weeks: Iterable[date] | None = None):
+    """Recompute the rollup rows for ``weeks`` (every week when None) from ``flu_cases``.
+
+    Runs inside the session's transaction; the caller commits.
+    """
+    if weeks is not None:
+        weeks = sorted(set(weeks))
+        if not weeks:
+            return
+    source = FluCase.__table__
+    for model, grain in ROLLUPS:
+        rollup = model.__table__
+        clear = delete(rollup)
+        keys = [source.c[name] for name in grain]
+        totals = select(*keys, func.sum(source.c.new_cases)).group_by(*keys)
+        if weeks is not None:
+            clear = clear.where(rollup.c.time.in_(weeks))
+            totals = totals.where(source.c.time.in_(weeks))
+        await session.execute(clear)
+        await session.execute(insert(rollup).from_select([*grain, "new_cases"], totals))
+
+
+async def rebuild_rollups():
+    """Recompute every rollup from scratch."""
+    started = time.perf_counter()
+    async with job_session() as session:
+        await refresh_rollups(session)
+        await session.commit()
+    # Runs after every rebuild swap and restore, so this also covers the swapped tables
+    bump_generation()
+    logger.info("Rebuilt weekly rollups in %.1fs", time.perf_counter() - started)
+
+
+async def ensure_rollups():
+    """Build the rollups when ``flu_cases`` has data but they do not (first start after an upgrade)."""
+    async with job_session() as session:
+        has_cases = (await session.execute(select(exists().where(FluCase.id.isnot(None))))).scalar()
+        has_rollups = (await session.execute(select(exists().where(CasesByWeek.time.isnot(None))))).scalar()
+    if has_cases and not has_rollups:
+        await rebuild_rollups()
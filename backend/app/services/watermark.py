@@ -0,0 +1,59 @@
+"""Persisted per-source ingestion watermarks and upstream dataset versions."""
+
+import logging
+from datetime import datetime
+
+from sqlalchemy import delete, select
+
+from app.database import job_session
+from app.models import DatasetVersion, IngestionWatermark
+
+logger = logging.getLogger(__name__)
+
+
+async def get_watermark(source: str) -> IngestionWatermark | None:
+    async with job_session() as session:
+        return await session.get(IngestionWatermark, source)
+
+
+async def save_watermark(source: str, **fields) -> None:
+    """Create or update the watermark for ``source`` with the given columns."""
+    async with job_session() as session:
+        watermark = await session.get(IngestionWatermark, source)
+        if watermark is None:
+            watermark = IngestionWatermark(source=source)
+            session.add(watermark)
+        for name, value in fields.items():
+            setattr(watermark, name, value)
+        watermark.updated_at = datetime.utcnow()
+        await session.commit()
+    logger.info("Saved %s watermark: %s", source, fields)
+
+
+async def get_dataset_versions() -> dict[str, DatasetVersion]:
+    """Stored upstream versions, keyed by dataset path."""
+    async with job_session() as session:
+        result = await session.execute(select(DatasetVersion))
+        return {version.dataset: version for version in result.scalars()}
+
+
+async def save_dataset_versions(versions: dict[str, dict]) -> None:
+    """Create or update the version rows for each dataset in ``versions`` (dataset -> columns)."""
+    async with job_session() as session:
+        for dataset, fields in versions.items():
+            version = await session.get(DatasetVersion, dataset)
+            if version is None:
+                version = DatasetVersion(dataset=dataset)
+                session.add(version)
+            for name, value in fields.items():
+                setattr(version, name, value)
+            version.ingested_at = datetime.utcnow()
+        await session.commit()
+
+
+async def clear_dataset_versions() -> None:
+    """Forget all stored versions so the next ingest downloads and parses every dataset."""
+    async with job_session() as session:
+        await session.execute(delete(DatasetVersion))
+        await session.commit()
+    logger.info("Cleared stored dataset versions")
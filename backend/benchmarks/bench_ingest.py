@@ -0,0 +1,168 @@
+"""Benchmark FluNet and Nextstrain ingestion against the local stand-in servers.
+
+Runs each ingestion stage against ``benchmarks.standin`` (no network access)
+and reports records/sec for fetch + parse, rows/sec for the database load,
+how much each stage grew the process's resident set, and the process's peak
+RSS so far (cumulative, so it never drops between stages). Database work
+uses the job pool, as the scheduler does. Loads go to a throwaway SQLite
+file unless ``--database-url`` points at a PostgreSQL scratch database,
+whose tables are dropped and recreated.
+
+Usage (from backend/):
+    python -m benchmarks.bench_ingest [--years 10] [--countries 180] [--page-size 5000]
+        [--tree-leaves 20000] [--tree-depth 200] [--latency 0.0] [--error-rate 0.0]
+        [--concurrency 4]
+        [--database-url postgresql://...]
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import sys
+import tempfile
+import time
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _current_rss_mb() -> float:
+    """Resident set size right now; NaN where /proc is unavailable (macOS)."""
+    try:
+        with open("/proc/self/statm") as fp:
+            pages = int(fp.read().split()[1])
+    except OSError:
+        return float("nan")
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class Report:
+    def __init__(self):
+        self.rows = []
+
+    async def stage(self, name: str, unit: str, coro):
+        """Await ``coro`` (which returns an item count) and record its throughput."""
+        rss_before = _current_rss_mb()
+        start = time.perf_counter()
+        count = await coro
+        elapsed = time.perf_counter() - start
+        self.rows.append((name, count, unit, elapsed, _current_rss_mb() - rss_before, _peak_rss_mb()))
+        return count
+
+    def print(self):
+        print(
+            f"{'stage':<28} {'count':>10} {'unit':<8} {'seconds':>9} {'per sec':>12} "
+            f"{'RSS delta MB':>13} {'peak RSS MB (cum.)':>19}"
+        )
+        for name, count, unit, elapsed, delta, peak in self.rows:
+            rate = count / elapsed if elapsed else float("inf")
+            print(f"{name:<28} {count:>10,} {unit:<8} {elapsed:>9.2f} {rate:>12,.0f} {delta:>+13.1f} {peak:>19.1f}")
+
+
+async def run(args):
+    # Imported here so DATABASE_URL is set before app.config loads
+    from sqlalchemy import func, select
+
+    from app.config import settings
+    from app.database import job_engine, job_session
+    from app.models import Base, FluCase, GenomicSequence
+    from app.services import flunet, nextstrain
+    from app.services.bulk import bulk_upsert, constraint_columns
+    from benchmarks.standin import StandIn, install
+
+    settings.FLUNET_CONCURRENCY = args.concurrency
+    settings.HTTP_CACHE_DIR = ""
+
+    async def reset_tables():
+        async with job_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+
+    async def table_rows(model) -> int:
+        async with job_session() as session:
+            return (await session.execute(select(func.count()).select_from(model))).scalar()
+
+    standin = StandIn(
+        years=args.years,
+        countries=args.countries,
+        page_size=args.page_size,
+        tree_leaves=args.tree_leaves,
+        tree_depth=args.tree_depth,
+        latency=args.latency,
+        error_rate=args.error_rate,
+    )
+    raw_flunet = (args.years + 1) * 52 * args.countries
+    report = Report()
+    await reset_tables()
+
+    with install(standin):
+        rows = []
+
+        async def flunet_fetch():
+            rows.extend(await flunet.fetch_flunet_full(years_back=args.years))
+            return raw_flunet
+
+        async def flunet_load():
+            await flunet._upsert_records(rows)
+            return await table_rows(FluCase)
+
+        async def flunet_end_to_end():
+            await reset_tables()
+            await flunet.ingest_flunet_full()
+            return await table_rows(FluCase)
+
+        sequences = []
+
+        async def nextstrain_fetch():
+            fetched = await nextstrain.fetch_changed_datasets()
+            sequences.extend(fetched.records)
+            return fetched.sequences
+
+        async def nextstrain_load():
+            table = GenomicSequence.__table__
+            async with job_session() as session:
+                await bulk_upsert(
+                    session, table, sequences, constraint_columns(table, "uq_genomic_seq"), update_columns=["count"]
+                )
+                await session.commit()
+            return await table_rows(GenomicSequence)
+
+        await report.stage("flunet fetch+parse", "records", flunet_fetch())
+        await report.stage("flunet db load", "rows", flunet_load())
+        del rows[:]
+        await report.stage("flunet ingest_flunet_full", "rows", flunet_end_to_end())
+        await report.stage("nextstrain fetch+parse", "tips", nextstrain_fetch())
+        await report.stage("nextstrain db load", "rows", nextstrain_load())
+
+    await job_engine.dispose()
+    print(
+        f"stand-in: {standin.requests} requests, {standin.bytes_served / 1e6:,.1f} MB FluNet JSON, "
+        f"{standin.errors} injected errors, latency {args.latency}s"
+    )
+    report.print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--countries", type=int, default=180)
+    parser.add_argument("--page-size", type=int, default=5000)
+    parser.add_argument("--tree-leaves", type=int, default=20000)
+    parser.add_argument("--tree-depth", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every stand-in response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stand-in requests failing with 503")
+    parser.add_argument("--concurrency", type=int, default=4, help="FLUNET_CONCURRENCY for the backfill")
+    parser.add_argument("--database-url", help="scratch database; defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite+aiosqlite:///{tmp}/bench.db"
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Benchmark FluNet record parsing: row-wise reference vs columnar path.
+
+Generates a synthetic 10-year, 180-country FluNet payload and times both
+``_process_records_rowwise`` and ``_process_records``, checking that their
+output is identical.
+
+Usage (from backend/):
+    python -m benchmarks.bench_process_records [--years 10] [--countries 180] [--repeat 3]
+"""
+
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+from app.services.flunet import _process_records, _process_records_rowwise  # noqa: E402
+from benchmarks.standin import country_codes, synthetic_week  # noqa: E402
+
+
+def synthetic_records(years: int = 10, countries: int = 180, seed: int = 0) -> list[dict]:
+    """One record per country per ISO week, with a realistic mix of subtype detail."""
+    rng = random.Random(seed)
+    codes = country_codes(countries, seed)
+    end_year = 2025
+    return [
+        rec
+        for iso_year in range(end_year - years, end_year + 1)
+        for iso_week in range(1, 53)
+        for rec in synthetic_week(iso_year, iso_week, codes, rng)
+    ]
+
+
+def _time(fn, records, repeat: int) -> tuple[float, list[dict]]:
+    best = float("inf")
+    out = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(records)
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--countries", type=int, default=180)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    records = synthetic_records(args.years, args.countries)
+    print(f"{len(records)} synthetic records ({args.years + 1} ISO years x 52 weeks x {args.countries} countries)")
+
+    rowwise_s, expected = _time(_process_records_rowwise, records, args.repeat)
+    columnar_s, actual = _time(_process_records, records, args.repeat)
+    if actual != expected:
+        raise SystemExit("columnar output differs from the row-wise reference")
+
+    print(f"{len(expected)} aggregated rows, outputs identical")
+    print(f"row-wise:  {rowwise_s * 1000:8.1f} ms  ({len(records) / rowwise_s:,.0f} records/s)")
+    print(f"columnar:  {columnar_s * 1000:8.1f} ms  ({len(records) / columnar_s:,.0f} records/s)")
+    print(f"speedup:   {rowwise_s / columnar_s:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""Local stand-in for the WHO FluNet and Nextstrain APIs.
+
+``StandIn.handler`` is an ``httpx.MockTransport`` handler that serves
+deterministic synthetic data:
+
+* FluNet: OData responses for the ``$filter`` expressions the ingestion
+  code sends (year ranges and "since week" filters), honouring ``$select``,
+  ``$orderby``, ``$top`` and ``$skip``. Results larger than ``page_size``
+  are split with server-driven ``@odata.nextLink`` paging.
+* Nextstrain: ``getDataset`` responses whose ``tree`` has a configurable
+  number of leaves and depth, with a different tree for each dataset.
+  Responses carry an ETag and honour If-None-Match unless ``etags`` is off.
+
+Per-request latency and a random 503 rate can be injected. ``install``
+points the ingestion services' HTTP clients at the stand-in.
+
+Usage:
+    standin = StandIn(years=10, countries=180, page_size=5000, latency=0.05)
+    with install(standin):
+        await ingest_flunet_full()
+"""
+
+import asyncio
+import json
+import random
+import re
+import string
+import zlib
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import httpx
+
+from app.services import flunet, nextstrain
+from app.services.flunet import AGGREGATE_FIELDS, LAST_RESORT_FIELDS, SPECIFIC_FIELDS, UK_CODES
+
+FLUNET_HOST = httpx.URL(flunet.FLUNET_URL).host
+NEXTSTRAIN_HOST = httpx.URL(nextstrain.NEXTSTRAIN_URL).host
+
+_YEAR_RANGE_RE = re.compile(r"ISO_YEAR ge (\d+) and ISO_YEAR lt (\d+)")
+_SINCE_RE = re.compile(r"ISO_YEAR gt (\d+) or \(ISO_YEAR eq \d+ and ISO_WEEK ge (\d+)\)")
+
+# Columns VIW_FNT returns besides the ones ingestion reads, with representative values
+EXTRA_COLUMNS = {
+    "WHOREGION": "EUR",
+    "FLUSEASON": "NH",
+    "HEMISPHERE": "NH",
+    "ITZ": "FLU_NTH_EUR",
+    "COUNTRY_AREA_TERRITORY": "Synthetic Republic of Testing",
+    "ISO_WEEKSTARTDATE": "2025-01-06T00:00:00Z",
+    "ISO_SDATE": "2025-01-06T00:00:00Z",
+    "ISO_YW": 202502,
+    "MMWR_WEEKSTARTDATE": "2025-01-05T00:00:00Z",
+    "MMWR_YEAR": 2025,
+    "MMWR_WEEK": 2,
+    "ORIGIN_SOURCE": "NOTDEFINED",
+    "SPEC_PROCESSED_NB": 412,
+    "SPEC_RECEIVED_NB": 415,
+    "AH1": None,
+    "AH5": None,
+    "AH7N9": None,
+    "ANOTSUBTYPED": 3,
+    "ANOTSUBTYPABLE": None,
+    "AOTHER_SUBTYPE": None,
+    "AOTHER_SUBTYPE_DETAILS": None,
+    "BNOTDETERMINED": 1,
+    "INF_NEGATIVE": 350,
+    "ILI_ACTIVITY": "Low",
+    "ADENO": None,
+    "BOCA": None,
+    "HUMAN_CORONA": None,
+    "METAPNEUMO": None,
+    "PARAINFLUENZA": None,
+    "RHINO": None,
+    "RSV": 12,
+    "OTHERRESPVIRUS": None,
+    "OTHER_RESPVIRUS_DETAILS": None,
+    "LAB_RESULT_COMMENT": None,
+    "WCR_COMMENT": None,
+    "ISOYW": 202502,
+}
+
+NEXTSTRAIN_COUNTRIES = ["USA", "United Kingdom", "Japan", "Brazil", "Kenya", "Australia", "India", "France"]
+NEXTSTRAIN_CLADES = ["3C.2a1b", "2a.1", "2a.3a.1", "2b", "1a.1", "J.2"]
+
+
+def country_codes(countries: int, seed: int = 0) -> list[str]:
+    """``countries`` distinct ISO2-like codes, always including the UK constituents."""
+    rng = random.Random(seed)
+    codes = sorted({a + b for a in string.ascii_uppercase for b in string.ascii_uppercase} - UK_CODES)
+    return rng.sample(codes, max(0, countries - len(UK_CODES))) + sorted(UK_CODES)
+
+
+def _order_by(records: list[dict], orderby: str) -> list[dict]:
+    """Sort ``records`` by an OData ``$orderby`` ("A,B desc,..."); nulls sort first, as in OData."""
+    for term in reversed(orderby.split(",")):
+        name, _, direction = term.strip().partition(" ")
+        records = sorted(
+            records,
+            key=lambda rec: (rec.get(name) is not None, rec.get(name)),
+            reverse=direction.strip().lower() == "desc",
+        )
+    return records
+
+
+def synthetic_week(iso_year: int, iso_week: int, codes: list[str], rng: random.Random) -> list[dict]:
+    """One FluNet record per country for a week, with a realistic mix of subtype detail."""
+    records = []
+    for code in codes:
+        rec = {**EXTRA_COLUMNS, "ISO2": code, "COUNTRY_CODE": code, "ISO_YEAR": iso_year, "ISO_WEEK": iso_week}
+        detail = rng.random()
+        if detail < 0.6:
+            for name in SPECIFIC_FIELDS:
+                rec[name] = rng.choice([None, 0, rng.randint(1, 500)])
+        if detail < 0.85:
+            for name in AGGREGATE_FIELDS:
+                rec[name] = rng.choice([None, 0, rng.randint(1, 2000)])
+        for name in LAST_RESORT_FIELDS:
+            rec[name] = rng.choice([None, rng.randint(0, 5000)])
+        records.append(rec)
+    return records
+
+
+def synthetic_tree(leaves: int, depth: int, seed: int = 0) -> dict:
+    """A Nextstrain-style ladder tree: ``depth`` nested internal nodes sharing ``leaves`` tips.
+
+    Real influenza trees are deep and unbalanced, so each internal node holds
+    a slice of the tips plus the next internal node. As in auspice output,
+    internal nodes carry the same inferred attributes as tips.
+    """
+    rng = random.Random(seed)
+    depth = max(1, depth)
+    per_level, extra = divmod(leaves, depth)
+
+    def node_attrs() -> dict:
+        return {
+            "country": {"value": rng.choice(NEXTSTRAIN_COUNTRIES)},
+            "clade_membership": {"value": rng.choice(NEXTSTRAIN_CLADES)},
+            "num_date": {"value": round(rng.uniform(2014.0, 2025.9), 4)},
+        }
+
+    root = {"name": "NODE_0", "node_attrs": node_attrs(), "children": []}
+    node = root
+    tip = 0
+    for level in range(depth):
+        for _ in range(per_level + (1 if level < extra else 0)):
+            node["children"].append({"name": f"TIP_{tip}", "node_attrs": node_attrs()})
+            tip += 1
+        if level < depth - 1:
+            child = {"name": f"NODE_{level + 1}", "node_attrs": node_attrs(), "children": []}
+            node["children"].append(child)
+            node = child
+    return root
+
+
+@dataclass
+class StandIn:
+    years: int = 10
+    countries: int = 180
+    page_size: int = 5000
+    tree_leaves: int = 20000
+    tree_depth: int = 200
+    # Seconds added to every response, and fraction of requests answered with 503
+    latency: float = 0.0
+    error_rate: float = 0.0
+    end_year: int = field(default_factory=lambda: datetime.utcnow().year)
+    seed: int = 0
+    etags: bool = True
+    requests: int = 0
+    errors: int = 0
+    not_modified: int = 0
+    bytes_served: int = 0
+
+    def __post_init__(self):
+        self._codes = country_codes(self.countries, self.seed)
+        self._weeks: dict[tuple[int, int], list[dict]] = {}
+        self._tree_bodies: dict[str, bytes] = {}
+        self._rng = random.Random(self.seed)
+
+    def _week(self, iso_year: int, iso_week: int) -> list[dict]:
+        key = (iso_year, iso_week)
+        if key not in self._weeks:
+            rng = random.Random(f"{self.seed}:{iso_year}:{iso_week}")
+            self._weeks[key] = synthetic_week(iso_year, iso_week, self._codes, rng)
+        return self._weeks[key]
+
+    def flunet_weeks(self, where: str) -> Iterator[tuple[int, int]]:
+        """(iso_year, iso_week) pairs matching a FluNet ``$filter`` expression."""
+        first_year = self.end_year - self.years
+        if m := _YEAR_RANGE_RE.search(where):
+            start, stop = (int(m[1]), 1), (int(m[2]), 1)
+        elif m := _SINCE_RE.search(where):
+            start, stop = (int(m[1]), int(m[2])), (self.end_year + 1, 1)
+        else:
+            raise ValueError(f"Unsupported FluNet filter: {where}")
+        for iso_year in range(max(first_year, start[0]), min(self.end_year + 1, stop[0])):
+            for iso_week in range(1, 53):
+                if (iso_year, iso_week) >= start:
+                    yield iso_year, iso_week
+
+    def flunet_records(self, where: str) -> list[dict]:
+        return [rec for year, week in self.flunet_weeks(where) for rec in self._week(year, week)]
+
+    def _flunet_page(self, request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        records = self.flunet_records(params["$filter"])
+        if "$orderby" in params:
+            records = _order_by(records, params["$orderby"])
+        skip = int(params.get("$skip", 0))
+        top = int(params.get("$top", len(records)))
+        window = records[skip : skip + top]
+        page = window[: self.page_size]
+        if "$select" in params:
+            fields = params["$select"].split(",")
+            page = [{name: rec.get(name) for name in fields} for rec in page]
+        body = {"value": page}
+        if len(window) > self.page_size:
+            # Server-driven paging continues the same $top-limited result
+            body["@odata.nextLink"] = str(
+                request.url.copy_merge_params({"$skip": skip + self.page_size, "$top": top - self.page_size})
+            )
+        resp = httpx.Response(200, json=body)
+        self.bytes_served += len(resp.content)
+        return resp
+
+    def tree_seed(self, dataset: str) -> int:
+        """Seed of the synthetic tree served for ``dataset`` (each dataset gets its own tree)."""
+        return zlib.crc32(f"{self.seed}:{dataset.strip('/')}".encode())
+
+    def _nextstrain_dataset(self, request: httpx.Request) -> httpx.Response:
+        dataset = request.url.params.get("prefix", "")
+        if dataset not in self._tree_bodies:
+            data = {
+                "meta": {"updated": f"{self.end_year}-01-01"},
+                "tree": synthetic_tree(self.tree_leaves, self.tree_depth, self.tree_seed(dataset)),
+            }
+            self._tree_bodies[dataset] = json.dumps(data).encode()
+        body = self._tree_bodies[dataset]
+        headers = {"Content-Type": "application/json"}
+        if self.etags:
+            headers["ETag"] = f'"{zlib.crc32(body):08x}"'
+            if request.headers.get("If-None-Match") == headers["ETag"]:
+                self.not_modified += 1
+                return httpx.Response(304, headers={"ETag": headers["ETag"]})
+        return httpx.Response(200, content=body, headers=headers)
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and self._rng.random() < self.error_rate:
+            self.errors += 1
+            return httpx.Response(503, text="injected failure")
+        if request.url.host == FLUNET_HOST:
+            return self._flunet_page(request)
+        if request.url.host == NEXTSTRAIN_HOST:
+            return self._nextstrain_dataset(request)
+        return httpx.Response(404)
+
+
+@contextmanager
+def install(standin: StandIn):
+    """Route the FluNet and Nextstrain HTTP clients to ``standin`` while the block runs."""
+    originals = (flunet._http_client, nextstrain._http_client)
+
+    def client(timeout: float) -> httpx.AsyncClient:
+        return httpx.AsyncClient(timeout=timeout, transport=httpx.MockTransport(standin.handler))
+
+    flunet._http_client = client
+    nextstrain._http_client = client
+    try:
+        yield standin
+    finally:
+        flunet._http_client, nextstrain._http_client = originals
@@ -0,0 +1,27 @@
+-- Migration 0002: Covering indexes for flu_cases and the per-country rollup
+--
+-- ix_flu_cases_time_country lets the weekly rollup refresh (time IN weeks,
+-- grouped by country_code or flu_type) and the dominant-subtype lookup in
+-- /cases/countries run as index-only scans, and replaces ix_flu_cases_time
+-- for min/max(time) and range lookups.
+--
+-- The per-country series (historical, forecast) read cases_weekly_country by
+-- country_code and time; including new_cases makes that index-only as well.
+-- It replaces the plain index of the same shape created by earlier builds.
+--
+-- For NEW deployments both are created by create_all() from the model
+-- definitions; IF NOT EXISTS makes this a no-op there.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_flu_cases_time_country
+    ON flu_cases (time, country_code) INCLUDE (new_cases, flu_type);
+
+-- Its leading column makes the single-column time index redundant
+DROP INDEX CONCURRENTLY IF EXISTS ix_flu_cases_time;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_cases_weekly_country_country_time_cov
+    ON cases_weekly_country (country_code, time) INCLUDE (new_cases);
+
+DROP INDEX CONCURRENTLY IF EXISTS ix_cases_weekly_country_country_time;
+
+ALTER INDEX IF EXISTS ix_cases_weekly_country_country_time_cov
+    RENAME TO ix_cases_weekly_country_country_time;
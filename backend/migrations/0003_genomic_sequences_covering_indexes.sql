@@ -0,0 +1,21 @@
+-- Migration 0003: Covering indexes for the genomics endpoints
+--
+-- /genomics/trends filters on collection_date and groups by clade (and
+-- country_code when filtered), summing count. The lineage filter adds an
+-- equality on lineage in front of the same range, so that index leads with
+-- lineage; it replaces the plain (lineage, collection_date) index created by
+-- earlier builds.
+--
+-- For NEW deployments both are created by create_all() from the model
+-- definitions; IF NOT EXISTS makes the first statement a no-op there.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_genomic_sequences_date_clade
+    ON genomic_sequences (collection_date, clade) INCLUDE (country_code, count);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_genomic_sequences_lineage_date_cov
+    ON genomic_sequences (lineage, collection_date) INCLUDE (clade, country_code, count);
+
+DROP INDEX CONCURRENTLY IF EXISTS ix_genomic_sequences_lineage_date;
+
+ALTER INDEX IF EXISTS ix_genomic_sequences_lineage_date_cov
+    RENAME TO ix_genomic_sequences_lineage_date;
@@ -0,0 +1,71 @@
+"""Migration 0004: Range-partition flu_cases by ISO year of ``time``
+
+Nearly every query reads the last 4, 12 or 52 weeks of flu_cases, while the
+table holds 10+ years of FluNet history. Partitioning by year lets those
+queries prune to one or two partitions, and lets a year be truncated,
+reloaded or dropped on its own instead of with table-wide deletes.
+
+The table is copied into a new partitioned parent with one partition per
+ISO year present, then swapped in under the original name, all in one
+transaction. Writers are blocked (SHARE lock) while rows are copied;
+readers are only blocked for the final drop and renames.
+
+A partitioned table's unique keys must include the partition column, so
+the primary key becomes (id, time); uq_flu_case already includes time. The
+id sequence is kept, so ids continue where they left off.
+
+For NEW deployments create_all() creates a plain, empty flu_cases and this
+converts it. Already partitioned tables are left alone. The previous
+rebuild generation (flu_cases_old) is dropped: it is unpartitioned, and
+restoring it would undo this migration. There is nothing to restore until
+the next rebuild.
+"""
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.services.partitions import create_year_partition, is_partitioned, rename_partitions
+
+TABLE = "flu_cases"
+NEW = "flu_cases_partitioned"
+
+# Index name on the new table -> canonical name once the old table is gone
+INDEXES = {
+    f"{NEW}_pkey": "flu_cases_pkey",
+    f"{NEW}_uq": "uq_flu_case",
+    f"{NEW}_time_country": "ix_flu_cases_time_country",
+    f"{NEW}_country_code": "ix_flu_cases_country_code",
+}
+
+
+async def upgrade(conn: AsyncConnection):
+    if await is_partitioned(conn, TABLE):
+        return
+
+    await conn.execute(text(f"LOCK TABLE {TABLE} IN SHARE MODE"))
+    await conn.execute(text(f"DROP TABLE IF EXISTS {NEW}"))
+    await conn.execute(text(f"CREATE TABLE {NEW} (LIKE {TABLE} INCLUDING DEFAULTS) PARTITION BY RANGE (time)"))
+    for statement in (
+        f"ALTER TABLE {NEW} ADD CONSTRAINT {NEW}_pkey PRIMARY KEY (id, time)",
+        f"ALTER TABLE {NEW} ADD CONSTRAINT {NEW}_uq UNIQUE (country_code, region, city, flu_type, source, time)",
+        f"CREATE INDEX {NEW}_time_country ON {NEW} (time, country_code) INCLUDE (new_cases, flu_type)",
+        f"CREATE INDEX {NEW}_country_code ON {NEW} (country_code)",
+    ):
+        await conn.execute(text(statement))
+
+    first, last = (await conn.execute(text(f"SELECT min(time), max(time) FROM {TABLE}"))).one()
+    if first is not None:
+        for year in range(first.isocalendar().year, last.isocalendar().year + 1):
+            await create_year_partition(conn, NEW, year)
+    await conn.execute(text(f"INSERT INTO {NEW} SELECT * FROM {TABLE}"))
+
+    seq = (await conn.execute(text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": TABLE})).scalar()
+    if seq:
+        await conn.execute(text(f"ALTER SEQUENCE {seq} OWNED BY {NEW}.id"))
+    await conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}_old, {TABLE}_shadow"))
+    await conn.execute(text(f"DROP TABLE {TABLE}"))
+    await conn.execute(text(f"ALTER TABLE {NEW} RENAME TO {TABLE}"))
+    for name, canonical in INDEXES.items():
+        await conn.execute(text(f"ALTER INDEX {name} RENAME TO {canonical}"))
+    await rename_partitions(conn, TABLE, NEW)
+    await conn.execute(text(f"ANALYZE {TABLE}"))
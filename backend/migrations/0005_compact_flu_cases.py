@@ -0,0 +1,72 @@
+"""Migration 0005: SMALLINT codes for flu_cases.flu_type and source
+
+flu_type and source were stored as strings (the enum name and
+"who_flunet") on every row and inside uq_flu_case and
+ix_flu_cases_time_country. They become SMALLINT codes (app.models
+FLU_TYPE_CODES / DATA_SOURCE_CODES), and iso_year / iso_week become
+SMALLINT. With the existing column order this brings the row from about
+70 to 52 bytes and shrinks the unique and covering indexes by a third.
+cases_weekly_flu_type.flu_type is converted with it so the rollup refresh
+keeps copying matching types.
+
+ALTER COLUMN TYPE rewrites every partition and its indexes under an
+ACCESS EXCLUSIVE lock; on a decade of FluNet history that takes seconds.
+A value without a code fails the NOT NULL check and rolls the migration
+back. The previous rebuild generation (flu_cases_old) still has string
+columns and is dropped.
+
+For NEW deployments create_all() already creates the SMALLINT columns and
+this does nothing.
+"""
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# Snapshot of the codes at the time of this migration
+FLU_TYPE_CODES = {
+    "H1N1": 1,
+    "H3N2": 2,
+    "H5N1": 3,
+    "H7N9": 4,
+    "B_YAMAGATA": 5,
+    "B_VICTORIA": 6,
+    "A_UNSUBTYPED": 7,
+    "B_LINEAGE_UNKNOWN": 8,
+    "UNKNOWN": 9,
+}
+SOURCE_CODES = {"who_flunet": 1}
+
+
+def _to_code(column: str, codes: dict[str, int]) -> str:
+    whens = " ".join(f"WHEN '{name}' THEN {code}" for name, code in codes.items())
+    return f"TYPE smallint USING (CASE {column} {whens} END)"
+
+
+async def _data_type(conn: AsyncConnection, table: str, column: str) -> str | None:
+    result = await conn.execute(
+        text(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = :t AND column_name = :c"
+        ),
+        {"t": table, "c": column},
+    )
+    return result.scalar()
+
+
+async def upgrade(conn: AsyncConnection):
+    if await _data_type(conn, "flu_cases", "flu_type") != "smallint":
+        await conn.execute(text("DROP TABLE IF EXISTS flu_cases_old, flu_cases_shadow"))
+        await conn.execute(
+            text(
+                "ALTER TABLE flu_cases "
+                f"ALTER COLUMN flu_type {_to_code('flu_type', FLU_TYPE_CODES)}, "
+                f"ALTER COLUMN source {_to_code('source', SOURCE_CODES)}, "
+                "ALTER COLUMN iso_year TYPE smallint, "
+                "ALTER COLUMN iso_week TYPE smallint"
+            )
+        )
+        await conn.execute(text("ANALYZE flu_cases"))
+    if await _data_type(conn, "cases_weekly_flu_type", "flu_type") != "smallint":
+        await conn.execute(
+            text(f"ALTER TABLE cases_weekly_flu_type ALTER COLUMN flu_type {_to_code('flu_type', FLU_TYPE_CODES)}")
+        )
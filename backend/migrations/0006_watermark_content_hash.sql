@@ -0,0 +1,10 @@
+-- Migration 0006: Add ingestion_watermarks.content_sha256
+--
+-- For NEW deployments: the column is created automatically via
+-- Base.metadata.create_all() because it is declared on IngestionWatermark.
+--
+-- For EXISTING deployments, app.migrations applies it at startup (or via
+-- `python -m app.migrations`). The column is nullable, so adding it does not
+-- rewrite the table; a NULL hash simply means the next fetch is parsed.
+
+ALTER TABLE ingestion_watermarks ADD COLUMN IF NOT EXISTS content_sha256 varchar(64);
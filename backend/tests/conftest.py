@@ -2,7 +2,9 @@
 Shared fixtures for backend tests.
 
 Uses an in-memory SQLite database (via aiosqlite) so tests run without
-a real PostgreSQL instance.
+a real PostgreSQL instance. Tests of PostgreSQL-only code paths use the
+``pg_engine`` fixture instead, which needs TEST_POSTGRES_URL (a scratch
+database) and skips otherwise.
 """
 
 import os
@@ -17,12 +19,16 @@ os.environ.setdefault(
 )
 
 from datetime import date, datetime
+from uuid import uuid4
 
+import pytest
 import pytest_asyncio
 from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from app.models import Anomaly, Base, FluCase, GenomicSequence
+from app.services import response_cache
 
 # ---------------------------------------------------------------------------
 # Engine / session that every test will share
@@ -33,17 +39,20 @@ engine = create_async_engine(TEST_DB_URL, echo=False)
 TestSession = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
-# All modules that do "from app.database import async_session"
+# All modules that do "from app.database import async_session" (or
+# job_session, for scheduler jobs and ingestion). Routers use
+# app.database.read_session, which falls back to the patched async_session.
 _MODULES_USING_SESSION = [
     "app.database",
     "app.scheduler",
-    "app.routers.cases",
-    "app.routers.genomics",
-    "app.routers.anomalies",
     "app.services.flunet",
     "app.services.nextstrain",
     "app.services.anomaly",
     "app.services.forecast",
+    "app.services.watermark",
+    "app.services.rebuild",
+    "app.services.checkpoint",
+    "app.services.rollup",
 ]
 
 
@@ -52,16 +61,19 @@ async def setup_db():
     """Create all tables before each test, drop them after."""
     import sys
 
-    # Patch async_session in every module that imported it
+    # Patch async_session / job_session in every module that imported them
     originals = {}
     for mod_name in _MODULES_USING_SESSION:
         mod = sys.modules.get(mod_name)
-        if mod and hasattr(mod, "async_session"):
-            originals[mod_name] = getattr(mod, "async_session")
-            setattr(mod, "async_session", TestSession)
+        for attr in ("async_session", "job_session"):
+            if mod and hasattr(mod, attr):
+                originals[mod_name, attr] = getattr(mod, attr)
+                setattr(mod, attr, TestSession)
 
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    # Fixtures insert rows directly, without the bump a job commit would do
+    response_cache.bump_generation()
 
     yield
 
@@ -69,10 +81,33 @@ async def setup_db():
         await conn.run_sync(Base.metadata.drop_all)
 
     # Restore originals
-    for mod_name, orig in originals.items():
+    for (mod_name, attr), orig in originals.items():
         mod = sys.modules.get(mod_name)
         if mod:
-            setattr(mod, "async_session", orig)
+            setattr(mod, attr, orig)
+
+
+@pytest_asyncio.fixture
+async def pg_engine():
+    """Engine on a throwaway schema of TEST_POSTGRES_URL with every table created."""
+    url = os.environ.get("TEST_POSTGRES_URL", "")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    url = url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    schema = f"test_{uuid4().hex[:12]}"
+    admin = create_async_engine(url)
+    async with admin.begin() as conn:
+        await conn.execute(text(f"CREATE SCHEMA {schema}"))
+    pg = create_async_engine(url, connect_args={"server_settings": {"search_path": schema}})
+    async with pg.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    yield pg
+
+    await pg.dispose()
+    async with admin.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+    await admin.dispose()
 
 
 @pytest_asyncio.fixture
@@ -99,7 +134,9 @@ async def client():
 
 @pytest_asyncio.fixture
 async def seed_flu_cases(db_session: AsyncSession):
-    """Insert a handful of flu-case rows spanning two weeks and two countries."""
+    """Insert a handful of flu-case rows spanning two weeks and two countries, and roll them up."""
+    from app.services.rollup import rebuild_rollups
+
     cases = [
         FluCase(
             country_code="US",
@@ -149,6 +186,7 @@ async def seed_flu_cases(db_session: AsyncSession):
     ]
     db_session.add_all(cases)
     await db_session.commit()
+    await rebuild_rollups()
     return cases
 
 
@@ -4,8 +4,10 @@ from datetime import date
 
 import pytest
 
-from app.models import FluCase
+from app.models import CasesByWeek, FluCase, FluType
 from app.population import POPULATIONS
+from app.services.response_cache import bump_generation
+from app.services.rollup import rebuild_rollups
 
 
 @pytest.mark.asyncio
@@ -67,6 +69,7 @@ async def test_cases_map_computes_per_100k(client, db_session):
     ]
     db_session.add_all(rows)
     await db_session.commit()
+    await rebuild_rollups()
 
     resp = await client.get("/api/cases/map")
     assert resp.status_code == 200
@@ -119,6 +122,7 @@ async def test_cases_historical_normalizes_oct_sep_season(client, db_session):
     ]
     db_session.add_all(rows)
     await db_session.commit()
+    await rebuild_rollups()
 
     resp = await client.get("/api/cases/historical")
     assert resp.status_code == 200
@@ -157,6 +161,7 @@ async def test_cases_historical_country_filter(client, db_session):
     ]
     db_session.add_all(rows)
     await db_session.commit()
+    await rebuild_rollups()
 
     resp = await client.get("/api/cases/historical?country=US")
     assert resp.status_code == 200
@@ -180,6 +185,8 @@ async def test_cases_subtypes_with_data(client, seed_flu_cases):
     assert len(data) >= 1
     subtypes = {d["subtype"] for d in data}
     assert len(subtypes) >= 1
+    # Subtypes are reported by enum name, not by their stored codes
+    assert subtypes <= set(FluType.__members__)
 
 
 @pytest.mark.asyncio
@@ -214,3 +221,32 @@ async def test_cases_countries_search_no_match(client, seed_flu_cases):
     resp = await client.get("/api/cases/countries?search=ZZZZ")
     assert resp.status_code == 200
     assert resp.json() == []
+
+
+@pytest.mark.asyncio
+async def test_cases_summary_is_cached_until_new_data_is_committed(client, seed_flu_cases, db_session):
+    first = (await client.get("/api/cases/summary")).json()
+    # Written behind the cache's back: no job commit, so no new generation
+    db_session.add(CasesByWeek(time=date(2025, 6, 16), new_cases=1000))
+    await db_session.commit()
+
+    assert (await client.get("/api/cases/summary")).json() == first
+
+    bump_generation()
+    assert (await client.get("/api/cases/summary")).json()["total_cases"] == first["total_cases"] + 1000
+
+
+@pytest.mark.asyncio
+async def test_cases_summary_revalidates_with_etag(client, seed_flu_cases):
+    first = await client.get("/api/cases/summary")
+    etag = first.headers["etag"]
+    assert "max-age=" in first.headers["cache-control"]
+
+    resp = await client.get("/api/cases/summary", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.content == b""
+
+    await rebuild_rollups()
+    resp = await client.get("/api/cases/summary", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["etag"] != etag
@@ -0,0 +1,75 @@
+"""Tests for /api/dashboard."""
+
+import pytest
+
+from app.routers.dashboard import PANELS
+from app.services import forecast, response_cache
+
+# Panel -> standalone endpoint serving the same data
+ENDPOINTS = {
+    "summary": "/api/cases/summary",
+    "map": "/api/cases/map",
+    "historical": "/api/cases/historical",
+    "forecast": "/api/forecast",
+    "subtypes": "/api/cases/subtypes",
+    "countries": "/api/cases/countries",
+    "anomalies": "/api/anomalies",
+    "genomic_trends": "/api/genomics/trends",
+}
+
+
+@pytest.mark.asyncio
+async def test_dashboard_empty(client):
+    resp = await client.get("/api/dashboard")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert set(data) == set(PANELS)
+    assert data["summary"]["total_cases"] == 0
+    assert data["map"] == []
+
+
+@pytest.mark.asyncio
+async def test_dashboard_panels_match_their_endpoints(client, seed_flu_cases, seed_genomic_sequences, seed_anomalies):
+    data = (await client.get("/api/dashboard")).json()
+
+    for panel, path in ENDPOINTS.items():
+        assert data[panel] == (await client.get(path)).json(), panel
+    assert data["summary"]["total_cases"] > 0
+
+
+@pytest.mark.asyncio
+async def test_dashboard_country_filters_historical_and_forecast(client, seed_flu_cases):
+    data = (await client.get("/api/dashboard?panels=historical,forecast&country=US")).json()
+
+    assert data["historical"] == (await client.get("/api/cases/historical?country=US")).json()
+    assert data["forecast"] == (await client.get("/api/forecast?country=US")).json()
+
+
+@pytest.mark.asyncio
+async def test_dashboard_with_a_failed_panel_is_not_cached(client, seed_flu_cases, monkeypatch):
+    def unavailable():
+        raise ConnectionError("replica went away")
+
+    monkeypatch.setattr(forecast, "read_session", unavailable)
+    resp = await client.get("/api/dashboard?panels=summary,forecast")
+
+    assert resp.status_code == 200
+    assert resp.json()["forecast"] == {"historical": [], "forecast": []}
+    assert "etag" not in resp.headers
+    assert resp.headers["cache-control"] == "no-store"
+    assert response_cache.cache.stats()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_dashboard_returns_only_requested_panels(client, seed_flu_cases):
+    data = (await client.get("/api/dashboard?panels=countries,summary")).json()
+
+    assert data["summary"]["countries_reporting"] == 2
+    assert len(data["countries"]) == 2
+    assert all(data[name] is None for name in PANELS if name not in ("summary", "countries"))
+
+
+@pytest.mark.asyncio
+async def test_dashboard_rejects_unknown_panels(client):
+    resp = await client.get("/api/dashboard?panels=summary,nope")
+    assert resp.status_code == 422
@@ -5,6 +5,7 @@ from datetime import date, timedelta
 import pytest
 
 from app.models import FluCase
+from app.services.rollup import rebuild_rollups
 
 
 @pytest.mark.asyncio
@@ -43,6 +44,7 @@ async def test_forecast_with_enough_data_points(client, db_session):
             )
         )
     await db_session.commit()
+    await rebuild_rollups()
 
     resp = await client.get("/api/forecast?country=US&weeks=3")
     assert resp.status_code == 200
@@ -126,3 +126,28 @@ async def test_genomics_trends_anchors_cutoff_to_latest_db_date(client, db_sessi
     assert resp.status_code == 200
     data = resp.json()
     assert len(data) > 0
+
+
+@pytest.mark.asyncio
+async def test_genomics_endpoints_filter_by_lineage(client, db_session):
+    db_session.add_all(
+        [
+            GenomicSequence(
+                country_code="US", clade="2a.3a.1", lineage="H3N2", collection_date=date(2025, 1, 6), count=4
+            ),
+            GenomicSequence(
+                country_code="GB", clade="V1A.3a.2", lineage="B/Victoria", collection_date=date(2025, 2, 3), count=9
+            ),
+        ]
+    )
+    await db_session.commit()
+
+    summary = (await client.get("/api/genomics/summary", params={"lineage": "H3N2"})).json()
+    assert summary["total_sequences"] == 4
+    assert summary["dominant_clade"] == "2a.3a.1"
+
+    countries = (await client.get("/api/genomics/countries", params={"lineage": "B/Victoria"})).json()
+    assert [row["country_code"] for row in countries] == ["GB"]
+
+    trends = (await client.get("/api/genomics/trends", params={"lineage": "H3N2"})).json()
+    assert {row["clade"] for row in trends} == {"2a.3a.1"}
@@ -86,3 +86,23 @@ async def test_health_backfill_meets_target(client, db_session):
     assert data["flu_cases"]["meets_target"] is True
     assert data["genomics"]["span_days"] >= 3650
     assert data["genomics"]["meets_target"] is True
+
+
+@pytest.mark.asyncio
+async def test_health_pool(client):
+    resp = await client.get("/api/health/pool")
+    assert resp.status_code == 200
+    data = resp.json()
+    # SQLite keeps SQLAlchemy's default pool, which has no occupancy figures
+    assert set(data) == {"primary", "jobs"}
+    assert "pool" in data["primary"]
+
+
+@pytest.mark.asyncio
+async def test_health_cache_counts_hits(client):
+    await client.get("/api/anomalies")
+    await client.get("/api/anomalies")
+
+    data = (await client.get("/api/health/cache")).json()
+    assert data["entries"] == 1
+    assert data["hits"] >= 1
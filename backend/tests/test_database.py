@@ -0,0 +1,162 @@
+"""Tests for the instrumented connection pool."""
+
+import asyncio
+import time
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import database
+from app.services import response_cache
+from tests.conftest import TestSession
+
+
+@pytest_asyncio.fixture
+async def pooled_engine(tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path}/pool.db",
+        poolclass=database.InstrumentedPool,
+        pool_size=2,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    yield engine
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_prewarm_opens_pool_size_idle_connections(pooled_engine):
+    await database.prewarm_pool(pooled_engine)
+
+    status = database._pool_status(pooled_engine)
+    assert status["idle"] == 2
+    assert status["in_use"] == 0
+    assert status["checkouts"] == 2
+
+
+@pytest.mark.asyncio
+async def test_pool_counts_in_use_connections_and_timeouts(pooled_engine):
+    async with pooled_engine.connect() as first, pooled_engine.connect():
+        await first.execute(text("SELECT 1"))
+        assert database._pool_status(pooled_engine)["in_use"] == 2
+
+        with pytest.raises(exc.TimeoutError):
+            async with pooled_engine.connect():
+                pass
+
+    status = database._pool_status(pooled_engine)
+    assert status["in_use"] == 0
+    assert status["idle"] == 2
+    assert status["checkouts"] == 2
+    assert status["timeouts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_records_checkout_wait(pooled_engine):
+    async def hold(seconds: float):
+        async with pooled_engine.connect():
+            await asyncio.sleep(seconds)
+
+    pooled_engine.pool._timeout = 5
+    await asyncio.gather(hold(0.2), hold(0.2), hold(0))
+
+    status = database._pool_status(pooled_engine)
+    assert status["checkouts"] == 3
+    # The third checkout queued until one of the first two was returned
+    assert status["wait_ms_max"] >= 150
+
+
+@pytest.mark.asyncio
+async def test_stats_survive_dispose(pooled_engine):
+    async with pooled_engine.connect():
+        pass
+    await pooled_engine.dispose()
+
+    assert database._pool_status(pooled_engine)["checkouts"] == 1
+
+
+@pytest_asyncio.fixture
+async def replica(tmp_path, monkeypatch):
+    """Route read_session to a separate SQLite "replica" whose lag the test controls."""
+    replica_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/replica.db")
+    lag = {"seconds": 0.0}
+
+    async def fake_lag(target):
+        return lag["seconds"]
+
+    monkeypatch.setattr(database, "read_engine", replica_engine)
+    monkeypatch.setattr(database, "_read_sessionmaker", async_sessionmaker(replica_engine))
+    monkeypatch.setattr(database, "_replica", database.ReplicaState())
+    monkeypatch.setattr(database, "_replica_lag", fake_lag)
+    monkeypatch.setattr(database.settings, "READ_REPLICA_CHECK_SECONDS", 0)
+    yield replica_engine, lag
+    await replica_engine.dispose()
+
+
+async def _read_bind():
+    async with database.read_session() as session:
+        return session.bind
+
+
+@pytest.mark.asyncio
+async def test_read_session_uses_primary_without_replica():
+    assert database.read_engine is None
+    assert await _read_bind() is TestSession.kw["bind"]
+
+
+@pytest.mark.asyncio
+async def test_read_session_uses_replica_until_it_lags(replica):
+    replica_engine, lag = replica
+
+    assert await _read_bind() is replica_engine
+
+    lag["seconds"] = database.settings.READ_REPLICA_MAX_LAG_SECONDS + 1
+    assert await _read_bind() is TestSession.kw["bind"]
+
+    # Unreachable replicas report no lag at all
+    lag["seconds"] = None
+    assert await _read_bind() is TestSession.kw["bind"]
+    assert database.pool_status()["read"]["in_use_for_reads"] is False
+
+    lag["seconds"] = 0.5
+    assert await _read_bind() is replica_engine
+    assert database.pool_status()["read"]["replica_lag_seconds"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_replica_lag_is_rechecked_only_after_the_interval(replica, monkeypatch):
+    replica_engine, lag = replica
+    monkeypatch.setattr(database.settings, "READ_REPLICA_CHECK_SECONDS", 60)
+
+    assert await _read_bind() is replica_engine
+    lag["seconds"] = None
+    # Still within the interval: the previous result is reused
+    assert await _read_bind() is replica_engine
+
+
+@pytest.mark.asyncio
+async def test_reads_stay_on_primary_for_the_lag_window_after_a_bump(replica, monkeypatch):
+    replica_engine, lag = replica
+    monkeypatch.setattr(database.settings, "READ_REPLICA_CHECK_SECONDS", 60)
+    assert await _read_bind() is replica_engine
+
+    response_cache.bump_generation()
+    assert await _read_bind() is TestSession.kw["bind"]
+    assert database.pool_status()["read"]["in_use_for_reads"] is False
+
+    # Once the window has passed the lag is measured again, despite the interval
+    monkeypatch.setattr(database._replica, "primary_until", time.monotonic() - 1)
+    lag["seconds"] = database.settings.READ_REPLICA_MAX_LAG_SECONDS + 1
+    assert await _read_bind() is TestSession.kw["bind"]
+
+
+def test_job_engine_has_its_own_pool():
+    jobs = database.make_engine("postgresql+asyncpg://u@localhost/flu", pool_size=3, max_overflow=1)
+    api = database.make_engine("postgresql+asyncpg://u@localhost/flu", pool_size=10, max_overflow=10)
+
+    assert jobs.pool is not api.pool
+    assert database._pool_status(jobs)["size"] == 3
+    assert database._pool_status(jobs)["max_overflow"] == 1
+    assert database.job_engine is not database.engine
@@ -1,11 +1,25 @@
 """Tests for FluNet service — pure functions only (no network calls)."""
 
+import random
 from datetime import date
 
+from app.config import settings
 from app.services.flunet import (
+    AGGREGATE_FIELDS,
+    LAST_RESORT_FIELDS,
+    MAX_PAGE_SIZE,
+    MIN_PAGE_SIZE,
+    ORDER_BY,
+    SELECT_FIELDS,
+    SPECIFIC_FIELDS,
+    _next_page_size,
     _normalize_country,
+    _page_url,
     _parse_week_date,
     _process_records,
+    _process_records_rowwise,
+    _since_filter,
+    _start_week,
 )
 
 
@@ -87,3 +101,107 @@ class TestProcessRecords:
     def test_skips_missing_country(self):
         rec = {"ISO2": "", "ISO_YEAR": 2025, "ISO_WEEK": 10, "AH3": 5}
         assert _process_records([rec]) == []
+
+
+class TestSinceFilter:
+    def test_crosses_year_boundary(self):
+        assert _since_filter(2024, 51) == "ISO_YEAR gt 2024 or (ISO_YEAR eq 2024 and ISO_WEEK ge 51)"
+
+
+class TestStartWeek:
+    def test_watermark_minus_revision_weeks(self, monkeypatch):
+        monkeypatch.setattr(settings, "FLUNET_REVISION_WEEKS", 1)
+        assert _start_week(4, since=(2025, 10)) == (2025, 9)
+
+    def test_watermark_at_year_start(self, monkeypatch):
+        monkeypatch.setattr(settings, "FLUNET_REVISION_WEEKS", 2)
+        assert _start_week(4, since=(2025, 1)) == (2024, 51)
+
+
+class TestPageUrl:
+    def test_selects_only_parsed_fields(self):
+        url = _page_url("ISO_YEAR ge 2024 and ISO_YEAR lt 2025", top=5000)
+        assert f"$select={','.join(SELECT_FIELDS)}" in url
+        assert url.endswith("$top=5000")
+
+    def test_select_covers_every_parsed_field(self):
+        assert set(SPECIFIC_FIELDS + AGGREGATE_FIELDS + LAST_RESORT_FIELDS) <= set(SELECT_FIELDS)
+        assert {"ISO_YEAR", "ISO_WEEK", "ISO2", "COUNTRY_CODE"} <= set(SELECT_FIELDS)
+
+    def test_pages_over_a_total_order(self):
+        assert f"$orderby={','.join(ORDER_BY)}" in _page_url("x", top=10)
+        assert {"ISO_YEAR", "ISO_WEEK", "COUNTRY_CODE"} <= set(ORDER_BY)
+
+    def test_skip_only_after_first_page(self):
+        assert "$skip" not in _page_url("x", top=10)
+        assert _page_url("x", top=10, skip=20).endswith("$top=10&$skip=20")
+
+
+class TestNextPageSize:
+    def test_grows_when_fast_at_most_double(self, monkeypatch):
+        monkeypatch.setattr(settings, "FLUNET_PAGE_TARGET_SECONDS", 10.0)
+        assert _next_page_size(20000, elapsed=0.5) == 40000
+
+    def test_shrinks_when_slow_at_most_half(self, monkeypatch):
+        monkeypatch.setattr(settings, "FLUNET_PAGE_TARGET_SECONDS", 10.0)
+        assert _next_page_size(20000, elapsed=15.0) == 13333
+        assert _next_page_size(20000, elapsed=100.0) == 10000
+
+    def test_clamped_to_bounds(self, monkeypatch):
+        monkeypatch.setattr(settings, "FLUNET_PAGE_TARGET_SECONDS", 10.0)
+        assert _next_page_size(MAX_PAGE_SIZE, elapsed=0.1) == MAX_PAGE_SIZE
+        assert _next_page_size(MIN_PAGE_SIZE, elapsed=60.0) == MIN_PAGE_SIZE
+
+
+class TestColumnarMatchesRowwise:
+    def _random_records(self, seed, n=400):
+        rng = random.Random(seed)
+        fields = SPECIFIC_FIELDS + AGGREGATE_FIELDS + LAST_RESORT_FIELDS
+        records = []
+        for _ in range(n):
+            rec = {
+                "ISO2": rng.choice(["US", "fr", "XE", "XS", "XI", "", None]),
+                "ISO_YEAR": rng.choice([2015, 2016, 2020, 2021, None]),
+                "ISO_WEEK": rng.choice([1, 2, 52, 53, None]),
+            }
+            if rng.random() < 0.3:
+                rec["COUNTRY_CODE"] = rng.choice(["DE", "XW"])
+            for field in fields:
+                if rng.random() < 0.5:
+                    rec[field] = rng.choice([None, 0, -3, rng.randint(1, 100)])
+            records.append(rec)
+        return records
+
+    def test_random_payloads_identical(self):
+        for seed in range(20):
+            records = self._random_records(seed)
+            assert _process_records(records) == _process_records_rowwise(records)
+
+    def test_week_53_in_52_week_year_merges_with_next_year_week_1(self):
+        # 2015 has 53 ISO weeks, 2021 does not: (2021, 53) parses to the same
+        # Monday as (2022, 1), so both land on one aggregated key.
+        records = [
+            {"ISO2": "US", "ISO_YEAR": 2021, "ISO_WEEK": 53, "AH3": 4},
+            {"ISO2": "US", "ISO_YEAR": 2022, "ISO_WEEK": 1, "AH3": 6},
+        ]
+        result = _process_records(records)
+        assert result == _process_records_rowwise(records)
+        assert len(result) == 1
+        assert result[0]["new_cases"] == 10
+        assert (result[0]["iso_year"], result[0]["iso_week"]) == (2022, 1)
+
+    def test_float_and_string_counts_identical(self):
+        records = [
+            {"ISO2": "US", "ISO_YEAR": 2025, "ISO_WEEK": 3, "AH3": 2.7, "INF_A": "9"},
+            {"ISO2": "US", "ISO_YEAR": 2025, "ISO_WEEK": 3, "AH3": 0.4, "INF_A": "12"},
+            {"ISO2": "US", "ISO_YEAR": 2025, "ISO_WEEK": 4, "BVIC": True},
+        ]
+        assert _process_records(records) == _process_records_rowwise(records)
+
+    def test_non_numeric_count_in_unused_field_identical(self):
+        # The reference never converts aggregate fields when a specific subtype is present
+        records = [{"ISO2": "US", "ISO_YEAR": 2025, "ISO_WEEK": 3, "AH3": 5, "INF_A": "n/a"}]
+        assert _process_records(records) == _process_records_rowwise(records)
+
+    def test_empty(self):
+        assert _process_records([]) == []
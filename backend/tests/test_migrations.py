@@ -0,0 +1,58 @@
+import pytest
+
+from app import migrations
+
+
+def test_split_statements_drops_comments_and_blank_statements():
+    sql = """
+    -- header comment; with a semicolon
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_a
+        ON t (a);  -- trailing comment
+
+    DROP INDEX CONCURRENTLY IF EXISTS ix_b;
+    ;
+    """
+    assert [" ".join(stmt.split()) for stmt in migrations.split_statements(sql)] == [
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_a ON t (a)",
+        "DROP INDEX CONCURRENTLY IF EXISTS ix_b",
+    ]
+
+
+def test_discover_orders_by_version_and_ignores_other_files(tmp_path):
+    for name in ("0010_later.sql", "0002_earlier.sql", "notes.sql", "README.md"):
+        (tmp_path / name).write_text("SELECT 1;")
+    (tmp_path / "0003_python.py").write_text("async def upgrade(conn):\n    pass\n")
+
+    found = migrations.discover(tmp_path)
+
+    assert [(m.version, m.name, m.is_python) for m in found] == [
+        (2, "earlier", False),
+        (3, "python", True),
+        (10, "later", False),
+    ]
+    assert callable(found[1].load_upgrade())
+
+
+def test_discover_rejects_duplicate_versions(tmp_path):
+    (tmp_path / "0001_a.sql").write_text("SELECT 1;")
+    (tmp_path / "01_b.sql").write_text("SELECT 1;")
+
+    with pytest.raises(ValueError, match="Duplicate"):
+        migrations.discover(tmp_path)
+
+
+def test_shipped_migrations_are_idempotent_statements():
+    shipped = migrations.discover()
+    assert [m.version for m in shipped] == list(range(1, len(shipped) + 1))
+    for mig in shipped:
+        if mig.is_python:
+            assert callable(mig.load_upgrade())
+            continue
+        for statement in mig.statements():
+            first_line = statement.splitlines()[0]
+            assert "IF NOT EXISTS" in first_line or "IF EXISTS" in first_line, first_line
+
+
+@pytest.mark.asyncio
+async def test_run_migrations_is_a_no_op_off_postgresql():
+    assert await migrations.run_migrations() == []
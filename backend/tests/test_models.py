@@ -3,10 +3,10 @@
 from datetime import date, datetime
 
 import pytest
-from sqlalchemy import select
+from sqlalchemy import select, text
 from sqlalchemy.exc import IntegrityError
 
-from app.models import Anomaly, FluCase, GenomicSequence
+from app.models import FLU_TYPE_CODES, Anomaly, DataSource, FluCase, FluType, GenomicSequence
 
 
 @pytest.mark.asyncio
@@ -52,6 +52,34 @@ async def test_flu_case_unique_constraint(db_session):
         await db_session.commit()
 
 
+@pytest.mark.asyncio
+async def test_flu_case_enums_are_stored_as_smallint_codes(db_session):
+    # Members, values and names all bind to the same code
+    for week, flu_type in enumerate([FluType.B_YAMAGATA, "B/Victoria", "A_UNSUBTYPED"], start=1):
+        db_session.add(
+            FluCase(
+                country_code="US",
+                flu_type=flu_type,
+                time=date.fromisocalendar(2025, week, 1),
+                iso_year=2025,
+                iso_week=week,
+            )
+        )
+    await db_session.commit()
+
+    raw = await db_session.execute(text("SELECT flu_type, source FROM flu_cases ORDER BY iso_week"))
+    assert [tuple(row) for row in raw] == [
+        (FLU_TYPE_CODES[FluType.B_YAMAGATA], 1),
+        (FLU_TYPE_CODES[FluType.B_VICTORIA], 1),
+        (FLU_TYPE_CODES[FluType.A_UNSUBTYPED], 1),
+    ]
+    rows = (await db_session.execute(select(FluCase).order_by(FluCase.iso_week))).scalars().all()
+    assert [row.flu_type for row in rows] == [FluType.B_YAMAGATA, FluType.B_VICTORIA, FluType.A_UNSUBTYPED]
+    assert rows[0].source == DataSource.WHO_FLUNET == "who_flunet"
+    filtered = await db_session.execute(select(FluCase.iso_week).where(FluCase.flu_type == "B/Victoria"))
+    assert filtered.scalars().all() == [2]
+
+
 @pytest.mark.asyncio
 async def test_genomic_sequence_insert(db_session):
     seq = GenomicSequence(
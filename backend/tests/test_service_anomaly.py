@@ -61,7 +61,7 @@ async def test_detect_anomalies_no_case_data(monkeypatch):
         ]
     )
 
-    monkeypatch.setattr(anomaly, "async_session", lambda: FakeSessionCtx(session))
+    monkeypatch.setattr(anomaly, "job_session", lambda: FakeSessionCtx(session))
 
     await anomaly.detect_anomalies()
 
@@ -90,7 +90,7 @@ async def test_detect_anomalies_creates_high_severity_spike(monkeypatch):
         ]
     )
 
-    monkeypatch.setattr(anomaly, "async_session", lambda: FakeSessionCtx(session))
+    monkeypatch.setattr(anomaly, "job_session", lambda: FakeSessionCtx(session))
 
     await anomaly.detect_anomalies()
 
@@ -0,0 +1,174 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import column, func, select, table, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import FluCase, GenomicSequence
+from app.services import bulk, flunet
+
+
+def _case(flu_type="H3N2", new_cases=10, week=2):
+    return {
+        "country_code": "US",
+        "region": "",
+        "city": "",
+        "flu_type": flu_type,
+        "source": "who_flunet",
+        "time": date.fromisocalendar(2025, week, 1),
+        "new_cases": new_cases,
+        "iso_year": 2025,
+        "iso_week": week,
+    }
+
+
+def test_constraint_columns():
+    assert bulk.constraint_columns(GenomicSequence.__table__, "uq_genomic_seq") == [
+        "country_code",
+        "clade",
+        "lineage",
+        "collection_date",
+    ]
+    with pytest.raises(ValueError):
+        bulk.constraint_columns(FluCase.__table__, "missing")
+
+
+@pytest.mark.asyncio
+async def test_bulk_insert_ignore_skips_existing_and_duplicate_keys(db_session, monkeypatch):
+    monkeypatch.setattr(bulk, "BATCH_SIZE", 2)
+    table = FluCase.__table__
+    key = bulk.constraint_columns(table, "uq_flu_case")
+
+    first = await bulk.bulk_insert_ignore(db_session, table, [_case(week=w) for w in (1, 2, 3)], key)
+    second = await bulk.bulk_insert_ignore(db_session, table, (_case(week=w, new_cases=99) for w in (3, 4, 4)), key)
+    await db_session.commit()
+
+    assert (first, second) == (3, 1)
+    totals = dict((await db_session.execute(select(FluCase.iso_week, FluCase.new_cases))).all())
+    assert totals == {1: 10, 2: 10, 3: 10, 4: 99}
+
+
+@pytest.mark.asyncio
+async def test_bulk_insert_ignore_empty(db_session):
+    table = FluCase.__table__
+    assert await bulk.bulk_insert_ignore(db_session, table, iter([]), ["country_code"]) == 0
+
+
+@pytest.mark.asyncio
+async def test_upsert_records_round_trips_enum_labels(db_session):
+    counts = await flunet._upsert_records([_case("B/Yamagata"), _case("A (unsubtyped)")])
+
+    assert counts == bulk.UpsertCounts(inserted=2)
+    result = await db_session.execute(select(func.count()).select_from(FluCase))
+    assert result.scalar() == 2
+    types = set((await db_session.execute(select(FluCase.flu_type))).scalars())
+    assert {t.value for t in types} == {"B/Yamagata", "A (unsubtyped)"}
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_updates_only_changed_rows(db_session, monkeypatch):
+    monkeypatch.setattr(bulk, "BATCH_SIZE", 2)
+    table = FluCase.__table__
+    key = bulk.constraint_columns(table, "uq_flu_case")
+
+    first = await bulk.bulk_upsert(db_session, table, [_case(week=w) for w in (1, 2, 3)], key, ["new_cases"])
+    # week 1 unchanged, week 2 revised, week 3 revised twice (last wins), week 4 new
+    revised = [_case(week=1), _case(week=2, new_cases=12), _case(week=3, new_cases=5), _case(week=3, new_cases=7)]
+    second = await bulk.bulk_upsert(db_session, table, revised + [_case(week=4)], key, ["new_cases"])
+    await db_session.commit()
+
+    assert first == bulk.UpsertCounts(inserted=3)
+    assert second == bulk.UpsertCounts(inserted=1, updated=2, unchanged=1)
+    totals = dict((await db_session.execute(select(FluCase.iso_week, FluCase.new_cases))).all())
+    assert totals == {1: 10, 2: 12, 3: 7, 4: 10}
+
+
+@pytest.mark.asyncio
+async def test_upsert_records_picks_up_revised_counts(db_session):
+    await flunet._upsert_records([_case(new_cases=10)])
+    counts = await flunet._upsert_records([_case(new_cases=14)])
+
+    assert counts == bulk.UpsertCounts(updated=1)
+    assert (await db_session.execute(select(FluCase.new_cases))).scalar() == 14
+
+
+def _stage(target, columns):
+    return table(f"_stage_{target.name}", *[column(name) for name in [*columns, bulk.STAGE_ORDER_COLUMN]])
+
+
+def test_copy_upsert_keeps_the_last_staged_row_per_key():
+    target = FluCase.__table__
+    columns = list(_case())
+    key = bulk.constraint_columns(target, "uq_flu_case")
+    stmt = bulk._upsert_from_stage(target, _stage(target, columns), columns, key, ["new_cases"])
+
+    sql = " ".join(str(stmt.compile(dialect=postgresql.dialect())).split())
+    assert f"SELECT DISTINCT ON ({', '.join(f'_stage_flu_cases.{c}' for c in key)})" in sql
+    assert f"ORDER BY {', '.join(f'_stage_flu_cases.{c}' for c in key)}, _stage_flu_cases._staged DESC" in sql
+    assert "ON CONFLICT (country_code, region, city, flu_type, source, time) DO UPDATE" in sql
+    assert "WHERE flu_cases.new_cases IS DISTINCT FROM excluded.new_cases" in sql
+
+
+def test_copy_merge_inserts_in_staging_order():
+    target = FluCase.__table__
+    columns = list(_case())
+    key = bulk.constraint_columns(target, "uq_flu_case")
+    stmt = bulk._merge_from_stage(target, _stage(target, columns), columns, key)
+
+    sql = " ".join(str(stmt.compile(dialect=postgresql.dialect())).split())
+    assert sql.endswith(
+        "ORDER BY _stage_flu_cases._staged ON CONFLICT (country_code, region, city, flu_type, source, time) DO NOTHING"
+    )
+
+
+@pytest.mark.asyncio
+async def test_copy_insert_ignore_keeps_the_first_staged_duplicate(pg_engine):
+    table_ = FluCase.__table__
+    key = bulk.constraint_columns(table_, "uq_flu_case")
+    async with AsyncSession(pg_engine) as session:
+        first = await bulk.bulk_insert_ignore(session, table_, [_case(week=w) for w in (1, 2, 3)], key)
+        # Staged twice in one transaction: the first stage must be gone
+        rows = [_case(week=3, new_cases=99), _case(week=4, new_cases=40), _case(week=4, new_cases=50)]
+        second = await bulk.bulk_insert_ignore(session, table_, rows, key)
+        await session.commit()
+        totals = dict((await session.execute(select(FluCase.iso_week, FluCase.new_cases))).all())
+
+    assert (first, second) == (3, 1)
+    assert totals == {1: 10, 2: 10, 3: 10, 4: 40}
+
+
+@pytest.mark.asyncio
+async def test_copy_upsert_counts_and_keeps_the_last_duplicate(pg_engine):
+    table_ = FluCase.__table__
+    key = bulk.constraint_columns(table_, "uq_flu_case")
+    async with AsyncSession(pg_engine) as session:
+        first = await bulk.bulk_upsert(session, table_, [_case(week=w) for w in (1, 2, 3)], key, ["new_cases"])
+        revised = [_case(week=1), _case(week=2, new_cases=12), _case(week=3, new_cases=5), _case(week=3, new_cases=7)]
+        second = await bulk.bulk_upsert(session, table_, revised + [_case(week=4)], key, ["new_cases"])
+        await session.commit()
+        totals = dict((await session.execute(select(FluCase.iso_week, FluCase.new_cases))).all())
+        types = set((await session.execute(select(FluCase.flu_type))).scalars())
+
+    assert first == bulk.UpsertCounts(inserted=3)
+    assert second == bulk.UpsertCounts(inserted=1, updated=2, unchanged=1)
+    assert totals == {1: 10, 2: 12, 3: 7, 4: 10}
+    assert {t.value for t in types} == {"H3N2"}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("copy", [True, False])
+async def test_upsert_counts_do_not_depend_on_id_order(pg_engine, monkeypatch, copy):
+    monkeypatch.setattr(bulk.settings, "BULK_COPY_ENABLED", copy)
+    table_ = FluCase.__table__
+    key = bulk.constraint_columns(table_, "uq_flu_case")
+    async with AsyncSession(pg_engine) as session:
+        await bulk.bulk_upsert(session, table_, [_case(week=w) for w in (1, 2, 3)], key, ["new_cases"])
+        # E.g. a sequence reset: new rows now get ids below the existing ones
+        await session.execute(text("SELECT setval(pg_get_serial_sequence('flu_cases', 'id'), 1000)"))
+        await session.execute(text("UPDATE flu_cases SET id = id + 2000"))
+        rows = [_case(week=1, new_cases=11), _case(week=2), _case(week=4), _case(week=5)]
+        counts = await bulk.bulk_upsert(session, table_, rows, key, ["new_cases"])
+        await session.commit()
+
+    assert counts == bulk.UpsertCounts(inserted=2, updated=1, unchanged=1)
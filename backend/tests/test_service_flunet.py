@@ -0,0 +1,271 @@
+import asyncio
+from datetime import date, datetime
+
+import httpx
+import pytest
+from sqlalchemy import MetaData, Table
+
+from app.config import settings
+from app.services import flunet
+from app.services.checkpoint import get_checkpoints, save_checkpoint
+from app.services.watermark import get_watermark, save_watermark
+
+
+def _record(iso_year, iso_week, new_cases=10):
+    return {
+        "country_code": "US",
+        "region": "",
+        "city": "",
+        "flu_type": "H3N2",
+        "source": "who_flunet",
+        "time": date.fromisocalendar(iso_year, iso_week, 1),
+        "new_cases": new_cases,
+        "iso_year": iso_year,
+        "iso_week": iso_week,
+    }
+
+
+def _raw(iso_year, iso_week, ah3=5):
+    return {"ISO2": "US", "ISO_YEAR": iso_year, "ISO_WEEK": iso_week, "AH3": ah3}
+
+
+@pytest.mark.asyncio
+async def test_ingest_flunet_without_watermark_uses_fixed_window(monkeypatch):
+    calls = []
+    upserted = []
+
+    async def fake_fetch(weeks_back, since=None, last_modified=None, known_sha256=None):
+        calls.append((weeks_back, since, last_modified))
+        return [_record(2025, 9), _record(2025, 10)], "Mon, 10 Mar 2025 00:00:00 GMT", "sha-1"
+
+    async def fake_upsert(records):
+        upserted.extend(records)
+
+    monkeypatch.setattr(flunet, "fetch_flunet", fake_fetch)
+    monkeypatch.setattr(flunet, "_upsert_records", fake_upsert)
+
+    await flunet.ingest_flunet(weeks_back=4)
+
+    assert calls == [(4, None, None)]
+    assert len(upserted) == 2
+    watermark = await get_watermark(flunet.WATERMARK_SOURCE)
+    assert (watermark.iso_year, watermark.iso_week) == (2025, 10)
+    assert watermark.last_modified == "Mon, 10 Mar 2025 00:00:00 GMT"
+    assert watermark.content_sha256 == "sha-1"
+
+
+@pytest.mark.asyncio
+async def test_ingest_flunet_resumes_from_watermark(monkeypatch):
+    await save_watermark(
+        flunet.WATERMARK_SOURCE, iso_year=2025, iso_week=10, last_modified="lm-1", content_sha256="sha-1"
+    )
+    calls = []
+
+    async def fake_fetch(weeks_back, since=None, last_modified=None, known_sha256=None):
+        calls.append((since, last_modified, known_sha256))
+        return [_record(2025, 11)], "lm-2", "sha-2"
+
+    async def fake_upsert(records):
+        pass
+
+    monkeypatch.setattr(flunet, "fetch_flunet", fake_fetch)
+    monkeypatch.setattr(flunet, "_upsert_records", fake_upsert)
+
+    await flunet.ingest_flunet()
+
+    assert calls == [((2025, 10), "lm-1", "sha-1")]
+    watermark = await get_watermark(flunet.WATERMARK_SOURCE)
+    assert (watermark.iso_year, watermark.iso_week) == (2025, 11)
+    assert watermark.last_modified == "lm-2"
+    assert watermark.content_sha256 == "sha-2"
+
+
+@pytest.mark.asyncio
+async def test_ingest_flunet_skips_upsert_when_nothing_new(monkeypatch):
+    await save_watermark(flunet.WATERMARK_SOURCE, iso_year=2025, iso_week=10, last_modified="lm-1")
+
+    async def fake_fetch(weeks_back, since=None, last_modified=None, known_sha256=None):
+        return [], last_modified, known_sha256
+
+    async def fail_upsert(records):
+        raise AssertionError("upsert should be skipped")
+
+    monkeypatch.setattr(flunet, "fetch_flunet", fake_fetch)
+    monkeypatch.setattr(flunet, "_upsert_records", fail_upsert)
+
+    await flunet.ingest_flunet()
+
+    watermark = await get_watermark(flunet.WATERMARK_SOURCE)
+    assert (watermark.iso_year, watermark.iso_week) == (2025, 10)
+
+
+@pytest.mark.asyncio
+async def test_ingest_flunet_watermark_never_moves_backwards(monkeypatch):
+    await save_watermark(flunet.WATERMARK_SOURCE, iso_year=2025, iso_week=10, last_modified=None)
+
+    async def fake_fetch(weeks_back, since=None, last_modified=None, known_sha256=None):
+        # Only a revision for an earlier week came back
+        return [_record(2025, 9, new_cases=99)], None, None
+
+    async def fake_upsert(records):
+        pass
+
+    monkeypatch.setattr(flunet, "fetch_flunet", fake_fetch)
+    monkeypatch.setattr(flunet, "_upsert_records", fake_upsert)
+
+    await flunet.ingest_flunet()
+
+    watermark = await get_watermark(flunet.WATERMARK_SOURCE)
+    assert (watermark.iso_year, watermark.iso_week) == (2025, 10)
+
+
+@pytest.mark.asyncio
+async def test_fetch_flunet_full_fetches_years_concurrently_in_order(monkeypatch):
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        year = int(request.url.params["$filter"].split()[2])
+        if request.url.params.get("page") == "2":
+            return httpx.Response(200, json={"value": [_raw(year, 2)]})
+        next_link = f"{flunet.FLUNET_URL}?$filter=ISO_YEAR ge {year} and ISO_YEAR lt {year + 1}&page=2"
+        return httpx.Response(200, json={"value": [_raw(year, 1)], "@odata.nextLink": next_link})
+
+    monkeypatch.setattr(settings, "FLUNET_CONCURRENCY", 3)
+    monkeypatch.setattr(
+        flunet, "_http_client", lambda timeout: httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+
+    records = await flunet.fetch_flunet_full(years_back=5)
+
+    assert peak == 3
+    weeks = [(r["iso_year"], r["iso_week"]) for r in records]
+    current_year = datetime.utcnow().year
+    assert weeks == [(year, week) for year in range(current_year - 5, current_year + 1) for week in (1, 2)]
+
+
+@pytest.mark.asyncio
+async def test_stream_flunet_full_aggregates_across_pages_per_year(monkeypatch):
+    async def handler(request):
+        year = int(request.url.params["$filter"].split()[2])
+        if request.url.params.get("page") == "2":
+            return httpx.Response(200, json={"value": [{**_raw(year, 1, ah3=7), "ISO2": "XS"}]})
+        next_link = f"{flunet.FLUNET_URL}?$filter=ISO_YEAR ge {year} and ISO_YEAR lt {year + 1}&page=2"
+        return httpx.Response(
+            200, json={"value": [{**_raw(year, 1, ah3=3), "ISO2": "XE"}], "@odata.nextLink": next_link}
+        )
+
+    monkeypatch.setattr(
+        flunet, "_http_client", lambda timeout: httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+    received = {}
+
+    async def sink(year, rows):
+        received[year] = rows
+
+    raw_count = await flunet.stream_flunet_full(sink, years_back=1)
+
+    assert raw_count == 4
+    assert sorted(received) == [datetime.utcnow().year - 1, datetime.utcnow().year]
+    for year, rows in received.items():
+        assert [(r["country_code"], r["iso_year"], r["new_cases"]) for r in rows] == [("GB", year, 10)]
+
+
+@pytest.mark.asyncio
+async def test_ingest_flunet_full_upserts_each_year_and_sets_watermark(monkeypatch):
+    async def fake_stream(sink, years_back=flunet.FULL_BACKFILL_YEARS, skip_years=()):
+        await sink(2024, [_record(2024, 52)])
+        await sink(2025, [_record(2025, 3), _record(2025, 2)])
+        return 3
+
+    upserts = []
+
+    async def fake_upsert(records, target=None):
+        upserts.append(len(records))
+
+    monkeypatch.setattr(flunet, "stream_flunet_full", fake_stream)
+    monkeypatch.setattr(flunet, "_upsert_records", fake_upsert)
+
+    await flunet.ingest_flunet_full()
+
+    assert upserts == [1, 2]
+    watermark = await get_watermark(flunet.WATERMARK_SOURCE)
+    assert (watermark.iso_year, watermark.iso_week) == (2025, 3)
+
+
+@pytest.mark.asyncio
+async def test_ingest_flunet_full_keeps_the_live_watermark(monkeypatch):
+    await save_watermark(flunet.WATERMARK_SOURCE, iso_year=2025, iso_week=10, last_modified=None)
+
+    async def fake_stream(sink, years_back=flunet.FULL_BACKFILL_YEARS, skip_years=()):
+        await sink(2025, [_record(2025, 3)])
+        return 1
+
+    async def fake_upsert(records, target=None):
+        pass
+
+    monkeypatch.setattr(flunet, "stream_flunet_full", fake_stream)
+    monkeypatch.setattr(flunet, "_upsert_records", fake_upsert)
+
+    # A shadow load leaves the watermark alone, a live one never moves it back
+    await flunet.ingest_flunet_full(target=Table("flu_cases_shadow", MetaData()), resume=False)
+    await flunet.ingest_flunet_full()
+
+    watermark = await get_watermark(flunet.WATERMARK_SOURCE)
+    assert (watermark.iso_year, watermark.iso_week) == (2025, 10)
+
+
+@pytest.mark.asyncio
+async def test_ingest_flunet_full_resumes_from_checkpoints(monkeypatch):
+    job = f"{flunet.CHECKPOINT_JOB}:flu_cases"
+    skipped = []
+    fail = True
+
+    async def fake_stream(sink, years_back=flunet.FULL_BACKFILL_YEARS, skip_years=()):
+        skipped.append(sorted(skip_years))
+        for year in (2023, 2024, 2025):
+            if year in skip_years:
+                continue
+            if year == 2025 and fail:
+                raise httpx.ConnectError("upstream went away")
+            await sink(year, [_record(year, 52 if year < 2025 else 3)])
+        return 3
+
+    async def fake_upsert(records, target=None):
+        pass
+
+    monkeypatch.setattr(flunet, "stream_flunet_full", fake_stream)
+    monkeypatch.setattr(flunet, "_upsert_records", fake_upsert)
+
+    await flunet.ingest_flunet_full()
+    assert sorted(await get_checkpoints(job)) == [2023, 2024]
+    assert await get_watermark(flunet.WATERMARK_SOURCE) is None
+
+    fail = False
+    await flunet.ingest_flunet_full()
+
+    assert skipped == [[], [2023, 2024]]
+    assert await get_checkpoints(job) == {}
+    watermark = await get_watermark(flunet.WATERMARK_SOURCE)
+    assert (watermark.iso_year, watermark.iso_week) == (2025, 3)
+
+
+@pytest.mark.asyncio
+async def test_ingest_flunet_full_without_resume_discards_checkpoints(monkeypatch):
+    await save_checkpoint(f"{flunet.CHECKPOINT_JOB}:flu_cases", 2024, rows=1, latest_iso_week=52)
+    skipped = []
+
+    async def fake_stream(sink, years_back=flunet.FULL_BACKFILL_YEARS, skip_years=()):
+        skipped.append(sorted(skip_years))
+        return 0
+
+    monkeypatch.setattr(flunet, "stream_flunet_full", fake_stream)
+
+    await flunet.ingest_flunet_full(resume=False)
+
+    assert skipped == [[]]
@@ -6,6 +6,7 @@ import pytest
 from app.config import settings
 from app.models import FluCase
 from app.services.forecast import generate_forecast
+from app.services.rollup import rebuild_rollups
 
 
 @pytest.mark.asyncio
@@ -24,6 +25,7 @@ async def test_generate_forecast_requires_minimum_points(db_session):
             )
         )
     await db_session.commit()
+    await rebuild_rollups()
 
     out = await generate_forecast(country_code="US", weeks_ahead=4)
     assert out == {"historical": [], "forecast": []}
@@ -62,6 +64,7 @@ async def test_generate_forecast_exponential_smoothing_output(db_session):
     )
 
     await db_session.commit()
+    await rebuild_rollups()
 
     out = await generate_forecast(country_code="US", weeks_ahead=3)
 
@@ -105,6 +108,7 @@ async def test_generate_forecast_uses_configurable_parameters(db_session):
             )
         )
     await db_session.commit()
+    await rebuild_rollups()
 
     original_alpha = settings.FORECAST_ALPHA
     original_multiplier = settings.FORECAST_CI_MULTIPLIER
@@ -0,0 +1,239 @@
+import asyncio
+import gzip
+import threading
+
+import httpx
+import pytest
+from sqlalchemy import func, select
+
+from app.config import settings
+from app.models import FluCase
+from app.services import flunet, http_cache
+from tests.conftest import TestSession
+
+URL = "https://example.test/data?page=1"
+
+
+class Upstream:
+    """Fake upstream honouring If-None-Match against a mutable body."""
+
+    def __init__(self, body=b'{"value": [1]}'):
+        self.body = body
+        self.requests = []
+
+    def etag(self):
+        return f'"{http_cache._digest(self.body)[:12]}"'
+
+    def handler(self, request):
+        self.requests.append(request)
+        if request.headers.get("If-None-Match") == self.etag():
+            return httpx.Response(304)
+        return httpx.Response(200, content=self.body, headers={"ETag": self.etag()})
+
+    def client(self):
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "HTTP_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "HTTP_CACHE_REPLAY", False)
+    return tmp_path
+
+
+@pytest.mark.asyncio
+async def test_disabled_cache_is_plain_get(monkeypatch):
+    monkeypatch.setattr(settings, "HTTP_CACHE_DIR", "")
+    upstream = Upstream()
+    async with upstream.client() as client:
+        resp = await http_cache.cached_get(client, URL)
+    assert resp.content == upstream.body
+    assert not http_cache.is_unchanged(resp)
+
+
+@pytest.mark.asyncio
+async def test_first_fetch_stores_compressed_blob(cache_dir):
+    upstream = Upstream()
+    async with upstream.client() as client:
+        resp = await http_cache.cached_get(client, URL)
+
+    assert not http_cache.is_unchanged(resp)
+    blobs = list((cache_dir / "blobs").iterdir())
+    assert len(blobs) == 1
+    assert gzip.decompress(blobs[0].read_bytes()) == upstream.body
+
+
+@pytest.mark.asyncio
+async def test_revalidates_and_serves_304_from_cache(cache_dir):
+    upstream = Upstream()
+    async with upstream.client() as client:
+        await http_cache.cached_get(client, URL)
+        resp = await http_cache.cached_get(client, URL)
+
+    assert upstream.requests[1].headers["If-None-Match"] == upstream.etag()
+    assert resp.status_code == 200
+    assert resp.json() == {"value": [1]}
+    assert http_cache.is_unchanged(resp)
+
+
+@pytest.mark.asyncio
+async def test_changed_body_is_reported_and_stored(cache_dir):
+    upstream = Upstream()
+    async with upstream.client() as client:
+        await http_cache.cached_get(client, URL)
+        upstream.body = b'{"value": [2]}'
+        resp = await http_cache.cached_get(client, URL)
+
+    assert not http_cache.is_unchanged(resp)
+    assert len(list((cache_dir / "blobs").iterdir())) == 2
+
+
+@pytest.mark.asyncio
+async def test_identical_body_without_validators_is_unchanged(cache_dir):
+    def handler(request):
+        return httpx.Response(200, content=b"same")
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        await http_cache.cached_get(client, URL)
+        resp = await http_cache.cached_get(client, URL)
+    assert http_cache.is_unchanged(resp)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_stores_of_one_url_do_not_collide(cache_dir):
+    content = b"x" * 1_000_000
+    headers = httpx.Headers({"ETag": '"abc"'})
+
+    digests = await asyncio.gather(
+        *(asyncio.to_thread(http_cache._store, cache_dir, URL, content, headers) for _ in range(16))
+    )
+
+    assert set(digests) == {http_cache._digest(content)}
+    assert http_cache._read_blob(cache_dir, digests[0]) == content
+    assert http_cache._load_entry(cache_dir, URL)["headers"] == {"etag": '"abc"'}
+    assert not list(cache_dir.rglob("*.tmp"))
+
+
+@pytest.mark.asyncio
+async def test_replay_serves_from_disk_without_network(cache_dir, monkeypatch):
+    upstream = Upstream()
+    async with upstream.client() as client:
+        await http_cache.cached_get(client, URL)
+
+    monkeypatch.setattr(settings, "HTTP_CACHE_REPLAY", True)
+    async with upstream.client() as client:
+        resp = await http_cache.cached_get(client, URL)
+        with pytest.raises(http_cache.CacheMiss):
+            await http_cache.cached_get(client, URL + "&page=2")
+
+    assert len(upstream.requests) == 1
+    assert resp.content == upstream.body
+    # Replays are re-ingested, never skipped
+    assert not http_cache.is_unchanged(resp)
+
+
+@pytest.mark.asyncio
+async def test_fetch_flunet_skips_parse_when_every_page_unchanged(cache_dir, monkeypatch):
+    upstream = Upstream(b'{"value": [{"ISO2": "US", "ISO_YEAR": 2025, "ISO_WEEK": 10, "AH3": 5}]}')
+    monkeypatch.setattr(flunet, "_http_client", lambda timeout: upstream.client())
+
+    first, _, sha256 = await flunet.fetch_flunet(weeks_back=4)
+    second, _, _ = await flunet.fetch_flunet(weeks_back=4, known_sha256=sha256)
+
+    assert [r["new_cases"] for r in first] == [5]
+    assert second == []
+
+
+@pytest.mark.asyncio
+async def test_fetch_flunet_parses_cached_pages_without_a_known_hash(cache_dir, monkeypatch):
+    upstream = Upstream(b'{"value": [{"ISO2": "US", "ISO_YEAR": 2025, "ISO_WEEK": 10, "AH3": 5}]}')
+    monkeypatch.setattr(flunet, "_http_client", lambda timeout: upstream.client())
+
+    await flunet.fetch_flunet(weeks_back=4)
+    # The blob is now cached and served from a 304, but nothing was ingested
+    again, _, _ = await flunet.fetch_flunet(weeks_back=4)
+
+    assert [r["new_cases"] for r in again] == [5]
+
+
+@pytest.mark.asyncio
+async def test_ingest_flunet_retries_a_batch_whose_upsert_failed(cache_dir, monkeypatch):
+    upstream = Upstream(b'{"value": [{"ISO2": "US", "ISO_YEAR": 2025, "ISO_WEEK": 10, "AH3": 5}]}')
+    monkeypatch.setattr(flunet, "_http_client", lambda timeout: upstream.client())
+    upsert = flunet._upsert_records
+    attempts = []
+
+    async def flaky_upsert(records, target=None):
+        attempts.append(len(records))
+        if len(attempts) == 1:
+            raise RuntimeError("connection lost")
+        await upsert(records, target)
+
+    monkeypatch.setattr(flunet, "_upsert_records", flaky_upsert)
+
+    await flunet.ingest_flunet()  # logs the failure
+    await flunet.ingest_flunet()
+
+    assert attempts == [1, 1]
+    async with TestSession() as session:
+        assert (await session.execute(select(func.sum(FluCase.new_cases)))).scalar() == 5
+
+
+@pytest.mark.asyncio
+async def test_download_without_cache_uses_removed_temp_file(monkeypatch):
+    monkeypatch.setattr(settings, "HTTP_CACHE_DIR", "")
+    upstream = Upstream()
+    async with upstream.client() as client:
+        async with http_cache.cached_download(client, URL) as body:
+            with body.open() as fp:
+                assert fp.read() == upstream.body
+            path = body.path
+    assert not path.exists()
+
+
+@pytest.mark.asyncio
+async def test_download_streams_into_blob_store_and_revalidates(cache_dir):
+    upstream = Upstream()
+    async with upstream.client() as client:
+        async with http_cache.cached_download(client, URL) as body:
+            assert not body.unchanged
+        async with http_cache.cached_download(client, URL) as body:
+            assert body.unchanged
+            with body.open() as fp:
+                assert fp.read() == upstream.body
+
+    assert upstream.requests[1].headers["If-None-Match"] == upstream.etag()
+    assert [p.suffix for p in cache_dir.iterdir() if p.is_file()] == []
+
+
+@pytest.mark.asyncio
+async def test_download_compresses_and_writes_off_the_event_loop(cache_dir, monkeypatch):
+    upstream = Upstream(body=b"y" * (3 * http_cache.DOWNLOAD_CHUNK_SIZE + 1))
+    write_chunk = http_cache._write_chunk
+    threads = []
+
+    def recording_write_chunk(out, hasher, chunk):
+        threads.append(threading.current_thread())
+        write_chunk(out, hasher, chunk)
+
+    monkeypatch.setattr(http_cache, "_write_chunk", recording_write_chunk)
+    async with upstream.client() as client:
+        async with http_cache.cached_download(client, URL) as body:
+            with body.open() as fp:
+                assert fp.read() == upstream.body
+            assert body.sha256 == http_cache._digest(upstream.body)
+
+    assert threads
+    assert threading.main_thread() not in threads
+
+
+@pytest.mark.asyncio
+async def test_download_shares_entries_with_cached_get_and_replays(cache_dir, monkeypatch):
+    upstream = Upstream()
+    async with upstream.client() as client:
+        await http_cache.cached_get(client, URL)
+        monkeypatch.setattr(settings, "HTTP_CACHE_REPLAY", True)
+        async with http_cache.cached_download(client, URL) as body:
+            with body.open() as fp:
+                assert fp.read() == upstream.body
+    assert len(upstream.requests) == 1
@@ -1,8 +1,29 @@
+import io
+import json
 from datetime import date
 
 import pytest
-
-from app.services.nextstrain import NEXTSTRAIN_URL, _walk_tree, normalize_country_code
+from sqlalchemy import delete, func, select
+
+from app.config import settings
+from app.models import GenomicSequence
+from app.services import nextstrain
+from app.services.nextstrain import (
+    NEXTSTRAIN_URL,
+    NextstrainFetch,
+    _aggregate_records,
+    _merge_datasets,
+    _walk_tree,
+    dataset_lineage,
+    fetch_changed_datasets,
+    fetch_nextstrain,
+    iter_dataset_records,
+    normalize_country_code,
+)
+from app.services.rebuild import shadow_of
+from app.services.watermark import get_dataset_versions
+from benchmarks.standin import StandIn, install, synthetic_tree
+from tests.conftest import TestSession
 
 
 def test_nextstrain_dataset_uses_at_least_10_year_window():
@@ -73,29 +94,45 @@ def test_normalize_strips_whitespace():
 # --- _walk_tree tests ---
 
 
-def test_walk_tree_collects_valid_nodes_recursively():
+def test_walk_tree_collects_valid_tips_recursively():
     tree = {
+        # Internal nodes carry inferred attributes but are not sequences
         "node_attrs": {
-            "country": {"value": "United States"},
-            "clade_membership": {"value": "2a.3a.1"},
-            "num_date": {"value": 2024.0},
+            "country": {"value": "France"},
+            "clade_membership": {"value": "2a"},
+            "num_date": {"value": 2020.0},
         },
         "children": [
             {
                 "node_attrs": {
-                    "country": {"value": "GB"},
-                    "subclade": {"value": "2a.3"},
-                    "num_date": {"value": 2023.0},
+                    "country": {"value": "United States"},
+                    "clade_membership": {"value": "2a.3a.1"},
+                    "num_date": {"value": 2024.0},
                 },
-                "children": [],
             },
             {
-                # Missing clade -> ignored
                 "node_attrs": {
-                    "country": {"value": "CA"},
+                    "country": {"value": "GB"},
+                    "clade_membership": {"value": "2a.3"},
                     "num_date": {"value": 2022.0},
                 },
-                "children": [],
+                "children": [
+                    {
+                        "node_attrs": {
+                            "country": {"value": "GB"},
+                            "subclade": {"value": "2a.3"},
+                            "num_date": {"value": 2023.0},
+                        },
+                        "children": [],
+                    },
+                    {
+                        # Missing clade -> ignored
+                        "node_attrs": {
+                            "country": {"value": "CA"},
+                            "num_date": {"value": 2022.0},
+                        },
+                    },
+                ],
             },
         ],
     }
@@ -113,6 +150,7 @@ def test_walk_tree_collects_valid_nodes_recursively():
     assert second["country_code"] == "GB"
     assert second["clade"] == "2a.3"  # falls back to subclade
     assert second["collection_date"] == date(2023, 1, 1)
+    assert _stream(json.dumps({"tree": tree}).encode()) == records
 
 
 def test_walk_tree_skips_unknown_country():
@@ -144,3 +182,245 @@ def test_walk_tree_skips_invalid_num_date():
     _walk_tree(tree, records)
 
     assert records == []
+
+
+# --- streaming dataset parser ---
+
+
+def _stream(data: bytes) -> list[dict]:
+    return list(iter_dataset_records(io.BytesIO(data)))
+
+
+def test_streaming_parser_matches_walk_tree():
+    tree = synthetic_tree(leaves=500, depth=40, seed=3)
+    expected = []
+    _walk_tree(tree, expected)
+
+    assert _stream(json.dumps({"meta": {"updated": "2025-01-01"}, "tree": tree}).encode()) == expected
+
+
+def test_only_tips_are_records_when_internal_nodes_have_attributes():
+    tree = synthetic_tree(leaves=500, depth=40, seed=3)
+    assert tree["children"][-1]["node_attrs"]["clade_membership"]["value"]
+    records = []
+    _walk_tree(tree, records)
+
+    assert len(records) == 500
+    assert len(_stream(json.dumps({"tree": tree}).encode())) == 500
+
+
+def test_streaming_parser_emits_a_tip_whose_attrs_follow_children():
+    attrs = {"clade_membership": {"value": "2a"}, "num_date": {"value": 2024.0}}
+    tip = {"children": [], "node_attrs": {"country": {"value": "GB"}, **attrs}}
+    tree = {"node_attrs": {"country": {"value": "US"}, **attrs}, "children": [tip]}
+
+    assert [r["country_code"] for r in _stream(json.dumps({"tree": tree}).encode())] == ["GB"]
+
+
+def test_streaming_parser_reads_attrs_after_children():
+    data = {
+        "tree": {
+            "children": [],
+            "branch_attrs": {"labels": {"clade": "2a"}},
+            "node_attrs": {
+                "country": {"value": "Japan", "confidence": {"Japan": 0.9}},
+                "clade_membership": {"value": "2a"},
+                "num_date": {"value": 2024.0, "confidence": [2023.9, 2024.1]},
+            },
+        }
+    }
+    records = _stream(json.dumps(data).encode())
+    assert [(r["country_code"], r["clade"]) for r in records] == [("JP", "2a")]
+
+
+def test_deep_trees_do_not_hit_recursion_limit():
+    depth = 20000
+    leaf = '{"node_attrs": {"country": {"value": "US"}, "clade_membership": {"value": "2a"}, "num_date": {"value": 2024.5}}}'
+    text = '{"tree": ' + '{"children": [' * depth + leaf + "]}" * depth + "}"
+
+    assert len(_stream(text.encode())) == 1
+
+    tree = root = {"children": []}
+    for _ in range(depth):
+        child = {"children": []}
+        tree["children"].append(child)
+        tree = child
+    tree["node_attrs"] = json.loads(leaf)["node_attrs"]
+    records = []
+    _walk_tree(root, records)
+    assert len(records) == 1
+
+
+@pytest.mark.asyncio
+async def test_fetch_nextstrain_aggregates_leaves_per_key(monkeypatch):
+    monkeypatch.setattr(settings, "NEXTSTRAIN_DATASETS", ["flu/seasonal/h3n2/ha/12y"])
+    standin = StandIn(tree_leaves=300, tree_depth=10)
+    with install(standin):
+        records = await fetch_nextstrain()
+
+    expected = []
+    _walk_tree(synthetic_tree(300, 10, standin.tree_seed("/flu/seasonal/h3n2/ha/12y")), expected)
+    keys = {(r["country_code"], r["clade"], r["collection_date"]) for r in expected}
+    assert len(records) == len(keys)
+    assert sum(r["count"] for r in records) == 300
+    assert {r["lineage"] for r in records} == {"H3N2"}
+
+
+@pytest.mark.asyncio
+async def test_fetch_nextstrain_tags_each_dataset_in_parallel_processes(monkeypatch):
+    monkeypatch.setattr(
+        settings,
+        "NEXTSTRAIN_DATASETS",
+        ["flu/seasonal/h3n2/ha/12y", "flu/seasonal/h1n1pdm/ha/12y", "flu/seasonal/vic/ha/12y"],
+    )
+    monkeypatch.setattr(settings, "NEXTSTRAIN_PARSE_PROCESSES", 2)
+    standin = StandIn(tree_leaves=200, tree_depth=5)
+    try:
+        with install(standin):
+            records = await fetch_nextstrain()
+            pool = nextstrain._pool
+            # The worker processes are reused by the next run
+            assert await fetch_nextstrain() == records
+            assert nextstrain._pool is pool is not None
+    finally:
+        nextstrain.shutdown_parse_pool()
+
+    assert nextstrain._pool is None
+    totals = {}
+    for r in records:
+        totals[r["lineage"]] = totals.get(r["lineage"], 0) + r["count"]
+    assert totals == {"H3N2": 200, "H1N1pdm": 200, "B/Victoria": 200}
+    assert standin.requests == 6
+
+
+@pytest.mark.asyncio
+async def test_fetch_counts_sequences_parsed_from_every_dataset(monkeypatch):
+    monkeypatch.setattr(settings, "NEXTSTRAIN_DATASETS", ["flu/seasonal/h3n2/ha/12y", "flu/seasonal/h3n2/na/12y"])
+    with install(StandIn(tree_leaves=200, tree_depth=5)):
+        fetched = await fetch_changed_datasets()
+
+    assert fetched.sequences == 400
+
+
+def test_dataset_lineage():
+    assert dataset_lineage("flu/seasonal/h3n2/ha/12y") == "H3N2"
+    assert dataset_lineage("/flu/seasonal/yam/na/6y") == "B/Yamagata"
+    assert dataset_lineage("flu/avian/h5n1/ha") == "flu/avian/h5n1/ha"
+
+
+def test_merge_datasets_keeps_largest_count_per_key():
+    row = {"country_code": "US", "clade": "2a", "lineage": "H3N2", "collection_date": date(2024, 1, 1)}
+    merged = _merge_datasets([[{**row, "count": 3}], [{**row, "count": 5}, {**row, "clade": "2b", "count": 1}]])
+    assert sorted((r["clade"], r["count"]) for r in merged) == [("2a", 5), ("2b", 1)]
+
+
+def test_aggregate_records_sums_counts():
+    leaf = {"country_code": "US", "clade": "2a", "lineage": "", "collection_date": date(2024, 1, 1), "count": 1}
+    other = {**leaf, "clade": "2b"}
+    rows = _aggregate_records([leaf, leaf, other, leaf], lineage="H3N2")
+    assert [(r["clade"], r["lineage"], r["count"]) for r in rows] == [("2a", "H3N2", 3), ("2b", "H3N2", 1)]
+    assert leaf["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_ingest_nextstrain_replaces_counts_on_reingest(monkeypatch):
+    snapshots = [
+        [{"country_code": "US", "clade": "2a", "lineage": "", "collection_date": date(2024, 1, 1), "count": 3}],
+        [{"country_code": "US", "clade": "2a", "lineage": "", "collection_date": date(2024, 1, 1), "count": 5}],
+    ]
+
+    async def fake_fetch(known=None):
+        return NextstrainFetch(records=snapshots.pop(0))
+
+    monkeypatch.setattr(nextstrain, "fetch_changed_datasets", fake_fetch)
+
+    await nextstrain.ingest_nextstrain()
+    await nextstrain.ingest_nextstrain()
+
+    async with TestSession() as session:
+        counts = (await session.execute(select(GenomicSequence.count))).scalars().all()
+    assert counts == [5]
+
+
+async def _genomic_total() -> int:
+    async with TestSession() as session:
+        return (await session.execute(select(func.sum(GenomicSequence.count)))).scalar() or 0
+
+
+@pytest.fixture
+def one_dataset(monkeypatch):
+    monkeypatch.setattr(settings, "NEXTSTRAIN_DATASETS", ["flu/seasonal/h3n2/ha/12y"])
+
+
+@pytest.mark.asyncio
+async def test_ingest_nextstrain_skips_download_when_etag_matches(one_dataset):
+    standin = StandIn(tree_leaves=100, tree_depth=5)
+    with install(standin):
+        await nextstrain.ingest_nextstrain()
+        await nextstrain.ingest_nextstrain()
+
+    assert standin.not_modified == 1
+    assert await _genomic_total() == 100
+    version = (await get_dataset_versions())["flu/seasonal/h3n2/ha/12y"]
+    assert version.etag and version.sha256
+    assert version.meta_updated == f"{standin.end_year}-01-01"
+
+
+@pytest.mark.asyncio
+async def test_ingest_nextstrain_skips_parse_when_body_hash_matches(one_dataset, monkeypatch):
+    parses = []
+    read_dataset = nextstrain._read_dataset
+
+    def counting_read(*args):
+        parses.append(args)
+        return read_dataset(*args)
+
+    monkeypatch.setattr(nextstrain, "_read_dataset", counting_read)
+    standin = StandIn(tree_leaves=100, tree_depth=5, etags=False)
+    with install(standin):
+        await nextstrain.ingest_nextstrain()
+        await nextstrain.ingest_nextstrain()
+
+    assert standin.requests == 2
+    assert len(parses) == 1
+
+
+@pytest.mark.asyncio
+async def test_ingest_nextstrain_reparses_changed_or_missing_data(one_dataset):
+    with install(StandIn(tree_leaves=100, tree_depth=5)):
+        await nextstrain.ingest_nextstrain()
+
+    # Stored versions are ignored once the lineage's rows are gone
+    async with TestSession() as session:
+        await session.execute(delete(GenomicSequence))
+        await session.commit()
+    with install(StandIn(tree_leaves=100, tree_depth=5)):
+        await nextstrain.ingest_nextstrain()
+    assert await _genomic_total() == 100
+    before = (await get_dataset_versions())["flu/seasonal/h3n2/ha/12y"].sha256
+
+    changed = StandIn(tree_leaves=100, tree_depth=5, seed=1)
+    with install(changed):
+        await nextstrain.ingest_nextstrain()
+    assert changed.not_modified == 0
+    assert (await get_dataset_versions())["flu/seasonal/h3n2/ha/12y"].sha256 != before
+
+
+@pytest.mark.asyncio
+async def test_ingest_into_shadow_copies_unchanged_lineages(one_dataset):
+    shadow = shadow_of(GenomicSequence.__table__)
+    # SQLite index names are database-wide, so the test shadow goes without
+    shadow.indexes.clear()
+    async with TestSession() as session:
+        await session.run_sync(lambda s: shadow.create(s.connection()))
+    try:
+        with install(StandIn(tree_leaves=100, tree_depth=5)):
+            await nextstrain.ingest_nextstrain()
+            await nextstrain.ingest_nextstrain(target=shadow)
+
+        async with TestSession() as session:
+            copied = (await session.execute(select(func.sum(shadow.c["count"])))).scalar()
+        assert copied == 100
+    finally:
+        async with TestSession() as session:
+            await session.run_sync(lambda s: shadow.drop(s.connection()))
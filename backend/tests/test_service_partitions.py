@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from app import migrations
+from app.models import FluCase
+from app.services import partitions
+
+
+def test_year_bounds_follow_iso_years():
+    # ISO 2020 starts in December 2019 and has 53 weeks
+    assert partitions.year_bounds(2020) == (date(2019, 12, 30), date(2021, 1, 4))
+    assert partitions.year_bounds(2021) == (date(2021, 1, 4), date(2022, 1, 3))
+
+
+def test_every_week_falls_in_the_partition_of_its_iso_year():
+    monday = date(2015, 12, 28)
+    while monday < date(2027, 1, 4):
+        start, end = partitions.year_bounds(monday.isocalendar().year)
+        assert start <= monday < end
+        monday += timedelta(weeks=1)
+
+
+def test_partition_name():
+    assert partitions.partition_name("flu_cases", 2025) == "flu_cases_y2025"
+    assert partitions.partition_name("flu_cases_shadow", 2025) == "flu_cases_shadow_y2025"
+
+
+@pytest.mark.asyncio
+async def test_ensure_year_partitions_is_a_no_op_off_postgresql():
+    await partitions.ensure_year_partitions(FluCase.__table__, [2024, 2025])
+
+    assert not partitions._known
+
+
+@pytest.mark.asyncio
+async def test_ensure_year_partitions_creates_missing_partitions_once(pg_engine, monkeypatch):
+    monkeypatch.setattr(partitions, "job_engine", pg_engine)
+    partitions.forget_partitions()
+    upgrade = next(m for m in migrations.discover() if m.version == 4).load_upgrade()
+    async with pg_engine.begin() as conn:
+        await upgrade(conn)
+        before = await partitions._partition_years(conn, "flu_cases", "flu_cases")
+
+    await partitions.ensure_year_partitions(FluCase.__table__, [2024, 2025])
+    await partitions.ensure_year_partitions(FluCase.__table__, [2025, 2026])
+
+    async with pg_engine.connect() as conn:
+        assert await partitions.is_partitioned(conn, "flu_cases")
+        years = await partitions._partition_years(conn, "flu_cases", "flu_cases")
+        bounds = await conn.execute(
+            text("SELECT pg_get_expr(relpartbound, oid) FROM pg_class WHERE relname = 'flu_cases_y2025'")
+        )
+    assert years == before | {year: f"flu_cases_y{year}" for year in (2024, 2025, 2026)}
+    assert bounds.scalar() == "FOR VALUES FROM ('2024-12-30') TO ('2025-12-29')"
+    assert {("flu_cases", 2024), ("flu_cases", 2025), ("flu_cases", 2026)} <= partitions._known
+    partitions.forget_partitions()
@@ -0,0 +1,262 @@
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, insert, select, text
+
+from app import migrations
+from app.models import Anomaly, FluCase, GenomicSequence
+from app.services import partitions, rebuild
+from tests.conftest import TestSession
+
+
+def _stats(n, min_date=None, max_date=None):
+    return SimpleNamespace(n=n, min_date=min_date, max_date=max_date)
+
+
+class TestIndexSignature:
+    def test_strips_index_and_table_names(self):
+        live = "CREATE UNIQUE INDEX uq_flu_case ON public.flu_cases USING btree (time, country_code)"
+        shadow = "CREATE UNIQUE INDEX flu_cases_shadow_time_country_code_key ON public.flu_cases_shadow USING btree (time, country_code)"
+        assert rebuild._index_signature(live) == rebuild._index_signature(shadow)
+
+    def test_keeps_columns(self):
+        a = "CREATE INDEX ix_a ON public.flu_cases USING btree (time)"
+        b = "CREATE INDEX ix_b ON public.flu_cases USING btree (country_code)"
+        assert rebuild._index_signature(a) != rebuild._index_signature(b)
+
+
+class TestValidationProblems:
+    live = _stats(1000, date(2015, 1, 1), date(2025, 1, 1))
+
+    def test_matching_shadow_passes(self):
+        shadow = _stats(1005, date(2015, 1, 1), date(2025, 1, 8))
+        assert rebuild._validation_problems("flu_cases", self.live, shadow, 0.9) == []
+
+    def test_empty_shadow_fails(self):
+        problems = rebuild._validation_problems("flu_cases", self.live, _stats(0), 0.9)
+        assert any("empty" in p for p in problems)
+
+    def test_short_row_count_fails(self):
+        shadow = _stats(500, date(2015, 1, 1), date(2025, 1, 1))
+        problems = rebuild._validation_problems("flu_cases", self.live, shadow, 0.9)
+        assert problems == ["flu_cases: shadow has 500 rows vs 1000 live"]
+
+    def test_short_date_span_fails(self):
+        shadow = _stats(1000, date(2024, 1, 1), date(2025, 1, 1))
+        problems = rebuild._validation_problems("flu_cases", self.live, shadow, 0.9)
+        assert len(problems) == 1 and "spans" in problems[0]
+
+    def test_first_build_against_empty_live_passes(self):
+        shadow = _stats(10, date(2024, 1, 1), date(2025, 1, 1))
+        assert rebuild._validation_problems("flu_cases", _stats(0), shadow, 0.9) == []
+
+
+def test_shadow_of_keeps_columns_under_new_name():
+    shadow = rebuild.shadow_of(FluCase.__table__)
+    assert shadow.name == "flu_cases_shadow"
+    assert shadow.c.keys() == FluCase.__table__.c.keys()
+
+
+@pytest.mark.asyncio
+async def test_run_full_rebuild_in_place_on_sqlite(seed_flu_cases, seed_anomalies, monkeypatch):
+    calls = []
+
+    async def fake_flunet(target=None, resume=True):
+        calls.append(("flunet", target, resume))
+
+    async def fake_nextstrain(target=None):
+        calls.append(("nextstrain", target))
+
+    monkeypatch.setattr(rebuild, "ingest_flunet_full", fake_flunet)
+    monkeypatch.setattr(rebuild, "ingest_nextstrain", fake_nextstrain)
+
+    assert await rebuild.run_full_rebuild() is True
+
+    assert calls == [("flunet", None, False), ("nextstrain", None)]
+    async with TestSession() as session:
+        assert (await session.execute(select(func.count()).select_from(FluCase))).scalar() == 0
+        assert (await session.execute(select(func.count()).select_from(Anomaly))).scalar() == 0
+
+
+# --- PostgreSQL: shadow tables, swap and restore --------------------------
+
+
+def _flu_row(year, new_cases):
+    return {
+        "country_code": "US",
+        "region": "",
+        "city": "",
+        "flu_type": "H3N2",
+        "source": "who_flunet",
+        "time": date.fromisocalendar(year, 10, 1),
+        "new_cases": new_cases,
+        "iso_year": year,
+        "iso_week": 10,
+    }
+
+
+def _sequence_row(day, count):
+    return {
+        "country_code": "US",
+        "clade": "2a",
+        "lineage": "H3N2",
+        "collection_date": date(2024, 1, day),
+        "count": count,
+    }
+
+
+@pytest_asyncio.fixture
+async def pg_rebuild(pg_engine, monkeypatch):
+    """pg_engine as the job engine, with flu_cases partitioned as migration 0004 leaves it."""
+    monkeypatch.setattr(rebuild, "job_engine", pg_engine)
+    monkeypatch.setattr(partitions, "job_engine", pg_engine)
+    partitions.forget_partitions()
+    upgrade = next(m for m in migrations.discover() if m.version == 4).load_upgrade()
+    async with pg_engine.begin() as conn:
+        await upgrade(conn)
+    await partitions.ensure_year_partitions(FluCase.__table__, [2023, 2024])
+    async with pg_engine.begin() as conn:
+        await conn.execute(insert(FluCase.__table__), [_flu_row(2023, 1), _flu_row(2024, 2)])
+        await conn.execute(insert(GenomicSequence.__table__), [_sequence_row(1, 1), _sequence_row(2, 2)])
+    yield pg_engine
+    partitions.forget_partitions()
+
+
+async def _load_shadows(flu_cases: int):
+    await partitions.ensure_year_partitions(rebuild.shadow_of(FluCase.__table__), [2023, 2024])
+    async with rebuild.job_engine.begin() as conn:
+        shadow = rebuild.shadow_of(FluCase.__table__)
+        await conn.execute(insert(shadow), [_flu_row(2023, flu_cases), _flu_row(2024, flu_cases)])
+        sequences = rebuild.shadow_of(GenomicSequence.__table__)
+        await conn.execute(insert(sequences), [_sequence_row(1, 5), _sequence_row(2, 5)])
+
+
+async def _catalog(conn, table_name):
+    """(partitions, index names, id sequence) of ``table_name``."""
+    parts = await conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:t) ORDER BY 1"
+        ),
+        {"t": table_name},
+    )
+    indexes = await conn.execute(
+        text("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :t ORDER BY 1"),
+        {"t": table_name},
+    )
+    seq = await conn.execute(text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": table_name})
+    return list(parts.scalars()), list(indexes.scalars()), seq.scalar()
+
+
+async def _column(conn, table_name, column="new_cases"):
+    return sorted((await conn.execute(text(f"SELECT {column} FROM {table_name}"))).scalars())
+
+
+@pytest.mark.asyncio
+async def test_create_shadow_copies_partitioning_and_indexes(pg_rebuild):
+    async with pg_rebuild.begin() as conn:
+        for table, _ in rebuild.REBUILT_TABLES:
+            await rebuild.create_shadow(conn, table)
+        live = await rebuild._indexes(conn, "flu_cases")
+        shadow = await rebuild._indexes(conn, "flu_cases_shadow")
+        assert await partitions.is_partitioned(conn, "flu_cases_shadow")
+        assert not await partitions.is_partitioned(conn, "genomic_sequences_shadow")
+
+    assert live.keys() == shadow.keys()
+    await partitions.ensure_year_partitions(rebuild.shadow_of(FluCase.__table__), [2024])
+    async with pg_rebuild.connect() as conn:
+        assert (await _catalog(conn, "flu_cases_shadow"))[0] == ["flu_cases_shadow_y2024"]
+
+
+@pytest.mark.asyncio
+async def test_swap_and_restore_keep_canonical_names_and_the_sequence(pg_rebuild, monkeypatch):
+    async def noop():
+        pass
+
+    monkeypatch.setattr(rebuild, "rebuild_rollups", noop)
+    monkeypatch.setattr(rebuild, "clear_dataset_versions", noop)
+    async with pg_rebuild.connect() as conn:
+        before = await _catalog(conn, "flu_cases")
+    async with pg_rebuild.begin() as conn:
+        for table, _ in rebuild.REBUILT_TABLES:
+            await rebuild.create_shadow(conn, table)
+    await _load_shadows(flu_cases=7)
+
+    async with pg_rebuild.begin() as conn:
+        for table, _ in rebuild.REBUILT_TABLES:
+            await rebuild._swap(conn, table.name, table.name + "_shadow", table.name + "_old")
+
+    async with pg_rebuild.connect() as conn:
+        assert await _catalog(conn, "flu_cases") == before
+        old_parts, old_indexes, _ = await _catalog(conn, "flu_cases_old")
+        assert old_parts == ["flu_cases_old_y2023", "flu_cases_old_y2024"]
+        assert not set(old_indexes) & set(before[1])
+        assert await _column(conn, "flu_cases") == [7, 7]
+        assert await _column(conn, "flu_cases_old") == [1, 2]
+        assert "uq_genomic_seq" in (await rebuild._indexes(conn, "genomic_sequences")).values()
+
+    await rebuild.restore_previous_generation()
+
+    async with pg_rebuild.begin() as conn:
+        assert await _catalog(conn, "flu_cases") == before
+        assert (await _catalog(conn, "flu_cases_old"))[0] == ["flu_cases_old_y2023", "flu_cases_old_y2024"]
+        assert await _column(conn, "flu_cases") == [1, 2]
+        assert await _column(conn, "flu_cases_old") == [7, 7]
+        assert await _column(conn, "genomic_sequences", "count") == [1, 2]
+        # The id sequence survives dropping the retired generation
+        await conn.execute(text("DROP TABLE flu_cases_old"))
+        await conn.execute(insert(FluCase.__table__), [_flu_row(2024, 3) | {"country_code": "GB"}])
+
+
+@pytest.mark.asyncio
+async def test_run_full_rebuild_swaps_validated_shadows(pg_rebuild, monkeypatch):
+    async def fake_flunet(target=None, resume=True):
+        await _load_shadows(flu_cases=7)
+
+    async def fake_nextstrain(target=None):
+        pass
+
+    async def noop():
+        pass
+
+    monkeypatch.setattr(rebuild, "ingest_flunet_full", fake_flunet)
+    monkeypatch.setattr(rebuild, "ingest_nextstrain", fake_nextstrain)
+    monkeypatch.setattr(rebuild, "rebuild_rollups", noop)
+
+    assert await rebuild.run_full_rebuild() is True
+
+    async with pg_rebuild.connect() as conn:
+        assert await _column(conn, "flu_cases") == [7, 7]
+        assert (await conn.execute(text("SELECT to_regclass('flu_cases_shadow')"))).scalar() is None
+
+
+@pytest.mark.asyncio
+async def test_run_full_rebuild_keeps_live_tables_when_the_swap_times_out(pg_rebuild, monkeypatch):
+    async def fake_flunet(target=None, resume=True):
+        await _load_shadows(flu_cases=7)
+
+    async def fake_nextstrain(target=None):
+        pass
+
+    cleared = []
+
+    async def fake_clear():
+        cleared.append(True)
+
+    monkeypatch.setattr(rebuild, "ingest_flunet_full", fake_flunet)
+    monkeypatch.setattr(rebuild, "ingest_nextstrain", fake_nextstrain)
+    monkeypatch.setattr(rebuild, "clear_dataset_versions", fake_clear)
+    monkeypatch.setattr(rebuild, "SWAP_LOCK_TIMEOUT", "100ms")
+
+    async with pg_rebuild.connect() as reader:
+        # An open read transaction holds the lock the rename needs
+        await reader.execute(text("SELECT 1 FROM genomic_sequences LIMIT 1"))
+        assert await rebuild.run_full_rebuild() is False
+        await reader.rollback()
+
+    async with pg_rebuild.connect() as conn:
+        assert await _column(conn, "flu_cases") == [1, 2]
+        assert (await conn.execute(text("SELECT to_regclass('flu_cases_shadow')"))).scalar() is None
+    assert cleared == [True]
@@ -0,0 +1,111 @@
+import pytest
+from starlette.requests import Request
+
+from app.services import response_cache
+from app.services.response_cache import ResponseCache, cached_response
+
+
+def _key(name: str, generation: int = 0) -> tuple:
+    return (name, (), generation)
+
+
+def _request(if_none_match: str | None = None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "headers": headers})
+
+
+def test_evicts_least_recently_used_beyond_max_entries():
+    cache = ResponseCache(max_entries=2, max_bytes=1000)
+    cache.put(_key("a"), b"1")
+    cache.put(_key("b"), b"2")
+    cache.get(_key("a"))
+    cache.put(_key("c"), b"3")
+
+    assert cache.get(_key("b")) is None
+    assert cache.get(_key("a")) == b"1"
+    assert cache.get(_key("c")) == b"3"
+    assert cache.evictions == 1
+
+
+def test_evicts_until_under_max_bytes():
+    cache = ResponseCache(max_entries=10, max_bytes=10)
+    cache.put(_key("a"), b"x" * 4)
+    cache.put(_key("b"), b"x" * 4)
+    cache.put(_key("c"), b"x" * 4)
+    cache.put(_key("huge"), b"x" * 11)
+
+    assert cache.get(_key("a")) is None
+    assert cache.get(_key("huge")) is None
+    assert cache.stats()["bytes"] == 8
+    assert cache.stats()["entries"] == 2
+
+
+def test_bump_drops_entries_and_late_puts_of_the_old_generation():
+    cache = ResponseCache(max_entries=10, max_bytes=1000)
+    cache.put(_key("a"), b"1")
+    cache.bump()
+    # A request that started before the bump finishes after it
+    cache.put(_key("b", generation=0), b"stale")
+
+    assert cache.stats()["entries"] == 0
+    assert cache.get(_key("a", generation=1)) is None
+
+
+@pytest.mark.asyncio
+async def test_cached_response_keys_on_bound_parameters(monkeypatch):
+    monkeypatch.setattr(response_cache, "cache", ResponseCache(max_entries=10, max_bytes=1000))
+    calls = []
+
+    @cached_response
+    async def endpoint(country: str = "", weeks: int = 8):
+        calls.append((country, weeks))
+        return {"country": country, "weeks": weeks}
+
+    first = await endpoint(country="US", weeks=8, request=_request())
+    second = await endpoint(weeks=8, country="US", request=_request())
+    await endpoint(country="US", weeks=4, request=_request())
+
+    assert calls == [("US", 8), ("US", 4)]
+    assert first.body == second.body == b'{"country":"US","weeks":8}'
+    assert response_cache.cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_uncacheable_results_are_not_stored(monkeypatch):
+    monkeypatch.setattr(response_cache, "cache", ResponseCache(max_entries=10, max_bytes=1000))
+
+    @cached_response
+    async def endpoint():
+        response_cache.uncacheable()
+        return []
+
+    await endpoint(request=_request())
+    response = await endpoint(request=_request())
+
+    assert response_cache.cache.stats()["entries"] == 0
+    assert response_cache.cache.stats()["misses"] == 2
+    assert "etag" not in response.headers
+    assert response.headers["cache-control"] == "no-store"
+
+
+@pytest.mark.asyncio
+async def test_matching_if_none_match_skips_the_handler(monkeypatch):
+    monkeypatch.setattr(response_cache, "cache", ResponseCache(max_entries=10, max_bytes=1000))
+    calls = []
+
+    @cached_response
+    async def endpoint(weeks: int = 8):
+        calls.append(weeks)
+        return {"weeks": weeks}
+
+    etag = (await endpoint(weeks=8, request=_request())).headers["etag"]
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = await endpoint(weeks=8, request=_request(header))
+        assert response.status_code == 304
+        assert response.body == b""
+        assert response.headers["etag"] == etag
+
+    assert (await endpoint(weeks=4, request=_request(etag))).status_code == 200
+    response_cache.bump_generation()
+    assert (await endpoint(weeks=8, request=_request(etag))).status_code == 200
+    assert calls == [8, 4, 8]
@@ -0,0 +1,62 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+
+from app.models import CasesByWeek, CasesByWeekCountry, CasesByWeekFluType, FluCase, FluType
+from app.services import flunet
+from app.services.rollup import ensure_rollups
+from tests.conftest import TestSession
+
+
+def _record(country_code, flu_type, iso_week, new_cases):
+    return {
+        "country_code": country_code,
+        "region": "",
+        "city": "",
+        "flu_type": flu_type,
+        "source": "who_flunet",
+        "time": date.fromisocalendar(2025, iso_week, 1),
+        "new_cases": new_cases,
+        "iso_year": 2025,
+        "iso_week": iso_week,
+    }
+
+
+async def _rows(model):
+    async with TestSession() as session:
+        result = await session.execute(select(model))
+        return {tuple(getattr(row, c.name) for c in model.__table__.columns) for row in result.scalars()}
+
+
+@pytest.mark.asyncio
+async def test_upsert_refreshes_touched_weeks():
+    await flunet._upsert_records(
+        [
+            _record("US", FluType.H1N1, 10, 5),
+            _record("US", FluType.H3N2, 10, 7),
+            _record("GB", FluType.H3N2, 10, 2),
+            _record("GB", FluType.H3N2, 11, 4),
+        ]
+    )
+    # A revision of one week leaves the other week's rollup alone
+    await flunet._upsert_records([_record("US", FluType.H3N2, 10, 9)])
+
+    week10, week11 = date.fromisocalendar(2025, 10, 1), date.fromisocalendar(2025, 11, 1)
+    assert await _rows(CasesByWeek) == {(week10, 16), (week11, 4)}
+    assert await _rows(CasesByWeekCountry) == {(week10, "US", 14), (week10, "GB", 2), (week11, "GB", 4)}
+    assert await _rows(CasesByWeekFluType) == {
+        (week10, FluType.H1N1, 5),
+        (week10, FluType.H3N2, 11),
+        (week11, FluType.H3N2, 4),
+    }
+
+
+@pytest.mark.asyncio
+async def test_ensure_rollups_builds_missing_rollups(db_session):
+    db_session.add(FluCase(**_record("US", FluType.H1N1, 10, 5)))
+    await db_session.commit()
+
+    await ensure_rollups()
+
+    assert await _rows(CasesByWeek) == {(date.fromisocalendar(2025, 10, 1), 5)}
@@ -0,0 +1,100 @@
+import httpx
+import pytest
+
+from app.config import settings
+from app.services import flunet, nextstrain
+from benchmarks.standin import StandIn, install, synthetic_tree
+
+
+@pytest.mark.asyncio
+async def test_flunet_backfill_pages_through_standin():
+    standin = StandIn(years=1, countries=10, page_size=100)
+    received = {}
+
+    async def sink(year, rows):
+        received[year] = rows
+
+    with install(standin):
+        raw_count = await flunet.stream_flunet_full(sink, years_back=1)
+
+    # 2 years x 52 weeks x 10 countries, 100 records per page
+    assert raw_count == 1040
+    assert standin.requests == 12
+    assert sorted(received) == [standin.end_year - 1, standin.end_year]
+
+
+def test_since_filter_selects_weeks_from_watermark():
+    standin = StandIn(years=2, end_year=2025)
+    weeks = list(standin.flunet_weeks(flunet._since_filter(2024, 51)))
+    assert weeks[:3] == [(2024, 51), (2024, 52), (2025, 1)]
+    assert weeks[-1] == (2025, 52)
+
+
+def test_synthetic_tree_has_requested_tips_and_depth():
+    tree = synthetic_tree(leaves=50, depth=7)
+    records = []
+    nextstrain._walk_tree(tree, records)
+    assert len(records) == 50
+
+    depth, node = 1, tree
+    while node := next((c for c in node.get("children", []) if "children" in c), None):
+        depth += 1
+    assert depth == 7
+
+
+@pytest.mark.asyncio
+async def test_error_injection_returns_503():
+    standin = StandIn(error_rate=1.0)
+    with install(standin):
+        with pytest.raises(ExceptionGroup) as excinfo:
+            await nextstrain.fetch_nextstrain()
+    assert excinfo.group_contains(httpx.HTTPStatusError)
+    assert standin.errors == len(settings.NEXTSTRAIN_DATASETS)
+
+
+@pytest.mark.asyncio
+async def test_stream_flunet_full_skips_checkpointed_years():
+    standin = StandIn(years=2, countries=10, page_size=1000)
+    received = []
+
+    async def sink(year, rows):
+        received.append(year)
+
+    with install(standin):
+        await flunet.stream_flunet_full(sink, years_back=2, skip_years={standin.end_year - 2, standin.end_year})
+
+    assert received == [standin.end_year - 1]
+
+
+@pytest.mark.asyncio
+async def test_fetch_pages_continues_with_skip_and_projects_columns(monkeypatch):
+    monkeypatch.setattr(settings, "FLUNET_PAGE_SIZE", 300)
+    monkeypatch.setattr(settings, "HTTP_CACHE_DIR", "")
+    standin = StandIn(years=0, countries=10, page_size=1000)
+    urls = []
+    pages = []
+    with install(standin):
+        async with flunet._http_client(timeout=10) as client:
+            async for resp, page in flunet._fetch_pages(client, flunet._year_filter(standin.end_year)):
+                urls.append(resp.request.url.params)
+                pages.append(page)
+
+    assert sum(len(p) for p in pages) == 520
+    assert urls[0].get("$skip") is None
+    assert urls[1]["$skip"] == "300"
+    assert set(pages[0][0]) == set(flunet.SELECT_FIELDS)
+
+
+@pytest.mark.asyncio
+async def test_fetch_pages_returns_each_row_once_in_order(monkeypatch):
+    monkeypatch.setattr(settings, "FLUNET_PAGE_SIZE", 45)
+    monkeypatch.setattr(settings, "HTTP_CACHE_DIR", "")
+    standin = StandIn(years=0, countries=20, page_size=20)
+    rows = []
+    with install(standin):
+        async with flunet._http_client(timeout=10) as client:
+            async for _, page in flunet._fetch_pages(client, flunet._year_filter(standin.end_year)):
+                rows.extend((r["ISO_YEAR"], r["ISO_WEEK"], r["COUNTRY_CODE"]) for r in page)
+
+    assert len(rows) == 52 * 20
+    assert rows == sorted(set(rows))
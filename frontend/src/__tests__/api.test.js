@@ -32,6 +32,11 @@ describe('api client', () => {
     expect(fetch).toHaveBeenCalledWith('/api/forecast?country=US&weeks=6')
   })
 
+  it('calls dashboard endpoint with params', async () => {
+    await api.dashboard('panels=historical,forecast&country=US')
+    expect(fetch).toHaveBeenCalledWith('/api/dashboard?panels=historical,forecast&country=US')
+  })
+
   it('throws when response is not ok', async () => {
     fetch.mockResolvedValueOnce({ ok: false, status: 503 })
     await expect(api.summary()).rejects.toThrow('API error: 503')
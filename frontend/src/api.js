@@ -25,4 +25,5 @@ export const api = {
   genomicTrends: (params = '') => fetchJson(`/genomics/trends${params ? '?' + params : ''}`),
   genomicSummary: () => fetchJson('/genomics/summary'),
   genomicCountries: () => fetchJson('/genomics/countries'),
+  dashboard: (params = '') => fetchJson(`/dashboard${params ? '?' + params : ''}`),
 }